@@ -2,12 +2,26 @@
 """
 医疗知识助手智能体 - Flask 应用入口
 """
+import hashlib
+import importlib
+import json
 import logging
+import multiprocessing
 import os
+import threading
+import time
+import uuid
 from datetime import datetime
-from flask import Flask, request, jsonify, render_template, Response
+from decimal import Decimal
+
+import orjson
+from flask import Flask, request, jsonify, render_template, Response, stream_with_context, has_request_context
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
+from src.llm_client import STREAM_ERROR_MARKER
+from src.utils import LogSampler
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -15,26 +29,101 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+class ORJSONProvider(DefaultJSONProvider):
+    """基于 orjson 的 JSON 序列化，jsonify 自动使用"""
+    
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    
+    @staticmethod
+    def _default(obj):
+        # MySQL DECIMAL 字段与 Flask 默认行为保持一致，序列化为字符串
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return DefaultJSONProvider.default(obj)
+    
+    def dumps(self, obj, **kwargs) -> str:
+        return self.dumps_bytes(obj).decode('utf-8')
+    
+    def dumps_bytes(self, obj) -> bytes:
+        return orjson.dumps(obj, default=self._default, option=self.option)
+    
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(self.dumps_bytes(obj), mimetype=self.mimetype)
+
+
 # 创建 Flask 应用
 app = Flask(__name__, template_folder='templates', static_folder='static')
+app.json = ORJSONProvider(app)
 CORS(app)
 
-# 延迟导入，避免循环依赖
+# ==================== 服务初始化 ====================
+# 启动时在后台线程中预热各全局实例，避免首个请求承担索引/模型加载耗时，
+# 路由中的 get_* 仅返回已缓存的引用
+_services_ready = threading.Event()
+
+
+def _init_services():
+    """预热全局服务实例并挂载到 app.extensions"""
+    try:
+        from src.medical_agent import get_medical_agent
+        from src.vector_store import get_vector_store as _get_vs
+        from src.rag_service import get_rag_service as _get_rag
+        from src.db_client import get_db_client as _get_db
+        
+        app.extensions['db'] = _get_db()
+        app.extensions['vs'] = _get_vs()
+        app.extensions['rag'] = _get_rag()
+        app.extensions['agent'] = get_medical_agent()
+        logger.info("[启动] 服务实例预热完成")
+    except Exception as e:
+        logger.error(f"[启动] 服务实例预热失败，将在首次请求时重试: {str(e)}")
+    finally:
+        _services_ready.set()
+
+
+def _get_service(name: str, module: str, attr: str):
+    """获取已预热的服务实例，预热未完成时等待，预热失败时回退为按需创建"""
+    service = app.extensions.get(name)
+    if service is not None:
+        return service
+    
+    _services_ready.wait()
+    service = app.extensions.get(name)
+    if service is None:
+        factory = getattr(importlib.import_module(module), attr)
+        service = factory()
+        app.extensions[name] = service
+    return service
+
+
 def get_agent():
-    from src.medical_agent import get_medical_agent
-    return get_medical_agent()
+    return _get_service('agent', 'src.medical_agent', 'get_medical_agent')
 
 def get_vector_store():
-    from src.vector_store import get_vector_store as _get_vs
-    return _get_vs()
+    return _get_service('vs', 'src.vector_store', 'get_vector_store')
 
 def get_rag_service():
-    from src.rag_service import get_rag_service as _get_rag
-    return _get_rag()
+    return _get_service('rag', 'src.rag_service', 'get_rag_service')
 
 def get_db_client():
-    from src.db_client import get_db_client as _get_db
-    return _get_db()
+    return _get_service('db', 'src.db_client', 'get_db_client')
+
+def get_response_cache():
+    """获取语义响应缓存，未启用时返回 None"""
+    from src.config import RESPONSE_CACHE_CONFIG
+    if not RESPONSE_CACHE_CONFIG["enabled"]:
+        return None
+    return _get_service('cache', 'src.response_cache', 'get_response_cache')
+
+def clear_response_cache():
+    """清空语义响应缓存（数据源变化后调用）"""
+    cache = app.extensions.get('cache')
+    if cache is not None:
+        cache.clear()
 
 def get_db_simulation_functions():
     from src.db_client import (
@@ -45,6 +134,49 @@ def get_db_simulation_functions():
     return set_db_failure_simulation, is_db_failure_simulation_enabled, check_db_connection
 
 
+# 预热只在主进程进行：数据摄取的 spawn 子进程会重新导入 __main__（python app.py 启动时即本模块），
+# 子进程中不启动预热线程，也不应等待服务实例
+if multiprocessing.parent_process() is None:
+    threading.Thread(target=_init_services, name='service-warmup', daemon=True).start()
+else:
+    _services_ready.set()
+
+
+# ==================== 错误处理工具 ====================
+# 同一接口的同类异常每分钟最多记录 10 条完整堆栈
+_error_log_sampler = LogSampler(limit=10, window_seconds=60)
+
+
+def _log_api_error(context: str, e: Exception, endpoint: str = None) -> str:
+    """
+    记录接口异常（按接口和异常类型采样）
+    
+    Returns:
+        请求ID，用于关联客户端错误响应与服务端日志
+    """
+    request_id = uuid.uuid4().hex[:16]
+    endpoint = endpoint or (request.endpoint if has_request_context() else None)
+    allowed, suppressed = _error_log_sampler.allow((endpoint, type(e).__name__))
+    
+    if allowed:
+        if suppressed:
+            logger.warning(f"[API] {context}: 上一分钟已抑制 {suppressed} 条相同异常日志 "
+                           f"endpoint={endpoint} error_type={type(e).__name__}")
+        logger.exception(f"[API] {context}: request_id={request_id} endpoint={endpoint} "
+                         f"error_type={type(e).__name__}", exc_info=e)
+    return request_id
+
+
+def _error_response(context: str, e: Exception):
+    """构建接口异常响应，错误详情只记录在服务端日志中"""
+    request_id = _log_api_error(context, e)
+    return jsonify({
+        "success": False,
+        "error": f"{context}，请稍后重试",
+        "request_id": request_id
+    }), 500
+
+
 # ==================== 页面路由 ====================
 
 @app.route('/')
@@ -55,14 +187,24 @@ def index():
 
 # ==================== API 路由 ====================
 
+# 健康检查响应缓存（探针调用频繁，时间戳按秒级刷新即可）
+_HEALTH_CACHE_TTL_SECONDS = 1.0
+_HEALTH_CACHE = {"ts": 0.0, "body": None}
+
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """健康检查"""
-    return jsonify({
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "service": "医疗知识助手智能体"
-    })
+    now = time.monotonic()
+    if _HEALTH_CACHE["body"] is None or now - _HEALTH_CACHE["ts"] >= _HEALTH_CACHE_TTL_SECONDS:
+        _HEALTH_CACHE["body"] = app.json.dumps({
+            "status": "healthy",
+            "timestamp": datetime.now().isoformat(),
+            "service": "医疗知识助手智能体"
+        })
+        _HEALTH_CACHE["ts"] = now
+    
+    return Response(_HEALTH_CACHE["body"], mimetype='application/json')
 
 
 @app.route('/api/chat', methods=['POST'])
@@ -78,20 +220,105 @@ def chat():
         
         logger.info(f"[API] 对话请求: {message[:50]}...")
         
+        # 语义缓存按患者和对话历史隔离，避免跨患者、跨上下文串用结果
         agent = get_agent()
+        cache = get_response_cache()
+        cache_namespace = ("chat", patient_id or "", agent.history_digest())
+        embedding = None
+        if cache is not None:
+            cached, embedding = cache.lookup(cache_namespace, message)
+            if cached is not None:
+                if cached["record_history"]:
+                    agent.record_cached_turn(message, cached["data"].get("answer", ""))
+                response = jsonify({"success": True, "data": cached["data"]})
+                response.headers['X-Cache'] = 'hit'
+                return response
+        
         result = agent.chat(message, patient_id)
         
-        return jsonify({
+        # 降级模式下的结果不缓存，数据库恢复后应重新查询
+        if cache is not None and result.get("success") and not result.get("db_unavailable"):
+            cache.store(cache_namespace, message, {
+                "data": result,
+                "record_history": agent.last_turn_is(message, result.get("answer", ""))
+            }, embedding)
+        
+        response = jsonify({
             "success": True,
             "data": result
         })
+        response.headers['X-Cache'] = 'miss'
+        return response
         
     except Exception as e:
-        logger.error(f"[API] 对话错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("对话错误", e)
+
+
+@app.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """流式智能对话接口（SSE），不支持 SSE 的客户端请使用 /api/chat"""
+    data = request.get_json()
+    message = data.get('message', '')
+    patient_id = data.get('patient_id')
+    
+    if not message:
+        return jsonify({"error": "消息不能为空"}), 400
+    
+    logger.info(f"[API] 流式对话请求: {message[:50]}...")
+    endpoint = request.endpoint
+    
+    # 与 /api/chat 相同的语义缓存（按患者和对话历史隔离），命中时直接回放意图和完整回答
+    agent = get_agent()
+    cache = get_response_cache()
+    cache_namespace = ("chat_stream", patient_id or "", agent.history_digest())
+    cached, embedding = None, None
+    if cache is not None:
+        cached, embedding = cache.lookup(cache_namespace, message)
+        if cached is not None and cached["record_history"]:
+            agent.record_cached_turn(message, cached["data"]["answer"])
+    
+    def replay(entry):
+        yield {"type": "start", "intent": entry["intent"]}
+        if entry["data"].get("sources"):
+            yield {"type": "sources", "sources": entry["data"]["sources"]}
+        if entry["data"].get("answer"):
+            yield {"type": "delta", "content": entry["data"]["answer"]}
+        yield {"type": "done", "data": entry["data"]}
+    
+    def run_agent():
+        intent = None
+        has_error = False
+        for event in agent.chat_stream(message, patient_id):
+            if event["type"] == "start":
+                intent = event["intent"]
+            elif event["type"] == "delta":
+                has_error = has_error or STREAM_ERROR_MARKER in event["content"]
+            elif event["type"] == "done" and cache is not None:
+                # 只缓存完整且成功结束的流；生成出错或降级模式下的结果不缓存
+                result = event["data"]
+                if result.get("success") and not has_error and not result.get("db_unavailable"):
+                    cache.store(cache_namespace, message, {
+                        "intent": intent,
+                        "data": result,
+                        "record_history": agent.last_turn_is(message, result["answer"])
+                    }, embedding)
+            yield event
+    
+    def generate():
+        try:
+            events = replay(cached) if cached is not None else run_agent()
+            for event in events:
+                yield f"data: {app.json.dumps(event)}\n\n"
+        except Exception as e:
+            request_id = _log_api_error("流式对话错误", e, endpoint)
+            error_event = {"type": "error", "error": "服务器内部错误", "request_id": request_id}
+            yield f"data: {app.json.dumps(error_event)}\n\n"
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['X-Cache'] = 'hit' if cached is not None else 'miss'
+    return response
 
 
 @app.route('/api/patient/<patient_id>', methods=['GET'])
@@ -101,7 +328,7 @@ def get_patient(patient_id):
         logger.info(f"[API] 查询患者: {patient_id}")
         
         agent = get_agent()
-        result = agent.chat(f"查询患者ID={patient_id}的完整信息", patient_id)
+        result = agent.get_patient_report(patient_id)
         
         return jsonify({
             "success": True,
@@ -109,11 +336,7 @@ def get_patient(patient_id):
         })
         
     except Exception as e:
-        logger.error(f"[API] 患者查询错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("患者查询错误", e)
 
 
 @app.route('/api/patient/<patient_id>/risk-assessment', methods=['GET'])
@@ -133,11 +356,7 @@ def get_risk_assessment(patient_id):
         })
         
     except Exception as e:
-        logger.error(f"[API] 风险评估错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("风险评估错误", e)
 
 
 @app.route('/api/search', methods=['POST'])
@@ -153,20 +372,63 @@ def search():
         
         logger.info(f"[API] 检索请求: {query}")
         
+        cache = get_response_cache()
+        cache_namespace = ("search", json.dumps(filters, sort_keys=True, ensure_ascii=False))
+        embedding = None
+        if cache is not None:
+            cached, embedding = cache.lookup(cache_namespace, query)
+            if cached is not None:
+                response = jsonify({"success": True, "data": cached})
+                response.headers['X-Cache'] = 'hit'
+                return response
+        
         rag = get_rag_service()
         result = rag.search(query, filters)
         
-        return jsonify({
+        if cache is not None and result.get("hits"):
+            cache.store(cache_namespace, query, result, embedding)
+        
+        response = jsonify({
             "success": True,
             "data": result
         })
+        response.headers['X-Cache'] = 'miss'
+        return response
         
     except Exception as e:
-        logger.error(f"[API] 检索错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("检索错误", e)
+
+
+# 只读接口响应缓存 {cache_key: (生成时间, etag, body)}
+_ETAG_CACHE_TTL_SECONDS = 60
+_etag_cache = {}
+
+
+def _cached_json_response(cache_key: tuple, build_data):
+    """
+    构建带 ETag 的只读接口响应
+    
+    序列化结果在 TTL 内复用；客户端 If-None-Match 命中时返回 304
+    
+    Args:
+        cache_key: 缓存键（接口名 + 查询参数）
+        build_data: 生成响应 data 字段的函数
+    """
+    now = time.monotonic()
+    entry = _etag_cache.get(cache_key)
+    if entry is None or now - entry[0] >= _ETAG_CACHE_TTL_SECONDS:
+        data = build_data()
+        body = app.json.dumps_bytes({"success": True, "data": data})
+        etag = hashlib.blake2b(body, digest_size=16).hexdigest()
+        entry = (now, etag, body)
+        # 空结果可能来自数据库暂不可用，不缓存
+        if data:
+            _etag_cache[cache_key] = entry
+    
+    response = Response(entry[2], mimetype='application/json')
+    response.set_etag(entry[1])
+    response.headers['Cache-Control'] = f'private, max-age={_ETAG_CACHE_TTL_SECONDS}'
+    return response.make_conditional(request)
 
 
 @app.route('/api/guidelines', methods=['GET'])
@@ -179,19 +441,13 @@ def get_guidelines():
         logger.info(f"[API] 指南查询: disease_type={disease_type}, after={update_date_after}")
         
         db = get_db_client()
-        guidelines = db.get_guideline_recommendations(disease_type, update_date_after)
-        
-        return jsonify({
-            "success": True,
-            "data": guidelines
-        })
+        return _cached_json_response(
+            ("guidelines", disease_type, update_date_after),
+            lambda: db.get_guideline_recommendations(disease_type, update_date_after)
+        )
         
     except Exception as e:
-        logger.error(f"[API] 指南查询错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("指南查询错误", e)
 
 
 @app.route('/api/term-mapping', methods=['GET'])
@@ -199,19 +455,10 @@ def get_term_mapping():
     """获取术语映射表"""
     try:
         agent = get_agent()
-        mapping_table = agent.get_term_mapping_table()
-        
-        return jsonify({
-            "success": True,
-            "data": mapping_table
-        })
+        return _cached_json_response(("term-mapping",), agent.get_term_mapping_table)
         
     except Exception as e:
-        logger.error(f"[API] 术语映射错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("术语映射错误", e)
 
 
 @app.route('/api/term-normalize', methods=['POST'])
@@ -241,11 +488,7 @@ def normalize_term():
         })
         
     except Exception as e:
-        logger.error(f"[API] 术语标准化错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("术语标准化错误", e)
 
 
 @app.route('/api/insulin-analysis', methods=['GET'])
@@ -261,11 +504,7 @@ def get_insulin_analysis():
         })
         
     except Exception as e:
-        logger.error(f"[API] 胰岛素分析错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("胰岛素分析错误", e)
 
 
 @app.route('/api/pdf-structure', methods=['GET'])
@@ -273,19 +512,10 @@ def get_pdf_structure():
     """获取PDF目录结构"""
     try:
         agent = get_agent()
-        structure = agent.get_pdf_structure()
-        
-        return jsonify({
-            "success": True,
-            "data": structure
-        })
+        return _cached_json_response(("pdf-structure",), agent.get_pdf_structure)
         
     except Exception as e:
-        logger.error(f"[API] PDF结构获取错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("PDF结构获取错误", e)
 
 
 @app.route('/api/index/rebuild', methods=['POST'])
@@ -296,6 +526,8 @@ def rebuild_index():
         
         logger.info("[API] 开始重建索引...")
         result = _rebuild()
+        if result["success"]:
+            clear_response_cache()
         
         return jsonify({
             "success": result["success"],
@@ -303,11 +535,7 @@ def rebuild_index():
         })
         
     except Exception as e:
-        logger.error(f"[API] 索引重建错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("索引重建错误", e)
 
 
 @app.route('/api/index/status', methods=['GET'])
@@ -318,6 +546,7 @@ def get_index_status():
         
         status = {
             "has_index": vs.index is not None,
+            "index_type": vs.index_type,
             "last_update": vs.last_update_time.isoformat() if vs.last_update_time else None,
             "persist_path": str(vs.persist_path)
         }
@@ -328,11 +557,7 @@ def get_index_status():
         })
         
     except Exception as e:
-        logger.error(f"[API] 索引状态查询错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("索引状态查询错误", e)
 
 
 @app.route('/api/clear-history', methods=['POST'])
@@ -348,11 +573,7 @@ def clear_history():
         })
         
     except Exception as e:
-        logger.error(f"[API] 清空历史错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("清空历史错误", e)
 
 
 # ==================== 数据库模拟故障控制 ====================
@@ -372,11 +593,7 @@ def get_db_status():
         })
         
     except Exception as e:
-        logger.error(f"[API] 数据库状态查询错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("数据库状态查询错误", e)
 
 
 @app.route('/api/db/simulate-failure', methods=['POST'])
@@ -389,6 +606,7 @@ def toggle_db_failure_simulation():
         set_simulation, is_simulation_enabled, check_connection = get_db_simulation_functions()
         
         set_simulation(enabled)
+        clear_response_cache()
         status = "启用" if enabled else "禁用"
         logger.info(f"[API] 数据库故障模拟已{status}")
         
@@ -405,11 +623,7 @@ def toggle_db_failure_simulation():
         })
         
     except Exception as e:
-        logger.error(f"[API] 数据库故障模拟设置错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("数据库故障模拟设置错误", e)
 
 
 @app.route('/api/db/test-connection', methods=['GET'])
@@ -431,11 +645,7 @@ def test_db_connection():
         })
         
     except Exception as e:
-        logger.error(f"[API] 数据库连接测试错误: {str(e)}")
-        return jsonify({
-            "success": False,
-            "error": str(e)
-        }), 500
+        return _error_response("数据库连接测试错误", e)
 
 
 # ==================== 错误处理 ====================
@@ -451,6 +661,8 @@ def server_error(e):
 
 
 # ==================== 启动 ====================
+# 生产环境请使用 gunicorn 启动: gunicorn -c gunicorn.conf.py app:app
+# 直接运行 python app.py 仅用于本地开发调试
 
 if __name__ == '__main__':
     # 检查环境变量
@@ -463,5 +675,5 @@ if __name__ == '__main__':
     
     # 启动服务
     logger.info("医疗知识助手智能体启动中...")
-    app.run(host='0.0.0.0', port=5001, debug=True)
+    app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
 
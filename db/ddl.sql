@@ -32,6 +32,7 @@ CREATE TABLE IF NOT EXISTS medical_records (
     doctor_id INT,
     hospital VARCHAR(100),
     department VARCHAR(50),
+    INDEX ix_mr_pid_vd (patient_id, visit_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE
 );
 
@@ -48,6 +49,7 @@ CREATE TABLE IF NOT EXISTS lab_results (
     reference_range VARCHAR(50),
     is_abnormal BOOLEAN,
     test_notes TEXT,
+    INDEX ix_lr_pid_td (patient_id, test_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE,
     FOREIGN KEY (record_id) REFERENCES medical_records(record_id) ON DELETE SET NULL
 );
@@ -65,6 +67,7 @@ CREATE TABLE IF NOT EXISTS medication_records (
     duration VARCHAR(50),
     prescribing_doctor VARCHAR(50),
     is_insulin BOOLEAN DEFAULT FALSE,
+    INDEX ix_med_pid_md (patient_id, medication_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE,
     FOREIGN KEY (record_id) REFERENCES medical_records(record_id) ON DELETE SET NULL
 );
@@ -80,6 +83,7 @@ CREATE TABLE IF NOT EXISTS diagnosis_records (
     diagnosis_type ENUM('主要诊断', '次要诊断', '并发症') NOT NULL,
     severity_level ENUM('轻度', '中度', '重度', '危急') DEFAULT '中度',
     icd10_code VARCHAR(20),
+    INDEX ix_dr_pid_dd (patient_id, diagnosis_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE,
     FOREIGN KEY (record_id) REFERENCES medical_records(record_id) ON DELETE CASCADE
 );
@@ -97,6 +101,7 @@ CREATE TABLE IF NOT EXISTS hypertension_risk_assessment (
     clinical_conditions TEXT COMMENT '临床疾患',
     risk_level ENUM('低危', '中危', '高危', '很高危') NOT NULL,
     follow_up_plan TEXT,
+    INDEX ix_hra_pid_ad (patient_id, assessment_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE
 );
 
@@ -113,9 +118,18 @@ CREATE TABLE IF NOT EXISTS diabetes_control_assessment (
     insulin_dosage VARCHAR(50),
     control_status ENUM('良好', '一般', '不佳') NOT NULL,
     complications TEXT,
+    INDEX ix_dca_pid_ad (patient_id, assessment_date DESC),
     FOREIGN KEY (patient_id) REFERENCES patient_info(patient_id) ON DELETE CASCADE
 );
 
+-- 已有数据库补建按患者+日期倒序的复合索引（按患者查询并 ORDER BY 日期 DESC 时避免 filesort）：
+-- CREATE INDEX ix_mr_pid_vd ON medical_records (patient_id, visit_date DESC);
+-- CREATE INDEX ix_lr_pid_td ON lab_results (patient_id, test_date DESC);
+-- CREATE INDEX ix_med_pid_md ON medication_records (patient_id, medication_date DESC);
+-- CREATE INDEX ix_dr_pid_dd ON diagnosis_records (patient_id, diagnosis_date DESC);
+-- CREATE INDEX ix_hra_pid_ad ON hypertension_risk_assessment (patient_id, assessment_date DESC);
+-- CREATE INDEX ix_dca_pid_ad ON diabetes_control_assessment (patient_id, assessment_date DESC);
+
 -- 指南推荐规则表
 CREATE TABLE IF NOT EXISTS guideline_recommendations (
     rule_id INT PRIMARY KEY AUTO_INCREMENT,
@@ -126,8 +140,12 @@ CREATE TABLE IF NOT EXISTS guideline_recommendations (
     recommendation_content TEXT NOT NULL,
     evidence_source VARCHAR(200),
     update_date DATE,
-    is_active BOOLEAN DEFAULT TRUE
+    is_active BOOLEAN DEFAULT TRUE,
+    -- 关键词检索使用的全文索引（ngram 分词支持中文）
+    FULLTEXT KEY idx_grec_ft (recommendation_content, patient_condition, guideline_name) WITH PARSER ngram
 );
+-- 已有数据库补建全文索引：
+-- ALTER TABLE guideline_recommendations ADD FULLTEXT idx_grec_ft (recommendation_content, patient_condition, guideline_name) WITH PARSER ngram;
 
 -- 系统日志表
 CREATE TABLE IF NOT EXISTS system_logs (
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+"""
+Gunicorn 配置文件 - 生产环境 WSGI 服务
+
+启动方式: gunicorn -c gunicorn.conf.py app:app
+"""
+import multiprocessing
+import os
+
+# ===================== 监听配置 =====================
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:5001")
+
+# ===================== 并发配置 =====================
+# 接口以等待百炼 LLM 和 MySQL 为主（I/O 密集），使用 gthread 线程工作模式重叠请求
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+workers = int(os.getenv("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+threads = int(os.getenv("GUNICORN_THREADS", 16))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", 1000))
+
+# LLM 生成耗时较长，放宽超时时间
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+keepalive = 5
+
+# ===================== 日志配置 =====================
+accesslog = "-"
+errorlog = "-"
+loglevel = "info"
@@ -10,6 +10,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 DATA_DIR = BASE_DIR / "data"
 KNOWLEDGE_BASE_DIR = BASE_DIR / "knowledge_base"
 LOG_DIR = BASE_DIR / "logs"
+INGEST_CACHE_DIR = DATA_DIR / ".cache"  # 解析结果缓存（Parquet），源文件更新后自动失效
 
 # 确保目录存在
 KNOWLEDGE_BASE_DIR.mkdir(exist_ok=True)
@@ -19,18 +20,92 @@ LOG_DIR.mkdir(exist_ok=True)
 DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
 DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
 LLM_MODEL = "qwen-plus-latest"
+# LLM 前缀缓存：百炼对相同前缀的请求自动启用上下文缓存；若改用自部署的 vLLM
+# 兼容服务，需以 --enable-prefix-caching 启动。为保证命中，系统提示词与各提示词模板
+# 的固定部分必须逐字节一致（不得包含时间戳等可变内容），用户输入一律放在末尾。
+# 开启显式缓存后系统提示词会带上 cache_control 标记，由百炼创建显式缓存（命中费率更低，
+# 但创建时按更高费率计费，且前缀需达到模型要求的最小 token 数才生效）
+LLM_EXPLICIT_PREFIX_CACHE = os.getenv("DASHSCOPE_EXPLICIT_CACHE", "false").lower() == "true"
 EMBEDDING_MODEL = "text-embedding-v2"
 
+# 百炼 HTTP 连接池配置（复用 TCP/TLS 连接，避免每次调用重新握手）
+DASHSCOPE_HTTP_CONFIG = {
+    "max_connections": 50,
+    "max_keepalive_connections": 50,
+    "keepalive_expiry": 60,
+    "timeout": 120,
+    "max_retries": 3,
+    "http2": os.getenv("DASHSCOPE_HTTP2", "true").lower() == "true",  # 单连接多路复用（需安装 h2）
+    "max_parallel_requests": 8,  # generate_many 的最大并发请求数
+    # 令牌桶限流：平均每秒请求数与突发容量，避免触发 429（DASHSCOPE_RATE_LIMIT<=0 表示不限流）
+    "rate_limit_per_second": float(os.getenv("DASHSCOPE_RATE_LIMIT", 10)),
+    "rate_limit_burst": 20
+}
+
+# LLM 调用结果缓存（模型 + 温度 + 完整消息列表相同时直接复用回复，跳过 API 调用）
+LLM_CACHE_CONFIG = {
+    "enabled": os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true",
+    "max_entries": 2048,
+    "ttl_seconds": 3600
+}
+
+# 查询向量微批处理配置（并发请求合并为一次 embedding 调用，text-embedding-v2 单次最多 25 条）
+EMBEDDING_BATCH_CONFIG = {
+    "max_batch_size": 25,
+    "max_wait_ms": 10
+}
+
 # ===================== MySQL 数据库配置 =====================
+# 连接信息从环境变量读取，密码不得写入代码
 MYSQL_CONFIG = {
-    "host": "rm-bp1y35g510t57uexqlo.mysql.rds.aliyuncs.com",
-    "port": 3306,
-    "user": "logcloud",
-    "password": "Logcloud4321",
-    "database": "medical_knowledge_base",
+    "host": os.getenv("MYSQL_HOST", "rm-bp1y35g510t57uexqlo.mysql.rds.aliyuncs.com"),
+    "port": int(os.getenv("MYSQL_PORT", 3306)),
+    "user": os.getenv("MYSQL_USER", "logcloud"),
+    "password": os.getenv("MYSQL_PASSWORD", ""),
+    "database": os.getenv("MYSQL_DATABASE", "medical_knowledge_base"),
     "charset": "utf8mb4"
 }
 
+# MySQL 连接池配置（DBUtils PooledDB）
+MYSQL_POOL_CONFIG = {
+    "mincached": 2,         # 启动时预建的空闲连接数
+    "maxcached": 8,         # 池中最多保留的空闲连接数
+    "maxconnections": 16,   # 最大连接数，超出时阻塞等待
+}
+
+# 允许多语句的独立小连接池，仅供一次往返取回完整患者档案的查询使用；默认连接池保持单语句
+MYSQL_MULTI_STATEMENT_POOL_CONFIG = {
+    "mincached": 0,
+    "maxcached": 2,
+    "maxconnections": 4,
+}
+
+# 数据库只读查询缓存（患者基本信息、指南推荐规则）
+DB_QUERY_CACHE_CONFIG = {
+    "max_entries": 512,
+    "ttl_seconds": 300
+}
+
+# 指南推荐关键词检索（全文索引相关度 relevance 归一化为 relevance / (relevance + half_saturation)，
+# 与向量检索的余弦得分在同一 0~1 区间比较，低于 min_score 的行不返回）
+DB_SEARCH_CONFIG = {
+    "limit": 10,
+    "relevance_half_saturation": float(os.getenv("DB_SEARCH_RELEVANCE_HALF", 5.0)),
+    "min_score": 0.3,
+    # 无全文索引时退回 LIKE 子串匹配，命中即视为高相关
+    "like_match_score": 0.8
+}
+
+# 对话路径上数据库连接状态检查结果的缓存时间（秒），突发请求共享同一次探测
+DB_STATUS_CACHE_SECONDS = 2
+
+# 系统操作日志异步写入配置（后台线程批量 executemany）
+SYSTEM_LOG_CONFIG = {
+    "queue_size": 10000,    # 待写入队列上限，满时丢弃新日志
+    "max_batch_size": 200,
+    "max_wait_ms": 100
+}
+
 # ===================== 数据库异常模拟配置 =====================
 # 设置为 True 可模拟数据库连接失败，用于测试系统的优雅降级功能
 SIMULATE_DB_FAILURE = os.getenv("SIMULATE_DB_FAILURE", "false").lower() == "true"
@@ -39,12 +114,38 @@ SIMULATE_DB_FAILURE = os.getenv("SIMULATE_DB_FAILURE", "false").lower() == "true
 RAG_CONFIG = {
     "chunk_size": 500,
     "chunk_overlap": 50,
-    "top_k": 5,
-    "similarity_threshold": 0.3
+    "top_k": int(os.getenv("RAG_TOP_K", 5)),
+    "similarity_threshold": 0.3,  # 余弦相似度阈值（向量已归一化，直接比较内积得分）
+    # FAISS HNSW 索引参数（内积度量，text-embedding-v2 向量维度 1536）
+    "embedding_dim": 1536,
+    "hnsw_m": 32,
+    "hnsw_ef_construction": 200,
+    "hnsw_ef_search": int(os.getenv("RAG_EFSEARCH", 64)),
+    # 跨源检索线程数（向量检索、数据库关键词检索、指南过滤并行执行）
+    "search_workers": 4,
+    # 向量检索结果缓存（按查询文本，索引重建或重新加载时清空）
+    "search_cache_entries": 512,
+    "search_cache_ttl_seconds": 600
+}
+
+# ===================== 智能体配置 =====================
+AGENT_CONFIG = {
+    "io_workers": 8,  # 对话处理中并发执行 I/O（患者画像查询、LLM 调用）的线程数
+    "history_messages": 4  # 保留并传给 LLM 的最近对话消息数（2 轮）
+}
+
+# ===================== 响应缓存配置 =====================
+# 语义相近的重复查询直接复用结果，跳过检索与 LLM 生成
+RESPONSE_CACHE_CONFIG = {
+    "enabled": os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true",
+    "max_entries": 10000,
+    "ttl_seconds": 600,
+    "similarity_threshold": 0.95
 }
 
 # ===================== 索引更新配置 =====================
-INDEX_UPDATE_INTERVAL_MINUTES = 2  # 索引更新间隔(分钟)
+# 仅在数据源文件变化或被显式标记时重建索引，定时任务只做廉价的变化检查
+INDEX_CHECK_INTERVAL_SECONDS = 60  # 数据源变化检查间隔(秒)
 
 # ===================== 日志配置 =====================
 LOG_CONFIG = {
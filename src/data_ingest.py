@@ -2,19 +2,48 @@
 """
 数据摄取模块 - PDF/Excel/MySQL 数据加载与解析
 """
+import copy
+import itertools
 import logging
+import multiprocessing
+import os
 import re
-from typing import List, Dict, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Tuple
 from pathlib import Path
 from datetime import datetime
 
-import pandas as pd
-import pdfplumber
+import numpy as np
 
-from src.config import PDF_FILES, EXCEL_FILE, DATA_DIR
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas / pdfplumber 导入耗时较长，在实际解析时才导入
+
+from src.config import PDF_FILES, EXCEL_FILE, DATA_DIR, INGEST_CACHE_DIR
 
 logger = logging.getLogger(__name__)
 
+# 目录行匹配："第X章 标题" 或 "X.X 标题" 格式
+_CHAPTER_RE = re.compile(r'^第?([一二三四五六七八九十\d]+)[章节]?\s*[\.、]?\s*(.+?)(?:\s*\.{2,}\s*(\d+))?$')
+_SECTION_RE = re.compile(r'^(\d+\.?\d*)\s+(.+?)(?:\s*\.{2,}\s*(\d+))?$')
+_CHINESE_NUMERALS = frozenset("一二三四五六七八九十")
+# 目录页至少包含一个数字或中文数字，否则整页跳过
+_TOC_TRIGGER_CHARS = _CHINESE_NUMERALS | frozenset("0123456789０１２３４５６７８９")
+
+# Excel 显式列类型（ID/姓名类列按字符串读取，跳过类型推断）
+EXCEL_DTYPES = {"病人诊疗号": str, "姓名": str}
+
+# 年龄段分箱边界与标签
+AGE_BIN_EDGES = np.array([0, 40, 50, 60, 70, 100], dtype=np.float64)
+AGE_BIN_LABELS = ('<40岁', '40-50岁', '50-60岁', '60-70岁', '>70岁')
+
+# Excel 读取缓存 {路径: (文件修改时间, DataFrame)}，文件更新后自动重新读取
+_EXCEL_CACHE: Dict[Path, Tuple[float, "pd.DataFrame"]] = {}
+
+# 分析结果缓存 {名称: (源文件签名, 结果)}，源文件新增、删除或修改后自动重新计算
+_RESULT_CACHE: Dict[str, Tuple[Tuple, Dict]] = {}
+
 
 class PDFProcessor:
     """PDF 文档处理器"""
@@ -23,33 +52,81 @@ class PDFProcessor:
         self.pdf_path = pdf_path
         self.filename = pdf_path.name
     
-    def extract_text_with_pages(self) -> List[Dict]:
+    def extract_all(self, text: bool = True, tables: bool = True, toc: bool = True,
+                    page_range: Optional[Tuple[int, int]] = None) -> Dict[str, List[Dict]]:
         """
-        提取 PDF 文本及页码信息
+        单次打开 PDF，逐页同时提取文本、表格和目录
         
+        每页的 extract_text() 与 extract_tables() 各只调用一次，目录复用前10页的文本，
+        避免多次 pdfplumber.open 重复解析页面对象。
+        
+        Args:
+            text: 是否提取文本
+            tables: 是否提取表格
+            toc: 是否提取目录（通常目录在前10页）
+            page_range: 只处理 [start, end) 范围内的页（从0开始），默认处理全部页
+            
         Returns:
-            [{"page": int, "text": str, "source": str}]
+            {"text": [...], "tables": [...], "toc": [...], "complete": bool}，各项结构同对应的 extract_* 方法；
+            解析中途出错时返回已提取的部分，complete 为 False
         """
-        chunks = []
+        import pdfplumber
+        
+        result = {"text": [], "tables": [], "toc": [], "complete": True}
         try:
             with pdfplumber.open(self.pdf_path) as pdf:
-                logger.info(f"[PDF解析] 开始处理: {self.filename}, 共 {len(pdf.pages)} 页")
+                start, end = page_range or (0, len(pdf.pages))
+                logger.info(f"[PDF解析] 开始处理: {self.filename}, 第 {start + 1}-{end} 页, 共 {len(pdf.pages)} 页")
                 
-                for i, page in enumerate(pdf.pages):
-                    text = page.extract_text()
-                    if text and text.strip():
-                        chunks.append({
+                for i, page in enumerate(pdf.pages[start:end], start=start):
+                    scan_toc = toc and i < 10
+                    if not (text or tables or scan_toc):
+                        break
+                    
+                    page_text = page.extract_text() if (text or scan_toc) else None
+                    
+                    if text and page_text and page_text.strip():
+                        result["text"].append({
                             "page": i + 1,
-                            "text": text.strip(),
+                            "text": page_text.strip(),
                             "source": self.filename,
                             "source_type": "pdf"
                         })
+                    
+                    if tables:
+                        for j, table in enumerate(page.extract_tables()):
+                            if table and len(table) > 1:
+                                result["tables"].append({
+                                    "page": i + 1,
+                                    "table_index": j,
+                                    "data": table,
+                                    "source": self.filename,
+                                    "source_type": "pdf_table"
+                                })
+                    
+                    if scan_toc and page_text:
+                        result["toc"].extend(self._parse_toc_lines(page_text, i + 1))
                 
-                logger.info(f"[PDF解析] 完成: {self.filename}, 提取 {len(chunks)} 个文本块")
+                if text:
+                    logger.info(f"[PDF解析] 完成: {self.filename}, 提取 {len(result['text'])} 个文本块")
+                if tables:
+                    logger.info(f"[PDF表格] {self.filename}: 提取 {len(result['tables'])} 个表格")
+                if toc:
+                    logger.info(f"[PDF目录] {self.filename}: 提取 {len(result['toc'])} 个目录项")
         except Exception as e:
             logger.error(f"[PDF解析] 失败: {self.filename}, 错误: {str(e)}")
+            result["complete"] = False
         
-        return chunks
+        return result
+    
+    def extract_text_with_pages(self) -> List[Dict]:
+        """
+        提取 PDF 文本及页码信息
+        
+        Returns:
+            [{"page": int, "text": str, "source": str}]
+        """
+        return self.extract_all(tables=False, toc=False)["text"]
     
     def extract_tables(self) -> List[Dict]:
         """
@@ -58,26 +135,7 @@ class PDFProcessor:
         Returns:
             [{"page": int, "table_index": int, "data": list, "source": str}]
         """
-        tables = []
-        try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages):
-                    page_tables = page.extract_tables()
-                    for j, table in enumerate(page_tables):
-                        if table and len(table) > 1:
-                            tables.append({
-                                "page": i + 1,
-                                "table_index": j,
-                                "data": table,
-                                "source": self.filename,
-                                "source_type": "pdf_table"
-                            })
-                
-                logger.info(f"[PDF表格] {self.filename}: 提取 {len(tables)} 个表格")
-        except Exception as e:
-            logger.error(f"[PDF表格] 提取失败: {str(e)}")
-        
-        return tables
+        return self.extract_all(text=False, toc=False)["tables"]
     
     def extract_toc(self) -> List[Dict]:
         """
@@ -86,39 +144,41 @@ class PDFProcessor:
         Returns:
             [{"level": int, "title": str, "page": int}]
         """
+        return self.extract_all(text=False, tables=False)["toc"]
+    
+    def _parse_toc_lines(self, text: str, page: int) -> List[Dict]:
+        """从单页文本中匹配目录项"""
         toc = []
-        try:
-            with pdfplumber.open(self.pdf_path) as pdf:
-                for i, page in enumerate(pdf.pages[:10]):  # 通常目录在前10页
-                    text = page.extract_text()
-                    if text:
-                        # 匹配常见目录格式
-                        lines = text.split('\n')
-                        for line in lines:
-                            # 匹配 "第X章 标题" 或 "X.X 标题" 格式
-                            chapter_match = re.match(r'^第?([一二三四五六七八九十\d]+)[章节]?\s*[\.、]?\s*(.+?)(?:\s*\.{2,}\s*(\d+))?$', line.strip())
-                            section_match = re.match(r'^(\d+\.?\d*)\s+(.+?)(?:\s*\.{2,}\s*(\d+))?$', line.strip())
-                            
-                            if chapter_match:
-                                toc.append({
-                                    "level": 1,
-                                    "title": chapter_match.group(2).strip(),
-                                    "page": i + 1,
-                                    "source": self.filename
-                                })
-                            elif section_match:
-                                level = len(section_match.group(1).split('.'))
-                                toc.append({
-                                    "level": level,
-                                    "title": section_match.group(2).strip(),
-                                    "page": i + 1,
-                                    "source": self.filename
-                                })
-                
-                logger.info(f"[PDF目录] {self.filename}: 提取 {len(toc)} 个目录项")
-        except Exception as e:
-            logger.error(f"[PDF目录] 提取失败: {str(e)}")
+        if _TOC_TRIGGER_CHARS.isdisjoint(text):
+            return toc
         
+        # 匹配常见目录格式
+        lines = text.split('\n')
+        for line in lines:
+            stripped = line.strip()
+            # 目录行必须以数字（可带"第"前缀）开头，其余行无需进入正则
+            head = stripped[1:2] if stripped.startswith('第') else stripped[:1]
+            if not head or not (head.isdecimal() or head in _CHINESE_NUMERALS):
+                continue
+            
+            chapter_match = _CHAPTER_RE.match(stripped)
+            section_match = None if chapter_match else _SECTION_RE.match(stripped)
+            
+            if chapter_match:
+                toc.append({
+                    "level": 1,
+                    "title": chapter_match.group(2).strip(),
+                    "page": page,
+                    "source": self.filename
+                })
+            elif section_match:
+                level = len(section_match.group(1).split('.'))
+                toc.append({
+                    "level": level,
+                    "title": section_match.group(2).strip(),
+                    "page": page,
+                    "source": self.filename
+                })
         return toc
 
 
@@ -128,14 +188,25 @@ class ExcelProcessor:
     def __init__(self, excel_path: Path):
         self.excel_path = excel_path
         self.filename = excel_path.name
-        self.df: Optional[pd.DataFrame] = None
+        self.df: Optional["pd.DataFrame"] = None
     
-    def load_data(self) -> pd.DataFrame:
-        """加载 Excel 数据"""
+    def load_data(self) -> "pd.DataFrame":
+        """加载 Excel 数据（按路径缓存，文件未修改时不重复解析）"""
+        import pandas as pd
+        
         try:
-            self.df = pd.read_excel(self.excel_path)
-            logger.info(f"[Excel加载] {self.filename}: {len(self.df)} 行, {len(self.df.columns)} 列")
-            logger.info(f"[Excel列名] {list(self.df.columns)}")
+            mtime = self.excel_path.stat().st_mtime
+            cached = _EXCEL_CACHE.get(self.excel_path)
+            if cached is None or cached[0] != mtime:
+                df = pd.read_excel(self.excel_path, dtype=EXCEL_DTYPES, engine="openpyxl")
+                _EXCEL_CACHE[self.excel_path] = (mtime, df)
+                logger.info(f"[Excel加载] {self.filename}: {len(df)} 行, {len(df.columns)} 列")
+                logger.info(f"[Excel列名] {list(df.columns)}")
+            else:
+                df = cached[1]
+            
+            # 浅拷贝：分析时新增的派生列不写回缓存
+            self.df = df.copy(deep=False)
             return self.df
         except Exception as e:
             logger.error(f"[Excel加载] 失败: {str(e)}")
@@ -152,6 +223,8 @@ class ExcelProcessor:
         Returns:
             分析结果字典
         """
+        import pandas as pd
+        
         if self.df is None:
             self.load_data()
         
@@ -177,19 +250,16 @@ class ExcelProcessor:
         
         # 计算胰岛素使用情况
         if fasting_insulin_col or postprandial_insulin_col:
-            # 判断是否使用胰岛素：两列都为空则未使用
-            def is_using_insulin(row):
-                fasting = row.get(fasting_insulin_col) if fasting_insulin_col else None
-                postprandial = row.get(postprandial_insulin_col) if postprandial_insulin_col else None
-                
-                fasting_empty = pd.isna(fasting) or fasting == '' or fasting == 0
-                postprandial_empty = pd.isna(postprandial) or postprandial == '' or postprandial == 0
-                
-                return not (fasting_empty and postprandial_empty)
+            # 判断是否使用胰岛素：两列都为空则未使用（按列整体计算掩码）
+            def empty_mask(col) -> "pd.Series":
+                if not col:
+                    return pd.Series(True, index=self.df.index)
+                values = self.df[col]
+                return values.isna() | (values == '') | (values == 0)
             
-            self.df['使用胰岛素'] = self.df.apply(is_using_insulin, axis=1)
+            self.df['使用胰岛素'] = ~(empty_mask(fasting_insulin_col) & empty_mask(postprandial_insulin_col))
             
-            insulin_users = self.df['使用胰岛素'].sum()
+            insulin_users = int(self.df['使用胰岛素'].sum())
             non_users = len(self.df) - insulin_users
             
             result["insulin_usage"] = {
@@ -211,14 +281,16 @@ class ExcelProcessor:
             
             # 按性别的胰岛素使用率
             if '使用胰岛素' in self.df.columns:
-                gender_insulin = self.df.groupby(gender_col)['使用胰岛素'].agg(['sum', 'count'])
+                grouped = self.df.groupby(gender_col)['使用胰岛素']
+                sums = grouped.sum()
+                counts = grouped.size()
                 result["insulin_by_gender"] = {
                     str(gender): {
-                        "using": int(row['sum']),
-                        "total": int(row['count']),
-                        "rate": round(row['sum'] / row['count'] * 100, 2)
+                        "using": int(using),
+                        "total": int(total),
+                        "rate": round(float(using) / total * 100, 2)
                     }
-                    for gender, row in gender_insulin.iterrows()
+                    for gender, using, total in zip(sums.index, sums.to_numpy(), counts.to_numpy())
                 }
         
         # 年龄分布
@@ -229,19 +301,20 @@ class ExcelProcessor:
                 break
         
         if age_col:
+            # 年龄列一次性转为连续的 float64 数组，统计量与分箱均在该数组上计算
+            ages = self.df[age_col].to_numpy(dtype=np.float64)
             result["age_statistics"] = {
-                "mean": round(float(self.df[age_col].mean()), 1),
-                "min": int(self.df[age_col].min()),
-                "max": int(self.df[age_col].max()),
-                "std": round(float(self.df[age_col].std()), 1)
+                "mean": round(float(np.nanmean(ages)), 1),
+                "min": int(np.nanmin(ages)),
+                "max": int(np.nanmax(ages)),
+                "std": round(float(np.nanstd(ages, ddof=1)), 1)
             }
             
-            # 年龄段分布
-            bins = [0, 40, 50, 60, 70, 100]
-            labels = ['<40岁', '40-50岁', '50-60岁', '60-70岁', '>70岁']
-            self.df['年龄段'] = pd.cut(self.df[age_col], bins=bins, labels=labels, right=False)
-            age_dist = self.df['年龄段'].value_counts().sort_index().to_dict()
-            result["age_distribution"] = {str(k): int(v) for k, v in age_dist.items()}
+            # 年龄段分布（左闭右开区间，超出 [0, 100) 或缺失的年龄不计入）
+            bin_index = np.searchsorted(AGE_BIN_EDGES, ages, side='right') - 1
+            valid = (bin_index >= 0) & (bin_index < len(AGE_BIN_LABELS)) & ~np.isnan(ages)
+            counts = np.bincount(bin_index[valid], minlength=len(AGE_BIN_LABELS))
+            result["age_distribution"] = {label: int(count) for label, count in zip(AGE_BIN_LABELS, counts)}
         
         logger.info(f"[Excel分析] 胰岛素使用率分析完成")
         return result
@@ -275,43 +348,159 @@ class ExcelProcessor:
         if self.df is None:
             self.load_data()
         
-        chunks = []
         if self.df is None or self.df.empty:
-            return chunks
+            return []
         
-        for i in range(0, len(self.df), chunk_size):
-            chunk_df = self.df.iloc[i:i+chunk_size]
-            text = f"糖尿病病例统计数据 (行 {i+1}-{min(i+chunk_size, len(self.df))}):\n"
-            text += chunk_df.to_string()
-            
-            chunks.append({
-                "text": text,
+        # 整表一次性转为制表符分隔的文本行，各块直接切片拼接
+        header = "\t".join(map(str, self.df.columns))
+        lines = ["\t".join(row) for row in self.df.astype(str).to_numpy()]
+        total = len(lines)
+        
+        return [
+            {
+                "text": f"糖尿病病例统计数据 (行 {i+1}-{min(i+chunk_size, total)}):\n"
+                        f"{header}\n" + "\n".join(lines[i:i+chunk_size]),
                 "source": self.filename,
                 "source_type": "excel",
                 "row_start": i + 1,
-                "row_end": min(i + chunk_size, len(self.df))
-            })
-        
+                "row_end": min(i + chunk_size, total)
+            }
+            for i in range(0, total, chunk_size)
+        ]
+
+
+def _pdf_text_cache_file(pdf_path: Path) -> Path:
+    """PDF 文本解析结果的 Parquet 缓存路径"""
+    return INGEST_CACHE_DIR / f"{pdf_path.stem}.parquet"
+
+
+def _read_pdf_text_cache(pdf_path: Path) -> Optional[List[Dict]]:
+    """读取 PDF 文本缓存，缓存不存在或早于源文件时返回 None"""
+    import pandas as pd
+    
+    cache_file = _pdf_text_cache_file(pdf_path)
+    try:
+        if not cache_file.exists() or cache_file.stat().st_mtime < pdf_path.stat().st_mtime:
+            return None
+        chunks = pd.read_parquet(cache_file, memory_map=True).to_dict("records")
+        logger.info(f"[PDF缓存] 命中: {pdf_path.name}, {len(chunks)} 个文本块")
         return chunks
+    except Exception as e:
+        logger.warning(f"[PDF缓存] 读取失败，重新解析: {pdf_path.name}, 错误: {str(e)}")
+        return None
 
 
-def load_all_pdf_documents() -> List[Dict]:
-    """加载所有 PDF 文档"""
-    all_chunks = []
+def _write_pdf_text_cache(pdf_path: Path, chunks: List[Dict]):
+    """写入 PDF 文本缓存（先写临时文件再替换，避免读到半成品）"""
+    import pandas as pd
+    
+    cache_file = _pdf_text_cache_file(pdf_path)
+    tmp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}.tmp")
+    try:
+        INGEST_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(chunks).to_parquet(tmp_file, compression="zstd", index=False)
+        os.replace(tmp_file, cache_file)
+    except Exception as e:
+        logger.warning(f"[PDF缓存] 写入失败: {pdf_path.name}, 错误: {str(e)}")
+        tmp_file.unlink(missing_ok=True)
+
+
+# 按页拆分文本提取任务时每个任务的最少页数（每个任务需重新打开一次 PDF）
+MIN_PAGES_PER_TASK = 8
+
+
+def _pdf_page_count(pdf_path: Path) -> int:
+    """读取 PDF 页数（只解析页面树，不提取页面内容）"""
+    import pdfplumber
+    
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+    except Exception as e:
+        logger.error(f"[PDF解析] 读取页数失败: {pdf_path.name}, 错误: {str(e)}")
+        return 0
+
+
+def _extract_pdf_text_worker(pdf_path: Path, start: int, end: int) -> Optional[List[Dict]]:
+    """子进程任务：提取单个 PDF 中 [start, end) 页的文本，解析失败时返回 None"""
+    extracted = PDFProcessor(pdf_path).extract_all(tables=False, toc=False, page_range=(start, end))
+    return extracted["text"] if extracted["complete"] else None
+
+
+def _extract_pdf_structure_worker(pdf_path: Path) -> Tuple[List[Dict], List[Dict]]:
+    """子进程任务：提取单个 PDF 的目录和表格"""
+    structure = PDFProcessor(pdf_path).extract_all(text=False)
+    return structure["toc"], structure["tables"]
+
+
+def _run_in_processes(worker: Callable, tasks: List[Tuple]) -> List:
+    """
+    并行执行 PDF 解析任务（pdfplumber 解析为 CPU 密集型，受 GIL 限制）
     
+    多个任务时使用 spawn 方式的进程池，避免在多线程 Web 进程中 fork；
+    单个任务直接在当前进程执行。结果顺序与任务顺序一致。
+    """
+    if len(tasks) <= 1:
+        return [worker(*task) for task in tasks]
+    
+    max_workers = min(len(tasks), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=max_workers,
+                             mp_context=multiprocessing.get_context("spawn")) as executor:
+        return list(executor.map(worker, *zip(*tasks)))
+
+
+def _split_page_tasks(pdf_paths: List[Path]) -> List[Tuple[Path, int, int]]:
+    """将各 PDF 按页拆分为 (路径, 起始页, 结束页) 任务，使单个大文件也能多核并行"""
+    workers = os.cpu_count() or 1
+    tasks = []
+    for pdf_path in pdf_paths:
+        page_count = _pdf_page_count(pdf_path)
+        step = max(MIN_PAGES_PER_TASK, -(-page_count // workers))
+        tasks.extend((pdf_path, start, min(start + step, page_count))
+                     for start in range(0, page_count, step))
+    return tasks
+
+
+def _existing_pdf_files() -> List[Path]:
+    """返回存在的 PDF 文件列表"""
+    pdf_paths = []
     for pdf_path in PDF_FILES:
         if pdf_path.exists():
-            processor = PDFProcessor(pdf_path)
-            chunks = processor.extract_text_with_pages()
-            all_chunks.extend(chunks)
+            pdf_paths.append(pdf_path)
         else:
             logger.warning(f"[PDF] 文件不存在: {pdf_path}")
+    return pdf_paths
+
+
+def load_all_pdf_documents() -> List[Dict]:
+    """加载所有 PDF 文档"""
+    pdf_paths = _existing_pdf_files()
+    
+    # 缓存命中的文件直接读取，未命中的文件按页拆分后进入进程池解析
+    results = {path: _read_pdf_text_cache(path) for path in pdf_paths}
+    to_parse = [path for path, chunks in results.items() if chunks is None]
+    
+    tasks = _split_page_tasks(to_parse)
+    parsed = {path: [] for path in to_parse}
+    failed = set()
+    for (pdf_path, _, _), chunks in zip(tasks, _run_in_processes(_extract_pdf_text_worker, tasks)):
+        if chunks is None:
+            failed.add(pdf_path)
+        else:
+            parsed[pdf_path].extend(chunks)
+    for pdf_path, chunks in parsed.items():
+        # 有页段解析失败的文件不写缓存，下次加载时重新解析，避免缓存残缺的文本
+        if chunks and pdf_path not in failed:
+            _write_pdf_text_cache(pdf_path, chunks)
+    results.update(parsed)
+    
+    all_chunks = list(itertools.chain.from_iterable(results[path] for path in pdf_paths))
     
     logger.info(f"[PDF汇总] 共加载 {len(all_chunks)} 个文本块")
     return all_chunks
 
 
-def load_excel_data() -> Tuple[pd.DataFrame, Dict]:
+def load_excel_data() -> Tuple["pd.DataFrame", Dict]:
     """加载 Excel 数据及分析结果"""
     processor = ExcelProcessor(EXCEL_FILE)
     df = processor.load_data()
@@ -319,18 +508,46 @@ def load_excel_data() -> Tuple[pd.DataFrame, Dict]:
     return df, analysis
 
 
+def _files_signature(paths: List[Path]) -> Tuple:
+    """源文件签名：(路径, 修改时间) 元组"""
+    return tuple((str(path), path.stat().st_mtime) for path in paths)
+
+
+def _cached_result(name: str, paths: List[Path], compute: Callable[[], Dict]) -> Dict:
+    """源文件未变化时返回缓存的结果副本，否则重新计算"""
+    signature = _files_signature(paths)
+    cached = _RESULT_CACHE.get(name)
+    if cached is None or cached[0] != signature:
+        cached = (signature, compute())
+        _RESULT_CACHE[name] = cached
+    return copy.deepcopy(cached[1])
+
+
+def get_insulin_usage_analysis() -> Dict:
+    """获取 Excel 胰岛素使用率分析（Excel 文件未修改时复用上次结果）"""
+    if not EXCEL_FILE.exists():
+        return ExcelProcessor(EXCEL_FILE).analyze_insulin_usage()
+    return _cached_result("insulin_usage", [EXCEL_FILE],
+                          lambda: ExcelProcessor(EXCEL_FILE).analyze_insulin_usage())
+
+
 def get_pdf_toc_and_tables() -> Dict:
-    """获取所有 PDF 的目录和表格"""
+    """获取所有 PDF 的目录和表格（PDF 文件未修改时复用上次解析结果）"""
+    pdf_paths = _existing_pdf_files()
+    return _cached_result("pdf_structure", pdf_paths, lambda: _extract_pdf_toc_and_tables(pdf_paths))
+
+
+def _extract_pdf_toc_and_tables(pdf_paths: List[Path]) -> Dict:
+    """逐个 PDF 并行解析目录和表格"""
     result = {
         "toc": [],
         "tables": []
     }
     
-    for pdf_path in PDF_FILES:
-        if pdf_path.exists():
-            processor = PDFProcessor(pdf_path)
-            result["toc"].extend(processor.extract_toc())
-            result["tables"].extend(processor.extract_tables())
+    tasks = [(pdf_path,) for pdf_path in pdf_paths]
+    for toc, tables in _run_in_processes(_extract_pdf_structure_worker, tasks):
+        result["toc"].extend(toc)
+        result["tables"].extend(tables)
     
     return result
 
@@ -3,17 +3,137 @@
 数据库客户端模块 - MySQL 连接与查询
 """
 import logging
+import queue
+import re
+import threading
 import time
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from typing import TYPE_CHECKING, List, Dict, Any, Iterator, Optional, Union
 from contextlib import contextmanager
 
-import pymysql
-from pymysql.cursors import DictCursor
+from src.config import (
+    MYSQL_CONFIG, MYSQL_POOL_CONFIG, MYSQL_MULTI_STATEMENT_POOL_CONFIG, DB_QUERY_CACHE_CONFIG, DB_STATUS_CACHE_SECONDS, SYSTEM_LOG_CONFIG,
+    SIMULATE_DB_FAILURE, DB_SEARCH_CONFIG
+)
+from src.utils import TTLCache
 
-from src.config import MYSQL_CONFIG, SIMULATE_DB_FAILURE
+# pymysql / DBUtils 在首次建立连接池或取用游标类型时才导入
+if TYPE_CHECKING:
+    from dbutils.pooled_db import PooledDB
 
 logger = logging.getLogger(__name__)
 
+# 患者记录表查询的列（只取画像、安全检查和报告用到的字段，不读取体格检查、检验备注等大文本列）
+RECORD_COLUMNS = {
+    "medical_records": "record_id, visit_date, chief_complaint, present_illness, past_history, "
+                       "preliminary_diagnosis, final_diagnosis, department",
+    "lab_results": "result_id, test_date, test_type, test_item, result_value, unit, "
+                   "reference_range, is_abnormal",
+    "medication_records": "med_id, medication_date, drug_name, drug_class, dosage, frequency, "
+                          "duration, is_insulin",
+    "diagnosis_records": "diag_id, diagnosis_date, diagnosis_name, diagnosis_type, "
+                         "severity_level, icd10_code",
+}
+
+# 患者画像子查询：(画像字段, SQL, 是否只取首行)，按顺序拼接为一条多语句查询
+PROFILE_QUERIES = [
+    ("basic_info", "SELECT * FROM patient_info WHERE patient_id = %s", True),
+    ("medical_records",
+     f"SELECT {RECORD_COLUMNS['medical_records']} FROM medical_records "
+     "WHERE patient_id = %s ORDER BY visit_date DESC", False),
+    ("lab_results",
+     f"SELECT {RECORD_COLUMNS['lab_results']} FROM lab_results "
+     "WHERE patient_id = %s ORDER BY test_date DESC", False),
+    ("medications",
+     f"SELECT {RECORD_COLUMNS['medication_records']} FROM medication_records "
+     "WHERE patient_id = %s ORDER BY medication_date DESC", False),
+    ("diagnoses",
+     f"SELECT {RECORD_COLUMNS['diagnosis_records']} FROM diagnosis_records "
+     "WHERE patient_id = %s ORDER BY diagnosis_date DESC", False),
+    ("hypertension_assessment",
+     "SELECT * FROM hypertension_risk_assessment WHERE patient_id = %s "
+     "ORDER BY assessment_date DESC LIMIT 1", True),
+    ("diabetes_assessment",
+     "SELECT * FROM diabetes_control_assessment WHERE patient_id = %s "
+     "ORDER BY assessment_date DESC LIMIT 1", True),
+]
+PROFILE_SQL = ";\n".join(sql for _, sql, _ in PROFILE_QUERIES)
+
+# 批量患者画像子查询：与 PROFILE_QUERIES 一一对应，按 IN 列表查询多个患者，
+# 记录表额外取 patient_id 用于分组，评估表按日期倒序后每个患者取首行
+BATCH_PROFILE_QUERIES = [
+    ("basic_info", "SELECT * FROM patient_info WHERE patient_id IN ({placeholders})", True),
+    ("medical_records",
+     f"SELECT patient_id, {RECORD_COLUMNS['medical_records']} FROM medical_records "
+     "WHERE patient_id IN ({placeholders}) ORDER BY visit_date DESC", False),
+    ("lab_results",
+     f"SELECT patient_id, {RECORD_COLUMNS['lab_results']} FROM lab_results "
+     "WHERE patient_id IN ({placeholders}) ORDER BY test_date DESC", False),
+    ("medications",
+     f"SELECT patient_id, {RECORD_COLUMNS['medication_records']} FROM medication_records "
+     "WHERE patient_id IN ({placeholders}) ORDER BY medication_date DESC", False),
+    ("diagnoses",
+     f"SELECT patient_id, {RECORD_COLUMNS['diagnosis_records']} FROM diagnosis_records "
+     "WHERE patient_id IN ({placeholders}) ORDER BY diagnosis_date DESC", False),
+    ("hypertension_assessment",
+     "SELECT * FROM hypertension_risk_assessment WHERE patient_id IN ({placeholders}) "
+     "ORDER BY assessment_date DESC", True),
+    ("diabetes_assessment",
+     "SELECT * FROM diabetes_control_assessment WHERE patient_id IN ({placeholders}) "
+     "ORDER BY assessment_date DESC", True),
+]
+
+# 患者画像涉及的数据表
+PROFILE_TABLES = ["patient_info", "medical_records", "lab_results", 
+                  "medication_records", "diagnosis_records",
+                  "hypertension_risk_assessment", "diabetes_control_assessment"]
+
+# 批量查询：单条 IN 列表的最大 ID 数（避免超出 max_allowed_packet）
+BATCH_QUERY_SIZE = 1000
+
+# MySQL ngram 全文解析器的分词长度（ngram_token_size，默认 2）
+NGRAM_TOKEN_SIZE = 2
+
+# 指南推荐关键词检索，relevance 为全文检索相关度（LIKE 匹配时为 NULL），按相关度降序
+GUIDELINE_SEARCH_SQL = """
+    SELECT 'guideline_recommendations' as source_table, 
+           guideline_name, disease_type, patient_condition,
+           recommendation_level, recommendation_content, 
+           evidence_source, update_date, {relevance} AS relevance
+    FROM guideline_recommendations 
+    WHERE is_active = TRUE AND {condition}
+    ORDER BY relevance DESC
+    LIMIT %s
+"""
+GUIDELINE_MATCH_CONDITION = (
+    "MATCH(recommendation_content, patient_condition, guideline_name) AGAINST(%s IN {mode} MODE)"
+)
+GUIDELINE_LIKE_CONDITION = (
+    "(recommendation_content LIKE %s OR patient_condition LIKE %s OR guideline_name LIKE %s)"
+)
+# MySQL 错误码：全文检索找不到 FULLTEXT 索引（未执行 idx_grec_ft 迁移的库）
+ER_FT_MATCHING_KEY_NOT_FOUND = 1191
+_BOOLEAN_OPERATOR_RE = re.compile(r'[+\-<>()~*"@]')
+
+# 支持批量查询的患者记录表及其排序字段
+PATIENT_RECORD_TABLES = {
+    "medical_records": "visit_date",
+    "lab_results": "test_date",
+    "medication_records": "medication_date",
+    "diagnosis_records": "diagnosis_date",
+}
+
+
+def _unavailable_profile(patient_id: str, error: str) -> Dict:
+    """数据库不可用时的患者画像占位结果"""
+    return {
+        "patient_id": patient_id,
+        "db_unavailable": True,
+        "error": error,
+        "basic_info": None,
+        "source": {"type": "mysql", "status": "unavailable"}
+    }
+
 
 class DatabaseConnectionError(Exception):
     """数据库连接异常"""
@@ -25,39 +145,81 @@ class DBClient:
     
     def __init__(self, config: Dict = None):
         self.config = config or MYSQL_CONFIG
-        self._connection = None
+        self._pool: Optional["PooledDB"] = None
+        # 多语句查询专用连接池（按需创建）
+        self._multi_pool: Optional["PooledDB"] = None
+        self._pool_lock = threading.Lock()
+        # 全文索引是否可用（库中缺少 idx_grec_ft 时置为 False，关键词检索改用 LIKE）
+        self._fulltext_available = True
+        # 变化不频繁的只读查询结果缓存
+        self._query_cache = TTLCache(
+            max_entries=DB_QUERY_CACHE_CONFIG["max_entries"],
+            ttl_seconds=DB_QUERY_CACHE_CONFIG["ttl_seconds"]
+        )
+    
+    def _create_pool(self, pool_config: Dict, client_flag: int = 0) -> "PooledDB":
+        """创建连接池（多线程共享，取用时自动 ping 并重连）"""
+        import pymysql
+        from pymysql.cursors import DictCursor
+        from dbutils.pooled_db import PooledDB
+        
+        return PooledDB(
+            creator=pymysql,
+            mincached=pool_config["mincached"],
+            maxcached=pool_config["maxcached"],
+            maxconnections=pool_config["maxconnections"],
+            blocking=True,
+            ping=1,
+            host=self.config["host"],
+            port=self.config["port"],
+            user=self.config["user"],
+            password=self.config["password"],
+            database=self.config["database"],
+            charset=self.config["charset"],
+            cursorclass=DictCursor,
+            client_flag=client_flag,
+            connect_timeout=10
+        )
+    
+    def _get_pool(self, multi_statements: bool = False) -> "PooledDB":
+        """获取连接池；multi_statements=True 时返回允许多语句的专用连接池"""
+        if multi_statements:
+            if self._multi_pool is None:
+                with self._pool_lock:
+                    if self._multi_pool is None:
+                        from pymysql.constants import CLIENT
+                        
+                        self._multi_pool = self._create_pool(MYSQL_MULTI_STATEMENT_POOL_CONFIG,
+                                                             CLIENT.MULTI_STATEMENTS)
+                        logger.info(f"[数据库] 多语句连接池已创建: {self.config['host']}")
+            return self._multi_pool
+        
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = self._create_pool(MYSQL_POOL_CONFIG)
+                    logger.info(f"[数据库] 连接池已创建: {self.config['host']}")
+        return self._pool
     
-    def _get_connection(self):
-        """获取数据库连接"""
+    def _get_connection(self, multi_statements: bool = False):
+        """从连接池取出一条连接（调用方用完后 close() 归还连接池）"""
         # 检查是否启用了数据库异常模拟
         if SIMULATE_DB_FAILURE:
             error_msg = "【模拟异常】数据库连接失败：无法连接到数据库服务器，请检查网络连接或联系管理员"
             logger.error(f"[数据库] {error_msg}")
             raise DatabaseConnectionError(error_msg)
         
-        if self._connection is None or not self._connection.open:
-            try:
-                self._connection = pymysql.connect(
-                    host=self.config["host"],
-                    port=self.config["port"],
-                    user=self.config["user"],
-                    password=self.config["password"],
-                    database=self.config["database"],
-                    charset=self.config["charset"],
-                    cursorclass=DictCursor,
-                    connect_timeout=10
-                )
-                logger.info(f"[数据库] 连接成功: {self.config['host']}")
-            except Exception as e:
-                logger.error(f"[数据库] 连接失败: {str(e)}")
-                raise DatabaseConnectionError(f"数据库连接失败: {str(e)}")
-        return self._connection
+        try:
+            return self._get_pool(multi_statements).connection()
+        except Exception as e:
+            logger.error(f"[数据库] 连接失败: {str(e)}")
+            raise DatabaseConnectionError(f"数据库连接失败: {str(e)}")
     
     @contextmanager
-    def cursor(self):
-        """获取游标的上下文管理器"""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+    def cursor(self, cursor_class: type = None, multi_statements: bool = False):
+        """获取游标的上下文管理器（默认 DictCursor，可指定其他游标类型；多语句 SQL 需传 multi_statements=True）"""
+        conn = self._get_connection(multi_statements)
+        cursor = conn.cursor(cursor_class) if cursor_class else conn.cursor()
         try:
             yield cursor
             conn.commit()
@@ -66,21 +228,24 @@ class DBClient:
             raise
         finally:
             cursor.close()
+            conn.close()
     
-    def execute_query(self, sql: str, params: tuple = None) -> Dict:
+    def execute_query(self, sql: str, params: tuple = None, cursor_class: type = None) -> Dict:
         """
         执行查询
         
         Args:
             sql: SQL语句
             params: 参数
+            cursor_class: 游标类型，传入 pymysql.cursors.Cursor 时行为元组（不逐行构造字典）
             
         Returns:
-            {"success": bool, "data": list, "error": str, "execution_time_ms": int, "db_unavailable": bool}
+            {"success": bool, "data": list, "columns": list, "error": str,
+             "execution_time_ms": int, "db_unavailable": bool}
         """
         start_time = time.time()
         try:
-            with self.cursor() as cursor:
+            with self.cursor(cursor_class) as cursor:
                 logger.info(f"[SQL查询] {sql[:200]}...")
                 cursor.execute(sql, params)
                 data = cursor.fetchall()
@@ -90,6 +255,7 @@ class DBClient:
                 return {
                     "success": True,
                     "data": data,
+                    "columns": [column[0] for column in cursor.description or ()],
                     "error": None,
                     "execution_time_ms": execution_time,
                     "db_unavailable": False
@@ -101,6 +267,7 @@ class DBClient:
             return {
                 "success": False,
                 "data": [],
+                "columns": [],
                 "error": error_msg,
                 "execution_time_ms": int((time.time() - start_time) * 1000),
                 "db_unavailable": True
@@ -111,56 +278,119 @@ class DBClient:
             return {
                 "success": False,
                 "data": [],
+                "columns": [],
                 "error": error_msg,
                 "execution_time_ms": int((time.time() - start_time) * 1000),
                 "db_unavailable": False
             }
     
+    def execute_query_stream(self, sql: str, params: tuple = None) -> Iterator[Dict]:
+        """
+        流式执行查询（服务端游标逐行读取，不在客户端缓存整个结果集）
+        
+        适用于结果集可能较大的检索/分析查询；点查仍使用 execute_query。
+        出错时记录日志并停止迭代。
+        
+        Args:
+            sql: SQL语句
+            params: 参数
+            
+        Yields:
+            每行记录字典
+        """
+        try:
+            conn = self._get_connection()
+        except DatabaseConnectionError as e:
+            logger.error(f"[数据库不可用] {str(e)}")
+            return
+        
+        from pymysql.cursors import SSDictCursor
+        
+        start_time = time.time()
+        cursor = conn.cursor(SSDictCursor)
+        row_count = 0
+        try:
+            logger.info(f"[SQL流式查询] {sql[:200]}...")
+            cursor.execute(sql, params)
+            for row in cursor:
+                row_count += 1
+                yield row
+            execution_time = int((time.time() - start_time) * 1000)
+            logger.info(f"[SQL结果] 流式返回 {row_count} 条记录, 耗时 {execution_time}ms")
+        except Exception as e:
+            logger.error(f"SQL执行失败: {str(e)}")
+        finally:
+            cursor.close()
+            conn.close()
+    
+    def _fetch_first_row(self, sql: str, params: tuple) -> Optional[Dict]:
+        """单行查询：用元组游标读取，仅为首行构造一次字典"""
+        from pymysql.cursors import Cursor
+        
+        result = self.execute_query(sql, params, cursor_class=Cursor)
+        if result["success"] and result["data"]:
+            return dict(zip(result["columns"], result["data"][0]))
+        return None
+    
     def get_patient_info(self, patient_id: str) -> Optional[Dict]:
-        """获取患者基本信息"""
+        """获取患者基本信息（结果缓存，见 DB_QUERY_CACHE_CONFIG）"""
+        cache_key = ("patient_info", patient_id)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         sql = "SELECT * FROM patient_info WHERE patient_id = %s"
-        result = self.execute_query(sql, (patient_id,))
-        if result["success"] and result["data"]:
-            return result["data"][0]
+        info = self._fetch_first_row(sql, (patient_id,))
+        if info is not None:
+            self._query_cache.set(cache_key, info)
+            return dict(info)
         return None
     
-    def get_patient_medical_records(self, patient_id: str) -> List[Dict]:
-        """获取患者病历记录"""
-        sql = """
-            SELECT * FROM medical_records 
+    def get_patient_medical_records(self, patient_id: str, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """获取患者病历记录（stream=True 时返回逐行读取的生成器）"""
+        sql = f"""
+            SELECT {RECORD_COLUMNS['medical_records']} FROM medical_records 
             WHERE patient_id = %s 
             ORDER BY visit_date DESC
         """
+        if stream:
+            return self.execute_query_stream(sql, (patient_id,))
         result = self.execute_query(sql, (patient_id,))
         return result["data"] if result["success"] else []
     
-    def get_patient_lab_results(self, patient_id: str) -> List[Dict]:
-        """获取患者检查检验结果"""
-        sql = """
-            SELECT * FROM lab_results 
+    def get_patient_lab_results(self, patient_id: str, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """获取患者检查检验结果（stream=True 时返回逐行读取的生成器）"""
+        sql = f"""
+            SELECT {RECORD_COLUMNS['lab_results']} FROM lab_results 
             WHERE patient_id = %s 
             ORDER BY test_date DESC
         """
+        if stream:
+            return self.execute_query_stream(sql, (patient_id,))
         result = self.execute_query(sql, (patient_id,))
         return result["data"] if result["success"] else []
     
-    def get_patient_medications(self, patient_id: str) -> List[Dict]:
-        """获取患者用药记录"""
-        sql = """
-            SELECT * FROM medication_records 
+    def get_patient_medications(self, patient_id: str, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """获取患者用药记录（stream=True 时返回逐行读取的生成器）"""
+        sql = f"""
+            SELECT {RECORD_COLUMNS['medication_records']} FROM medication_records 
             WHERE patient_id = %s 
             ORDER BY medication_date DESC
         """
+        if stream:
+            return self.execute_query_stream(sql, (patient_id,))
         result = self.execute_query(sql, (patient_id,))
         return result["data"] if result["success"] else []
     
-    def get_patient_diagnoses(self, patient_id: str) -> List[Dict]:
-        """获取患者诊断记录"""
-        sql = """
-            SELECT * FROM diagnosis_records 
+    def get_patient_diagnoses(self, patient_id: str, stream: bool = False) -> Union[List[Dict], Iterator[Dict]]:
+        """获取患者诊断记录（stream=True 时返回逐行读取的生成器）"""
+        sql = f"""
+            SELECT {RECORD_COLUMNS['diagnosis_records']} FROM diagnosis_records 
             WHERE patient_id = %s 
             ORDER BY diagnosis_date DESC
         """
+        if stream:
+            return self.execute_query_stream(sql, (patient_id,))
         result = self.execute_query(sql, (patient_id,))
         return result["data"] if result["success"] else []
     
@@ -172,10 +402,7 @@ class DBClient:
             ORDER BY assessment_date DESC 
             LIMIT 1
         """
-        result = self.execute_query(sql, (patient_id,))
-        if result["success"] and result["data"]:
-            return result["data"][0]
-        return None
+        return self._fetch_first_row(sql, (patient_id,))
     
     def get_diabetes_assessment(self, patient_id: str) -> Optional[Dict]:
         """获取患者糖尿病控制评估"""
@@ -185,10 +412,50 @@ class DBClient:
             ORDER BY assessment_date DESC 
             LIMIT 1
         """
-        result = self.execute_query(sql, (patient_id,))
-        if result["success"] and result["data"]:
-            return result["data"][0]
-        return None
+        return self._fetch_first_row(sql, (patient_id,))
+    
+    def _query_by_patient_ids(self, sql_template: str, patient_ids: List[str]) -> List[Dict]:
+        """按 IN 列表分批查询多个患者，sql_template 中的 {placeholders} 替换为占位符列表"""
+        unique_ids = list(dict.fromkeys(patient_ids))
+        rows = []
+        for i in range(0, len(unique_ids), BATCH_QUERY_SIZE):
+            batch = unique_ids[i:i + BATCH_QUERY_SIZE]
+            sql = sql_template.format(placeholders=", ".join(["%s"] * len(batch)))
+            result = self.execute_query(sql, tuple(batch))
+            if result["success"]:
+                rows.extend(result["data"])
+        return rows
+    
+    def get_patient_info_batch(self, patient_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取患者基本信息
+        
+        Returns:
+            {patient_id: 患者信息}，不存在的患者不出现在结果中
+        """
+        sql = "SELECT * FROM patient_info WHERE patient_id IN ({placeholders})"
+        return {row["patient_id"]: row for row in self._query_by_patient_ids(sql, patient_ids)}
+    
+    def get_patient_records_batch(self, table: str, patient_ids: List[str]) -> Dict[str, List[Dict]]:
+        """
+        批量获取多个患者的记录（病历/检验/用药/诊断）
+        
+        Args:
+            table: 记录表名，见 PATIENT_RECORD_TABLES
+            patient_ids: 患者ID列表
+            
+        Returns:
+            {patient_id: [记录, ...]}，每个患者的记录按日期倒序
+        """
+        if table not in PATIENT_RECORD_TABLES:
+            raise ValueError(f"不支持批量查询的表: {table}")
+        
+        sql = (f"SELECT patient_id, {RECORD_COLUMNS[table]} FROM {table} WHERE patient_id IN ({{placeholders}}) "
+               f"ORDER BY {PATIENT_RECORD_TABLES[table]} DESC")
+        grouped = defaultdict(list)
+        for row in self._query_by_patient_ids(sql, patient_ids):
+            grouped[row["patient_id"]].append(row)
+        return dict(grouped)
     
     def get_guideline_recommendations(self, disease_type: str = None, 
                                       update_date_after: str = None) -> List[Dict]:
@@ -199,6 +466,11 @@ class DBClient:
             disease_type: 疾病类型过滤
             update_date_after: 更新日期之后的记录
         """
+        cache_key = ("guideline_recommendations", disease_type, update_date_after)
+        cached = self._query_cache.get(cache_key)
+        if cached is not None:
+            return [dict(row) for row in cached]
+        
         sql = "SELECT * FROM guideline_recommendations WHERE is_active = TRUE"
         params = []
         
@@ -213,7 +485,10 @@ class DBClient:
         sql += " ORDER BY update_date DESC"
         
         result = self.execute_query(sql, tuple(params) if params else None)
-        return result["data"] if result["success"] else []
+        if not result["success"]:
+            return []
+        self._query_cache.set(cache_key, list(result["data"]))
+        return [dict(row) for row in result["data"]]
     
     def get_full_patient_profile(self, patient_id: str) -> Dict:
         """
@@ -229,48 +504,110 @@ class DBClient:
                 raise DatabaseConnectionError("数据库连接失败（模拟异常）")
         except DatabaseConnectionError as e:
             logger.error(f"[数据库不可用] 无法获取患者画像: {str(e)}")
-            return {
-                "patient_id": patient_id,
-                "db_unavailable": True,
-                "error": str(e),
-                "basic_info": None,
-                "source": {"type": "mysql", "status": "unavailable"}
-            }
+            return _unavailable_profile(patient_id, str(e))
+        
+        # 7 个子查询合并为一条多语句查询，一次网络往返，依次读取各结果集
+        start_time = time.time()
+        profile = {"patient_id": patient_id}
+        try:
+            with self.cursor(multi_statements=True) as cursor:
+                logger.info(f"[SQL查询] 患者画像多语句查询: {patient_id}")
+                cursor.execute(PROFILE_SQL, (patient_id,) * len(PROFILE_QUERIES))
+                result_sets = [cursor.fetchall()]
+                while cursor.nextset():
+                    result_sets.append(cursor.fetchall())
+            
+            for (key, _, single), rows in zip(PROFILE_QUERIES, result_sets):
+                profile[key] = (rows[0] if rows else None) if single else list(rows)
+            execution_time = int((time.time() - start_time) * 1000)
+            logger.info(f"[SQL结果] 患者画像 {len(result_sets)} 个结果集, 耗时 {execution_time}ms")
+        except DatabaseConnectionError as e:
+            logger.error(f"[数据库不可用] 无法获取患者画像: {str(e)}")
+            return _unavailable_profile(patient_id, str(e))
+        except Exception as e:
+            logger.error(f"SQL执行失败: 患者画像查询, {str(e)}")
+            for key, _, single in PROFILE_QUERIES:
+                profile.setdefault(key, None if single else [])
         
-        profile = {
-            "patient_id": patient_id,
-            "basic_info": self.get_patient_info(patient_id),
-            "medical_records": self.get_patient_medical_records(patient_id),
-            "lab_results": self.get_patient_lab_results(patient_id),
-            "medications": self.get_patient_medications(patient_id),
-            "diagnoses": self.get_patient_diagnoses(patient_id),
-            "hypertension_assessment": self.get_hypertension_assessment(patient_id),
-            "diabetes_assessment": self.get_diabetes_assessment(patient_id),
+        profile.update({
             "db_unavailable": False,
-            "source": {
-                "type": "mysql",
-                "tables": ["patient_info", "medical_records", "lab_results", 
-                          "medication_records", "diagnosis_records",
-                          "hypertension_risk_assessment", "diabetes_control_assessment"]
-            }
-        }
+            "source": {"type": "mysql", "tables": list(PROFILE_TABLES)}
+        })
         return profile
     
+    def get_full_patient_profiles(self, patient_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量获取完整患者画像（每批 IN 列表的 7 个子查询合并为一条多语句查询）
+        
+        Returns:
+            {patient_id: 画像}，结构与 get_full_patient_profile 一致；
+            不存在的患者 basic_info 为 None，数据库不可用时各画像带 db_unavailable 标记
+        """
+        unique_ids = list(dict.fromkeys(patient_ids))
+        
+        if SIMULATE_DB_FAILURE:
+            error = "数据库连接失败（模拟异常）"
+            logger.error(f"[数据库不可用] 无法批量获取患者画像: {error}")
+            return {pid: _unavailable_profile(pid, error) for pid in unique_ids}
+        
+        start_time = time.time()
+        profiles = {
+            pid: {"patient_id": pid, **{key: None if single else [] for key, _, single in BATCH_PROFILE_QUERIES}}
+            for pid in unique_ids
+        }
+        try:
+            for i in range(0, len(unique_ids), BATCH_QUERY_SIZE):
+                batch = unique_ids[i:i + BATCH_QUERY_SIZE]
+                placeholders = ", ".join(["%s"] * len(batch))
+                sql = ";\n".join(
+                    template.format(placeholders=placeholders) for _, template, _ in BATCH_PROFILE_QUERIES
+                )
+                with self.cursor(multi_statements=True) as cursor:
+                    cursor.execute(sql, tuple(batch) * len(BATCH_PROFILE_QUERIES))
+                    result_sets = [cursor.fetchall()]
+                    while cursor.nextset():
+                        result_sets.append(cursor.fetchall())
+                
+                for (key, _, single), rows in zip(BATCH_PROFILE_QUERIES, result_sets):
+                    for row in rows:
+                        profile = profiles.get(row["patient_id"] if single else row.pop("patient_id"))
+                        if profile is None:
+                            continue
+                        if not single:
+                            profile[key].append(row)
+                        elif profile[key] is None:
+                            profile[key] = row
+            
+            execution_time = int((time.time() - start_time) * 1000)
+            logger.info(f"[SQL结果] 批量患者画像 {len(unique_ids)} 人, 耗时 {execution_time}ms")
+        except DatabaseConnectionError as e:
+            logger.error(f"[数据库不可用] 无法批量获取患者画像: {str(e)}")
+            return {pid: _unavailable_profile(pid, str(e)) for pid in unique_ids}
+        except Exception as e:
+            logger.error(f"SQL执行失败: 批量患者画像查询, {str(e)}")
+        
+        for profile in profiles.values():
+            profile.update({
+                "db_unavailable": False,
+                "source": {"type": "mysql", "tables": list(PROFILE_TABLES)}
+            })
+        return profiles
+    
+    def invalidate_cache(self):
+        """清空只读查询缓存（写入患者信息或指南规则后调用）"""
+        self._query_cache.clear()
+        logger.info("[数据库] 查询缓存已清空")
+    
     def log_system_operation(self, operation_type: str, operation_user: str,
                              operation_details: str, patient_id: str = None,
                              execution_time_ms: int = None, status: str = "成功"):
-        """记录系统操作日志到数据库"""
-        sql = """
-            INSERT INTO system_logs 
-            (operation_type, operation_user, operation_details, patient_id, execution_time_ms, status)
-            VALUES (%s, %s, %s, %s, %s, %s)
-        """
+        """记录系统操作日志到数据库（放入队列由后台线程批量写入，不阻塞调用方）"""
+        _ensure_log_writer()
         try:
-            with self.cursor() as cursor:
-                cursor.execute(sql, (operation_type, operation_user, operation_details,
-                                    patient_id, execution_time_ms, status))
-        except Exception as e:
-            logger.error(f"记录系统日志失败: {str(e)}")
+            _log_queue.put_nowait((operation_type, operation_user, operation_details,
+                                   patient_id, execution_time_ms, status))
+        except queue.Full:
+            logger.warning(f"[系统日志] 写入队列已满，丢弃日志: {operation_type}")
     
     def search_by_keyword(self, keyword: str, tables: List[str] = None) -> List[Dict]:
         """
@@ -279,44 +616,141 @@ class DBClient:
         Args:
             keyword: 搜索关键词
             tables: 要搜索的表列表
+            
+        Returns:
+            指南推荐行（按相关度降序），每行带 0~1 的 score 相关性得分
         """
-        results = []
+        if len(keyword) < NGRAM_TOKEN_SIZE or not self._fulltext_available:
+            # 短于 ngram 分词长度的关键词无法命中全文索引 / 库中无全文索引，退回子串匹配
+            return self._search_guidelines_like(keyword)
         
-        # 搜索指南推荐
-        sql = """
-            SELECT 'guideline_recommendations' as source_table, 
-                   guideline_name, disease_type, patient_condition,
-                   recommendation_level, recommendation_content, 
-                   evidence_source, update_date
-            FROM guideline_recommendations 
-            WHERE is_active = TRUE 
-              AND (recommendation_content LIKE %s 
-                   OR patient_condition LIKE %s
-                   OR guideline_name LIKE %s)
-        """
-        search_pattern = f"%{keyword}%"
-        result = self.execute_query(sql, (search_pattern, search_pattern, search_pattern))
-        if result["success"]:
-            results.extend(result["data"])
+        try:
+            # 全文索引（ngram）检索
+            results = self._search_guidelines_fulltext("NATURAL LANGUAGE", keyword)
+            if results:
+                return results
+            
+            # 自然语言模式无结果时，按布尔模式前缀匹配各词（去除布尔运算符，避免语法错误）
+            terms = _BOOLEAN_OPERATOR_RE.sub(" ", keyword).split()
+            if terms:
+                results = self._search_guidelines_fulltext("BOOLEAN", " ".join(f"+{term}*" for term in terms))
+            return results
+        except DatabaseConnectionError as e:
+            logger.error(f"[数据库不可用] {str(e)}")
+            return []
+        except Exception as e:
+            if e.args[:1] != (ER_FT_MATCHING_KEY_NOT_FOUND,):
+                logger.error(f"SQL执行失败: 指南全文检索, {str(e)}")
+                return []
+            logger.warning("[数据库] guideline_recommendations 缺少全文索引 idx_grec_ft，退回 LIKE 检索，请执行 db/ddl.sql 中的迁移")
+            self._fulltext_available = False
+            return self._search_guidelines_like(keyword)
+    
+    def _search_guidelines_fulltext(self, mode: str, against: str) -> List[Dict]:
+        """全文索引检索，相关度归一化为 score 并剔除低于 min_score 的行；SQL 错误向上抛出"""
+        match = GUIDELINE_MATCH_CONDITION.format(mode=mode)
+        sql = GUIDELINE_SEARCH_SQL.format(relevance=match, condition=match)
+        with self.cursor() as cursor:
+            logger.info(f"[SQL查询] 指南全文检索 ({mode}): {against[:50]}")
+            cursor.execute(sql, (against, against, DB_SEARCH_CONFIG["limit"]))
+            rows = cursor.fetchall()
         
+        half_saturation = DB_SEARCH_CONFIG["relevance_half_saturation"]
+        min_score = DB_SEARCH_CONFIG["min_score"]
+        results = []
+        for row in rows:
+            relevance = float(row.pop("relevance") or 0)
+            row["score"] = relevance / (relevance + half_saturation)
+            if row["score"] >= min_score:
+                results.append(row)
+        logger.info(f"[SQL结果] 指南全文检索返回 {len(rows)} 条，相关性达标 {len(results)} 条")
+        return results
+    
+    def _search_guidelines_like(self, keyword: str) -> List[Dict]:
+        """子串匹配检索，命中行使用固定得分"""
+        search_pattern = f"%{keyword}%"
+        results = list(self.execute_query_stream(
+            GUIDELINE_SEARCH_SQL.format(relevance="NULL", condition=GUIDELINE_LIKE_CONDITION),
+            (search_pattern, search_pattern, search_pattern, DB_SEARCH_CONFIG["limit"])
+        ))
+        for row in results:
+            del row["relevance"]
+            row["score"] = DB_SEARCH_CONFIG["like_match_score"]
         return results
     
     def close(self):
-        """关闭数据库连接"""
-        if self._connection and self._connection.open:
-            self._connection.close()
-            logger.info("[数据库] 连接已关闭")
+        """关闭连接池中的所有连接"""
+        with self._pool_lock:
+            pools = (self._pool, self._multi_pool)
+            self._pool = self._multi_pool = None
+        for pool in pools:
+            if pool is not None:
+                pool.close()
+        logger.info("[数据库] 连接池已关闭")
+
+
+# ===================== 系统日志异步写入 =====================
+SYSTEM_LOG_SQL = """
+    INSERT INTO system_logs 
+    (operation_type, operation_user, operation_details, patient_id, execution_time_ms, status)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+_log_queue: "queue.Queue" = queue.Queue(maxsize=SYSTEM_LOG_CONFIG["queue_size"])
+_log_writer: Optional[threading.Thread] = None
+_log_writer_lock = threading.Lock()
+
+
+def _ensure_log_writer():
+    """按需启动后台日志写入线程"""
+    global _log_writer
+    if _log_writer is not None and _log_writer.is_alive():
+        return
+    with _log_writer_lock:
+        if _log_writer is None or not _log_writer.is_alive():
+            _log_writer = threading.Thread(
+                target=_run_log_writer, name="system-log-writer", daemon=True
+            )
+            _log_writer.start()
+
+
+def _run_log_writer():
+    """后台写入循环：在 max_wait_ms 窗口内收集日志，合并为一次 executemany"""
+    max_batch_size = SYSTEM_LOG_CONFIG["max_batch_size"]
+    max_wait = SYSTEM_LOG_CONFIG["max_wait_ms"] / 1000
+    
+    while True:
+        batch = [_log_queue.get()]
+        deadline = time.monotonic() + max_wait
+        
+        while len(batch) < max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_log_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        
+        try:
+            with get_db_client().cursor() as cursor:
+                cursor.executemany(SYSTEM_LOG_SQL, batch)
+        except Exception as e:
+            logger.error(f"记录系统日志失败: {len(batch)} 条, {str(e)}")
 
 
 # 全局数据库客户端实例
 _db_client: Optional[DBClient] = None
+_db_client_lock = threading.Lock()
 
 
 def get_db_client() -> DBClient:
     """获取全局数据库客户端实例"""
     global _db_client
     if _db_client is None:
-        _db_client = DBClient()
+        with _db_client_lock:
+            if _db_client is None:
+                _db_client = DBClient()
     return _db_client
 
 
@@ -329,6 +763,7 @@ def set_db_failure_simulation(enabled: bool):
     """
     import src.config as config
     config.SIMULATE_DB_FAILURE = enabled
+    _db_status_cache.clear()
     status = "启用" if enabled else "禁用"
     logger.info(f"[数据库模拟] 数据库故障模拟已{status}")
     
@@ -366,19 +801,13 @@ def check_db_connection() -> Dict:
     
     try:
         client = get_db_client()
-        conn = client._get_connection()
-        if conn and conn.open:
-            return {
-                "connected": True,
-                "message": f"数据库连接正常: {client.config['host']}",
-                "simulated_failure": False
-            }
-        else:
-            return {
-                "connected": False,
-                "message": "数据库连接已关闭",
-                "simulated_failure": False
-            }
+        # 连接池取用连接时会 ping 检查，失败则抛出 DatabaseConnectionError
+        client._get_connection().close()
+        return {
+            "connected": True,
+            "message": f"数据库连接正常: {client.config['host']}",
+            "simulated_failure": False
+        }
     except DatabaseConnectionError as e:
         return {
             "connected": False,
@@ -392,3 +821,22 @@ def check_db_connection() -> Dict:
             "simulated_failure": False
         }
 
+
+# 连接状态检查结果缓存（单条目）
+_db_status_cache = TTLCache(max_entries=1, ttl_seconds=DB_STATUS_CACHE_SECONDS)
+
+
+def get_cached_db_status() -> Dict:
+    """
+    带短时缓存的数据库连接状态检查（对话处理路径使用）
+    
+    缓存期内连接恰好断开时，后续查询仍会抛出 DatabaseConnectionError 并走降级处理。
+    
+    Returns:
+        与 check_db_connection() 相同
+    """
+    status = _db_status_cache.get("status")
+    if status is None:
+        status = check_db_connection()
+        _db_status_cache.set("status", status)
+    return dict(status)
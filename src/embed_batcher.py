@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+查询向量微批处理模块 - 合并并发的 embedding 请求
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional
+
+from src.config import DASHSCOPE_API_KEY, EMBEDDING_MODEL, EMBEDDING_BATCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Embedding 微批处理器
+
+    各请求线程调用 embed() 提交文本后阻塞等待；后台线程在 max_wait_ms 窗口内
+    收集最多 max_batch_size 条文本，合并为一次 embedding 调用后分发结果。
+    """
+    
+    def __init__(self, embed_batch_fn: Callable[[List[str]], List[List[float]]],
+                 max_batch_size: int = None, max_wait_ms: float = None):
+        self.embed_batch_fn = embed_batch_fn
+        self.max_batch_size = max_batch_size or EMBEDDING_BATCH_CONFIG["max_batch_size"]
+        self.max_wait = (max_wait_ms or EMBEDDING_BATCH_CONFIG["max_wait_ms"]) / 1000
+        
+        self._queue: "queue.Queue" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+    
+    def embed(self, text: str, timeout: float = 30) -> List[float]:
+        """
+        获取单条文本的查询向量
+        
+        Args:
+            text: 查询文本
+            timeout: 等待超时时间(秒)
+            
+        Returns:
+            查询向量
+        """
+        self._ensure_worker()
+        future: Future = Future()
+        self._queue.put((text, future))
+        return future.result(timeout=timeout)
+    
+    def _ensure_worker(self):
+        """按需启动后台批处理线程"""
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="embedding-batcher", daemon=True
+                )
+                self._worker.start()
+    
+    def _run(self):
+        """后台批处理循环"""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            
+            self._dispatch(batch)
+    
+    def _dispatch(self, batch: List):
+        """执行一次批量 embedding 调用并分发结果"""
+        texts = [text for text, _ in batch]
+        try:
+            embeddings = self.embed_batch_fn(texts)
+            if len(embeddings) != len(texts):
+                raise ValueError(f"返回向量数量不匹配: {len(embeddings)} != {len(texts)}")
+            for (_, future), embedding in zip(batch, embeddings):
+                future.set_result(embedding)
+            logger.debug(f"[Embedding批处理] 合并 {len(texts)} 条查询")
+        except Exception as e:
+            logger.error(f"[Embedding批处理] 调用失败: {str(e)}")
+            for _, future in batch:
+                future.set_exception(e)
+
+
+def dashscope_query_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    批量计算查询向量（与 DashScopeEmbedding 查询侧一致，text_type=query）
+    
+    Args:
+        texts: 查询文本列表（不超过 25 条）
+        
+    Returns:
+        与输入顺序一致的向量列表
+    """
+    import dashscope
+    
+    response = dashscope.TextEmbedding.call(
+        model=EMBEDDING_MODEL,
+        input=texts,
+        text_type="query",
+        api_key=DASHSCOPE_API_KEY
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Embedding 调用失败: {response.code} {response.message}")
+    
+    embeddings = [None] * len(texts)
+    for item in response.output["embeddings"]:
+        embeddings[item["text_index"]] = item["embedding"]
+    return embeddings
+
+
+# 全局批处理器实例
+_embed_batcher: Optional[EmbeddingBatcher] = None
+_embed_batcher_lock = threading.Lock()
+
+
+def get_embed_batcher() -> EmbeddingBatcher:
+    """获取全局 embedding 批处理器实例"""
+    global _embed_batcher
+    if _embed_batcher is None:
+        with _embed_batcher_lock:
+            if _embed_batcher is None:
+                _embed_batcher = EmbeddingBatcher(dashscope_query_embeddings)
+    return _embed_batcher
@@ -2,14 +2,70 @@
 """
 LLM 客户端模块 - 封装百炼 API 调用
 """
+import hashlib
 import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 from typing import List, Dict, Optional, Generator
-from openai import OpenAI
 
-from src.config import DASHSCOPE_API_KEY, DASHSCOPE_BASE_URL, LLM_MODEL
+import httpx
+import orjson
+
+from src.config import (
+    DASHSCOPE_API_KEY, DASHSCOPE_BASE_URL, LLM_MODEL, DASHSCOPE_HTTP_CONFIG, LLM_CACHE_CONFIG,
+    LLM_EXPLICIT_PREFIX_CACHE
+)
+from src.utils import TTLCache, TokenBucket
 
 logger = logging.getLogger(__name__)
 
+# 全局共享的 HTTP 连接池（LLM 客户端与向量库 LLM 共用）
+_http_client: Optional[httpx.Client] = None
+_http_client_lock = threading.Lock()
+
+# 全局令牌桶（同一进程内所有 LLMClient 共享百炼的调用配额）
+_rate_limiter = TokenBucket(
+    rate=DASHSCOPE_HTTP_CONFIG["rate_limit_per_second"],
+    capacity=DASHSCOPE_HTTP_CONFIG["rate_limit_burst"]
+)
+
+
+def get_http_client() -> httpx.Client:
+    """获取全局共享的百炼 HTTP 客户端（keep-alive 连接池）"""
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                client_kwargs = dict(
+                    limits=httpx.Limits(
+                        max_connections=DASHSCOPE_HTTP_CONFIG["max_connections"],
+                        max_keepalive_connections=DASHSCOPE_HTTP_CONFIG["max_keepalive_connections"],
+                        keepalive_expiry=DASHSCOPE_HTTP_CONFIG["keepalive_expiry"]
+                    ),
+                    timeout=DASHSCOPE_HTTP_CONFIG["timeout"]
+                )
+                try:
+                    _http_client = httpx.Client(http2=DASHSCOPE_HTTP_CONFIG["http2"], **client_kwargs)
+                except ImportError:
+                    logger.warning("[LLM] 未安装 h2，HTTP 客户端回退为 HTTP/1.1")
+                    _http_client = httpx.Client(**client_kwargs)
+    return _http_client
+
+
+# 流式调用失败时输出给客户端的错误提示前缀
+STREAM_ERROR_MARKER = "[错误]"
+
+
+class LLMStreamError(Exception):
+    """流式调用失败（generate_stream 传入 raise_errors=True 时抛出）"""
+    pass
+
+
+def _cached_tokens(completion) -> int:
+    """读取响应 usage 中命中前缀缓存的输入 token 数（服务端未返回时为 0）"""
+    details = getattr(getattr(completion, "usage", None), "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
 
 class LLMClient:
     """百炼大模型客户端"""
@@ -22,10 +78,54 @@ class LLMClient:
         if not self.api_key:
             logger.warning("DASHSCOPE_API_KEY 未设置，请配置环境变量")
         
+        # openai SDK（pydantic 等）导入较重，首次创建客户端时才导入
+        from openai import OpenAI
+        
         self.client = OpenAI(
             api_key=self.api_key,
-            base_url=self.base_url
+            base_url=self.base_url,
+            http_client=get_http_client(),
+            max_retries=DASHSCOPE_HTTP_CONFIG["max_retries"]
         )
+        
+        # 回复缓存：相同请求内容直接返回，不再调用 API
+        self._cache_enabled = LLM_CACHE_CONFIG["enabled"]
+        self._response_cache = TTLCache(
+            max_entries=LLM_CACHE_CONFIG["max_entries"],
+            ttl_seconds=LLM_CACHE_CONFIG["ttl_seconds"]
+        )
+        
+        # 进行中的请求：相同缓存键的并发调用共享同一个 API 请求（single-flight）
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+    
+    @staticmethod
+    def _build_messages(prompt: str, history: List[Dict] = None,
+                        system_prompt: str = None) -> List[Dict]:
+        """组装消息列表：系统提示 + 历史对话 + 当前用户输入"""
+        messages = []
+        if system_prompt:
+            if LLM_EXPLICIT_PREFIX_CACHE:
+                # 显式前缀缓存：系统提示词以内容块形式发送并标记 cache_control
+                messages.append({"role": "system", "content": [
+                    {"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}
+                ]})
+            else:
+                messages.append({"role": "system", "content": system_prompt})
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _cache_key(self, messages: List[Dict], temperature: float) -> str:
+        """按模型、温度和完整消息列表计算内容寻址的缓存键"""
+        payload = orjson.dumps({"m": self.model, "t": temperature, "msg": messages},
+                               option=orjson.OPT_SORT_KEYS)
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+    
+    def clear_cache(self):
+        """清空回复缓存"""
+        self._response_cache.clear()
     
     def generate(self, prompt: str, history: List[Dict] = None, 
                  system_prompt: str = None, temperature: float = 0.7) -> Dict:
@@ -41,22 +141,52 @@ class LLMClient:
         Returns:
             {"success": bool, "content": str, "error": str}
         """
+        messages = self._build_messages(prompt, history, system_prompt)
+        cache_key = self._cache_key(messages, temperature)
+        
+        if self._cache_enabled:
+            cached = self._response_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"[LLM缓存命中] 长度: {len(cached)} 字符")
+                return {
+                    "success": True,
+                    "content": cached,
+                    "error": None
+                }
+        
+        # 相同请求已在进行中则等待其结果，不重复调用 API
+        with self._inflight_lock:
+            future = self._inflight.get(cache_key)
+            is_leader = future is None
+            if is_leader:
+                future = Future()
+                self._inflight[cache_key] = future
+        
+        if not is_leader:
+            logger.info("[LLM合并请求] 等待相同的进行中请求")
+            return dict(future.result())
+        
+        result = None
+        try:
+            result = self._call_completion(messages, temperature)
+            if self._cache_enabled and result["success"] and result["content"]:
+                self._response_cache.set(cache_key, result["content"])
+            return result
+        finally:
+            with self._inflight_lock:
+                self._inflight.pop(cache_key, None)
+            future.set_result(result or {
+                "success": False,
+                "content": None,
+                "error": "LLM 调用失败: 请求被中断"
+            })
+    
+    def _call_completion(self, messages: List[Dict], temperature: float) -> Dict:
+        """限流后调用一次非流式 API"""
         try:
-            messages = []
-            
-            # 添加系统提示
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            # 添加历史对话
-            if history:
-                messages.extend(history)
-            
-            # 添加当前用户输入
-            messages.append({"role": "user", "content": prompt})
-            
             logger.info(f"[LLM调用] 模型: {self.model}, 消息数: {len(messages)}")
             
+            _rate_limiter.acquire()
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
@@ -64,7 +194,7 @@ class LLMClient:
             )
             
             content = completion.choices[0].message.content
-            logger.info(f"[LLM响应] 长度: {len(content)} 字符")
+            logger.info(f"[LLM响应] 长度: {len(content)} 字符, 前缀缓存命中 {_cached_tokens(completion)} tokens")
             
             return {
                 "success": True,
@@ -81,27 +211,57 @@ class LLMClient:
                 "error": error_msg
             }
     
+    def generate_many(self, prompts: List[str], system_prompt: str = None,
+                      temperature: float = 0.7) -> List[Dict]:
+        """
+        并发生成多个相互独立的回复（共享 HTTP 连接池，HTTP/2 下复用同一连接）
+        
+        Args:
+            prompts: 用户输入列表
+            system_prompt: 系统提示词
+            temperature: 温度参数
+            
+        Returns:
+            与 prompts 顺序一致的 generate() 结果列表
+        """
+        if len(prompts) <= 1:
+            return [self.generate(prompt, system_prompt=system_prompt, temperature=temperature)
+                    for prompt in prompts]
+        
+        max_workers = min(len(prompts), DASHSCOPE_HTTP_CONFIG["max_parallel_requests"])
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="llm-batch") as executor:
+            return list(executor.map(
+                lambda prompt: self.generate(prompt, system_prompt=system_prompt, temperature=temperature),
+                prompts
+            ))
+    
     def generate_stream(self, prompt: str, history: List[Dict] = None,
-                        system_prompt: str = None, temperature: float = 0.7) -> Generator[str, None, None]:
+                        system_prompt: str = None, temperature: float = 0.7,
+                        raise_errors: bool = False) -> Generator[str, None, None]:
         """
         流式生成回复
         
+        Args:
+            raise_errors: 调用失败时抛出 LLMStreamError，而不是输出错误提示文本
+        
         Yields:
             生成的文本片段
         """
         try:
-            messages = []
-            
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            if history:
-                messages.extend(history)
+            messages = self._build_messages(prompt, history, system_prompt)
             
-            messages.append({"role": "user", "content": prompt})
+            # 命中缓存时直接回放完整内容
+            cache_key = self._cache_key(messages, temperature) if self._cache_enabled else None
+            if cache_key:
+                cached = self._response_cache.get(cache_key)
+                if cached is not None:
+                    logger.info(f"[LLM缓存命中] 流式回放 {len(cached)} 字符")
+                    yield cached
+                    return
             
             logger.info(f"[LLM流式调用] 模型: {self.model}")
             
+            _rate_limiter.acquire()
             completion = self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
@@ -109,14 +269,27 @@ class LLMClient:
                 stream=True
             )
             
+            parts = []
+            append = parts.append
             for chunk in completion:
-                if chunk.choices[0].delta.content:
-                    yield chunk.choices[0].delta.content
+                choices = chunk.choices
+                if not choices:
+                    continue
+                content = choices[0].delta.content
+                if content:
+                    append(content)
+                    yield content
+            
+            # 仅在流完整结束后写入缓存（中途异常或客户端断开不缓存半截内容）
+            if cache_key and parts:
+                self._response_cache.set(cache_key, "".join(parts))
                     
         except Exception as e:
             error_msg = f"LLM 流式调用失败: {str(e)}"
             logger.error(error_msg)
-            yield f"\n[错误] {error_msg}"
+            if raise_errors:
+                raise LLMStreamError(error_msg) from e
+            yield f"\n{STREAM_ERROR_MARKER} {error_msg}"
 
 
 # 医疗助手系统提示词
@@ -144,12 +317,15 @@ MEDICAL_SYSTEM_PROMPT = """你是一个专业的医疗知识助手，专注于
 
 # 全局 LLM 客户端实例
 _llm_client: Optional[LLMClient] = None
+_llm_client_lock = threading.Lock()
 
 
 def get_llm_client() -> LLMClient:
     """获取全局 LLM 客户端实例"""
     global _llm_client
     if _llm_client is None:
-        _llm_client = LLMClient()
+        with _llm_client_lock:
+            if _llm_client is None:
+                _llm_client = LLMClient()
     return _llm_client
 
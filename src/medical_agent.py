@@ -2,42 +2,261 @@
 """
 医疗智能体核心模块 - 整合所有功能的决策支持服务
 """
+import hashlib
 import logging
 import json
-from typing import Dict, List, Optional, Generator
+import re
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import cached_property
+from typing import Deque, Dict, List, Optional, Generator, Tuple, TypedDict, Union
 from datetime import datetime
 
-from src.llm_client import get_llm_client, MEDICAL_SYSTEM_PROMPT
+from src.llm_client import (
+    LLMClient, LLMStreamError, get_llm_client, MEDICAL_SYSTEM_PROMPT, STREAM_ERROR_MARKER
+)
 from src.db_client import (
+    DBClient,
     get_db_client, 
     check_db_connection, 
+    get_cached_db_status,
     DatabaseConnectionError,
     set_db_failure_simulation,
     is_db_failure_simulation_enabled
 )
-from src.rag_service import get_rag_service
-from src.risk_engine import get_risk_engine
-from src.safety_guard import get_safety_guard, SafetyWarning
-from src.term_mapper import get_term_mapper
-from src.data_ingest import ExcelProcessor, get_pdf_toc_and_tables
-from src.config import EXCEL_FILE
+from src.rag_service import RAGService, get_rag_service
+from src.risk_engine import RiskEngine, get_risk_engine
+from src.safety_guard import SafetyGuard, get_safety_guard, SafetyWarning
+from src.term_mapper import TermMapper, get_term_mapper
+from src.data_ingest import get_insulin_usage_analysis, get_pdf_toc_and_tables
+from src.config import AGENT_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# SOAP 问诊系统提示词
+SOAP_SYSTEM_PROMPT = "你是一位专业的内科医生，擅长高血压和糖尿病的诊疗。请使用专业但易懂的语言与患者交流。"
+
+# 需要患者上下文的意图（治疗查询用于安全检查，急症和一般问答写入 RAG 提示词；
+# 患者查询在处理器内自行获取档案，诊断、指南和 SOAP 问诊不使用患者信息）
+PATIENT_CONTEXT_INTENTS = frozenset({"treatment", "emergency", "general"})
+
+# 流式输出 LLM 生成内容的意图，其余意图复用 chat() 的同步结果
+STREAMING_INTENTS = frozenset({"diagnosis", "treatment", "emergency", "soap_inquiry", "general"})
+
+# 数据库不可用时的降级提示（占位符: message, patient_id）
+DB_UNAVAILABLE_TEMPLATE = """## ⚠️ 数据库服务暂时不可用
+
+**错误信息**: {message}
+
+### 📋 系统状态
+- **患者ID**: {patient_id}
+- **数据库状态**: 🔴 不可用
+- **降级模式**: 已启用
+
+### 💡 当前可用功能
+
+虽然无法访问患者数据库，但您仍可以使用以下功能：
+
+1. **📚 医学知识查询**
+   - 查询高血压/糖尿病诊疗指南
+   - 获取药物使用建议
+   - 了解疾病症状和诊断标准
+
+2. **📊 Excel数据分析**
+   - 查询糖尿病患者统计数据
+   - 分析胰岛素使用率
+
+3. **🤖 智能问答**
+   - 进行 SOAP 格式问诊
+   - 获取一般医学建议
+
+### 🔧 建议操作
+
+- 请稍后重试查询患者信息
+- 如问题持续，请联系系统管理员
+- 可以先使用知识库查询功能
+
+---
+*提示：输入 "高血压治疗指南" 或 "糖尿病用药建议" 等问题，我可以为您提供相关医学知识。*
+"""
+
+# 诊断推理 / 治疗方案 / SOAP 问诊提示词模板（固定说明在前、用户输入在后，便于命中 LLM 前缀缓存）
+DIAGNOSIS_PROMPT_TEMPLATE = """基于患者信息和医学知识，进行鉴别诊断分析。
+
+要求：
+1. 列出至少3个可能的诊断，按概率排序
+2. 说明诊断依据和推理过程
+3. 标注证据等级
+4. 提出需要进一步检查的项目
+
+参考资料已在上下文中提供。
+
+患者信息/症状描述：{message}
+
+请给出结构化的鉴别诊断分析："""
+
+TREATMENT_PROMPT_TEMPLATE = """基于医学指南和患者情况，生成个性化治疗方案。
+
+要求：
+1. 给出具体的药物选择和剂量
+2. 说明选择依据
+3. 标注证据等级（如ⅠA、ⅠB、ⅡA等）
+4. 列出需要注意的禁忌和不良反应
+5. 给出随访监测建议
+
+查询：{message}
+
+请生成结构化的治疗方案："""
+
+SOAP_PROMPT_TEMPLATE = """你是一位经验丰富的内科医生，正在对患者进行问诊。
+
+请按照 SOAP 格式进行结构化问诊：
+
+**S (Subjective 主观资料)**
+请询问患者以下信息（列出需要追问的问题）：
+- 症状的具体表现
+- 起病时间和持续时间
+- 诱发和缓解因素
+- 伴随症状
+- 既往病史
+
+**O (Objective 客观资料)**
+建议检查的项目：
+- 体格检查
+- 实验室检查
+- 影像学检查
+
+**A (Assessment 评估)**
+根据现有信息的初步判断和鉴别诊断思路
+
+**P (Plan 计划)**
+下一步诊疗计划
+
+患者主诉："{message}"
+
+请以问诊对话的形式，首先向患者追问关键信息："""
+
+# 高血压急症处理指南（急症查询固定输出，RAG 检索结果追加在其后）
+EMERGENCY_GUIDE = """## 🚨 高血压急症处理指南
+
+### 识别标准
+- 收缩压 > 180 mmHg 和/或 舒张压 > 120 mmHg
+- 伴有靶器官急性损害表现
+
+### 紧急处理步骤
+
+1. **立即评估**
+   - 确认血压读数
+   - 评估靶器官损害（头痛、视力改变、胸痛、呼吸困难）
+   - 完善必要检查（心电图、肾功能、CT/MRI）
+
+2. **降压治疗** (证据等级 ⅠA)
+   - 启动静脉降压治疗
+   - 首选药物：乌拉地尔、硝普钠、尼卡地平
+   - 目标：1小时内降低不超过25%
+
+3. **转诊建议**
+   - 建议紧急转诊至急诊科/ICU
+   - 持续心电监护
+   - 专科会诊
+
+### 特殊情况处理
+
+- **高血压脑病**：降压同时预防脑水肿
+- **主动脉夹层**：快速降压，目标SBP 100-120 mmHg
+- **急性冠脉综合征**：联合抗缺血治疗
+
+---
+*来源: 中国高血压防治指南2023 (证据等级ⅠA)*
+"""
+
+EMERGENCY_GUIDE_SOURCE = {"type": "指南", "name": "中国高血压防治指南2023"}
+
+# 急症 RAG 补充信息的小节标题
+EMERGENCY_SUPPLEMENT_HEADER = "\n\n### 📚 相关指南信息\n"
+
+
+def _keyword_pattern(*keywords: str) -> "re.Pattern":
+    """将一组关键词编译为单个正则交替式，一次扫描判断是否命中任一关键词"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
+# 意图识别关键词（按类别预编译）
+_OUT_OF_SCOPE_RE = _keyword_pattern(
+    "骨折", "骨科", "眼科", "皮肤", "癌症", "肿瘤", "手术", "外科",
+    "妇科", "产科", "儿科", "耳鼻喉", "口腔", "精神", "心理"
+)
+_SUPPORTED_RE = _keyword_pattern("高血压", "糖尿病", "血压", "血糖")
+_EMERGENCY_RE = _keyword_pattern("急症", "急诊", "紧急", "180", "190", "200", "昏迷", "休克")
+_DIAGNOSIS_RE = _keyword_pattern("诊断", "鉴别", "是什么病", "什么症状", "症状")
+_TREATMENT_RE = _keyword_pattern("治疗", "方案", "用药", "药物", "处方", "怎么治")
+_GUIDELINE_RE = _keyword_pattern("指南", "推荐", "证据", "等级")
+_SOAP_RE = _keyword_pattern("头晕", "头痛", "不舒服", "难受")
+
+# 从消息中提取患者ID / 指南更新日期
+_PATIENT_ID_RE = re.compile(r'(?:患者|ID|id)[=:：]?\s*(\S+)')
+_DATE_RE = re.compile(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2})')
+_DATE_TRANS = str.maketrans({"年": "-", "月": "-", "/": "-"})
+
+# 对话处理中的并发 I/O 线程池：患者画像查询与 RAG 检索、LLM 调用重叠执行
+_io_executor = ThreadPoolExecutor(max_workers=AGENT_CONFIG["io_workers"], thread_name_prefix="agent-io")
+
+
+class AgentResponse(TypedDict, total=False):
+    """智能体问答结果（chat() 返回值及流式 done 事件的 data）"""
+    answer: str
+    sources: List[Dict]
+    success: bool
+    warnings: List[Dict]            # SafetyWarning.to_dict() 列表
+    profile: Dict                   # 患者查询：完整患者画像
+    assessment: Dict                # 患者查询：风险评估结果
+    is_emergency: bool
+    is_out_of_scope: bool
+    has_knowledge: bool
+    normalized_query: str
+    inquiry_type: str
+    total_hits: int
+    db_unavailable: bool            # 数据库不可用时的降级结果
+    degraded_mode: bool
+    error: Optional[str]
+
 
 class MedicalAgent:
     """医疗智能体 - 集成所有决策支持功能"""
     
     def __init__(self):
-        self.llm = get_llm_client()
-        self.db = get_db_client()
-        self.rag = get_rag_service()
-        self.risk_engine = get_risk_engine()
-        self.safety_guard = get_safety_guard()
-        self.term_mapper = get_term_mapper()
-        self.conversation_history: List[Dict] = []
-    
-    def chat(self, message: str, patient_id: str = None) -> Dict:
+        # 只保留最近几条对话历史（生成时仅使用这些），超出后自动淘汰最早的消息
+        self.conversation_history: Deque[Dict] = deque(maxlen=AGENT_CONFIG["history_messages"])
+        self._history_lock = threading.Lock()
+    
+    # 各子系统在首次访问时才创建（对应的 get_* 工厂线程安全），
+    # 只走部分处理路径的请求不必加载向量索引、建立连接池等
+    @cached_property
+    def llm(self) -> LLMClient:
+        return get_llm_client()
+    
+    @cached_property
+    def db(self) -> DBClient:
+        return get_db_client()
+    
+    @cached_property
+    def rag(self) -> RAGService:
+        return get_rag_service()
+    
+    @cached_property
+    def risk_engine(self) -> RiskEngine:
+        return get_risk_engine()
+    
+    @cached_property
+    def safety_guard(self) -> SafetyGuard:
+        return get_safety_guard()
+    
+    @cached_property
+    def term_mapper(self) -> TermMapper:
+        return get_term_mapper()
+    
+    def chat(self, message: str, patient_id: str = None) -> AgentResponse:
         """
         智能对话入口
         
@@ -50,30 +269,15 @@ class MedicalAgent:
         """
         logger.info(f"[智能体] 收到消息: {message[:50]}...")
         
-        # 术语标准化
-        normalized_message = self.term_mapper.expand_query(message)
-        
-        # 获取患者上下文 - 带数据库异常处理
-        patient_context = None
-        db_available = True
-        if patient_id:
-            try:
-                db_status = check_db_connection()
-                if db_status["connected"]:
-                    patient_context = self.db.get_full_patient_profile(patient_id)
-                    if patient_context.get("db_unavailable"):
-                        db_available = False
-                        patient_context = None
-                else:
-                    db_available = False
-                    logger.warning(f"[智能体] 数据库不可用，跳过患者上下文获取")
-            except DatabaseConnectionError as e:
-                db_available = False
-                logger.warning(f"[智能体] 获取患者上下文失败: {str(e)}")
-        
-        # 意图识别与路由
-        intent = self._classify_intent(message)
+        # 意图识别与路由（术语标准化在 RAG 检索内进行）
+        intent, out_of_scope = self._screen_out_of_scope(message, self._classify_intent(message))
         logger.info(f"[智能体] 识别意图: {intent}")
+        if out_of_scope is not None:
+            return out_of_scope
+        
+        # 获取患者上下文 - 仅在处理器需要时查询数据库，在后台线程执行，
+        # 处理器先发起检索 / LLM 调用，真正用到患者信息时再等待结果
+        patient_context = self._fetch_patient_context_async(patient_id, intent)
         
         # 根据意图路由到不同处理器
         if intent == "patient_query":
@@ -92,120 +296,377 @@ class MedicalAgent:
             # 默认 RAG 问答
             return self._handle_general_query(message, patient_context)
     
+    def chat_stream(self, message: str, patient_id: str = None) -> Generator[Dict, None, None]:
+        """
+        流式智能对话入口
+        
+        诊断、治疗、急症、SOAP 问诊和一般问答逐段输出 LLM 生成内容（急症先输出静态处理指南）；
+        患者查询逐节输出画像报告；指南查询的结果一次性输出。
+        
+        Args:
+            message: 用户消息
+            patient_id: 患者ID（可选）
+            
+        Yields:
+            {"type": "start", "intent": str}
+            {"type": "sources", "sources": list}  # 可选，检索来源先于生成内容确定时输出
+            {"type": "delta", "content": str}
+            {"type": "done", "data": dict}  # data 与 chat() 返回结构一致
+        """
+        logger.info(f"[智能体] 收到流式消息: {message[:50]}...")
+        
+        intent, out_of_scope = self._screen_out_of_scope(message, self._classify_intent(message))
+        logger.info(f"[智能体] 识别意图: {intent}")
+        yield {"type": "start", "intent": intent}
+        
+        if out_of_scope is not None:
+            yield from self._stream_static(out_of_scope)
+            return
+        
+        if intent == "patient_query":
+            yield from self._stream_patient_query(message, patient_id)
+            return
+        
+        if intent not in STREAMING_INTENTS:
+            # 非 LLM 生成的意图直接复用同步处理结果
+            yield from self._stream_static(self.chat(message, patient_id))
+            return
+        
+        patient_context = self._fetch_patient_context_async(patient_id, intent)
+        
+        answer_parts = []
+        record_history = True
+        retrieval = None  # 后台检索，流式输出结束后再取来源
+        if intent == "diagnosis":
+            prepared = self.rag.prepare_answer(message)
+            if not prepared["has_knowledge"]:
+                yield from self._stream_static(prepared["response"])
+                return
+            stream = self.llm.generate_stream(
+                prompt=DIAGNOSIS_PROMPT_TEMPLATE.format(message=message),
+                history=self._recent_history(),
+                system_prompt=MEDICAL_SYSTEM_PROMPT,
+                raise_errors=True
+            )
+            result = {"sources": prepared["sources"]}
+        elif intent == "treatment":
+            # 治疗方案的生成不依赖检索结果，来源检索放到后台，首个片段不必等待检索完成
+            retrieval = _io_executor.submit(self.rag.prepare_answer, message)
+            patient_context = self._resolve_patient_context(patient_context)
+            warnings = self.safety_guard.check(patient_context) if patient_context else []
+            if warnings:
+                warning_text = self.safety_guard.format_warnings(warnings) + "\n\n"
+                answer_parts.append(warning_text)
+                yield {"type": "delta", "content": warning_text}
+            record_history = False
+            stream = self.llm.generate_stream(
+                prompt=TREATMENT_PROMPT_TEMPLATE.format(message=message),
+                history=self._recent_history(),
+                system_prompt=MEDICAL_SYSTEM_PROMPT,
+                raise_errors=True
+            )
+            result = {
+                "sources": [],
+                "warnings": [w.to_dict() for w in warnings]
+            }
+        elif intent == "emergency":
+            # 急症处理指南是静态内容，立即输出，不等待 RAG 检索与生成
+            answer_parts.append(EMERGENCY_GUIDE)
+            yield {"type": "delta", "content": EMERGENCY_GUIDE}
+            record_history = False
+            prepared = self.rag.prepare_answer(message, patient_context)
+            stream = self._stream_emergency_supplement(prepared)
+            result = {
+                "sources": prepared.get("sources", []) + [EMERGENCY_GUIDE_SOURCE],
+                "is_emergency": True
+            }
+        elif intent == "soap_inquiry":
+            stream = self.llm.generate_stream(
+                prompt=SOAP_PROMPT_TEMPLATE.format(message=message),
+                system_prompt=SOAP_SYSTEM_PROMPT,
+                raise_errors=True
+            )
+            result = {"sources": [], "inquiry_type": "SOAP"}
+        elif intent == "general":
+            prepared = self.rag.prepare_answer(message, patient_context)
+            if not prepared["has_knowledge"]:
+                yield from self._stream_static(prepared["response"])
+                return
+            stream = self.llm.generate_stream(
+                prompt=prepared["prompt"],
+                history=self._recent_history(),
+                system_prompt=MEDICAL_SYSTEM_PROMPT,
+                raise_errors=True
+            )
+            result = {
+                "sources": prepared["sources"],
+                "has_knowledge": True,
+                "normalized_query": prepared["normalized_query"]
+            }
+        
+        # 检索来源在生成开始前已确定时先行输出，客户端无需等到生成结束
+        if retrieval is None and result["sources"]:
+            yield {"type": "sources", "sources": result["sources"]}
+        
+        error = None
+        try:
+            for piece in stream:
+                answer_parts.append(piece)
+                yield {"type": "delta", "content": piece}
+        except LLMStreamError as e:
+            # 生成失败：错误提示照常输出给客户端，但不记入对话历史，结果标记为失败
+            error = str(e)
+            error_text = f"\n{STREAM_ERROR_MARKER} {error}"
+            answer_parts.append(error_text)
+            yield {"type": "delta", "content": error_text}
+        
+        answer = "".join(answer_parts)
+        if record_history and error is None:
+            self._append_history(message, answer)
+        
+        if retrieval is not None:
+            result["sources"] = retrieval.result().get("sources", [])
+        
+        result["answer"] = answer
+        result["success"] = error is None
+        if error is not None:
+            result["error"] = error
+        yield {"type": "done", "data": result}
+    
+    def _screen_out_of_scope(self, message: str, intent: str) -> Tuple[str, Optional[AgentResponse]]:
+        """
+        确认超出范围的问题，直接返回提示结果，不查询患者上下文、不截取对话历史、不检索
+        
+        意图关键词只覆盖部分专科，RAG 判定仍在知识库范围内时按一般问答处理。
+        
+        Returns:
+            (意图, 超出范围时的提示结果或 None)
+        """
+        if intent != "out_of_scope":
+            return intent, None
+        response = self.rag.out_of_scope_response(message)
+        if response is None:
+            return "general", None
+        return intent, response
+    
+    def _stream_static(self, result: AgentResponse) -> Generator[Dict, None, None]:
+        """将一次性生成的结果转换为流式事件"""
+        if result.get("answer"):
+            yield {"type": "delta", "content": result["answer"]}
+        yield {"type": "done", "data": result}
+    
+    def _stream_emergency_supplement(self, prepared: Dict) -> Generator[str, None, None]:
+        """流式生成急症的 RAG 补充信息，有内容时才输出小节标题"""
+        if not prepared["has_knowledge"]:
+            return
+        stream = self.llm.generate_stream(
+            prompt=prepared["prompt"],
+            system_prompt=MEDICAL_SYSTEM_PROMPT,
+            raise_errors=True
+        )
+        header = EMERGENCY_SUPPLEMENT_HEADER
+        for piece in stream:
+            if header:
+                piece, header = header + piece, ""
+            yield piece
+    
+    def _fetch_patient_context_async(self, patient_id: str, intent: str) -> Optional[Future]:
+        """意图需要患者上下文时在后台线程查询，返回 Future；否则返回 None"""
+        if not patient_id or intent not in PATIENT_CONTEXT_INTENTS:
+            return None
+        return _io_executor.submit(self._get_patient_context, patient_id)
+    
+    @staticmethod
+    def _resolve_patient_context(patient_context: Union[Dict, Future, None]) -> Optional[Dict]:
+        """等待后台查询的患者上下文"""
+        if isinstance(patient_context, Future):
+            return patient_context.result()
+        return patient_context
+    
+    def _recent_history(self) -> List[Dict]:
+        """获取对话历史快照（传给 LLM 的消息列表）"""
+        with self._history_lock:
+            return list(self.conversation_history)
+    
+    def _append_history(self, message: str, answer: str):
+        """追加一轮对话历史（多个请求线程共享同一智能体实例）"""
+        with self._history_lock:
+            self.conversation_history.append({"role": "user", "content": message})
+            self.conversation_history.append({"role": "assistant", "content": answer})
+    
+    def history_digest(self) -> str:
+        """对话历史摘要（语义缓存命名空间的一部分，同一问题在不同对话上下文中的回答不共用）"""
+        history = self._recent_history()
+        if not history:
+            return ""
+        payload = json.dumps(history, ensure_ascii=False).encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=8).hexdigest()
+    
+    def last_turn_is(self, message: str, answer: str) -> bool:
+        """最近一轮对话历史是否为该问答（判断处理路径是否记录了对话历史）"""
+        with self._history_lock:
+            return (len(self.conversation_history) >= 2
+                    and self.conversation_history[-2]["content"] == message
+                    and self.conversation_history[-1]["content"] == answer)
+    
+    def record_cached_turn(self, message: str, answer: str):
+        """缓存命中时补记对话历史，与实际处理时的历史保持一致"""
+        self._append_history(message, answer)
+    
+    def _get_patient_context(self, patient_id: str = None) -> Optional[Dict]:
+        """获取患者上下文，数据库不可用时返回 None"""
+        if not patient_id:
+            return None
+        
+        try:
+            db_status = get_cached_db_status()
+            if not db_status["connected"]:
+                logger.warning(f"[智能体] 数据库不可用，跳过患者上下文获取")
+                return None
+            
+            patient_context = self.db.get_full_patient_profile(patient_id)
+            if patient_context.get("db_unavailable"):
+                return None
+            return patient_context
+        except DatabaseConnectionError as e:
+            logger.warning(f"[智能体] 获取患者上下文失败: {str(e)}")
+            return None
+    
     def _classify_intent(self, message: str) -> str:
         """简单的意图分类"""
-        message_lower = message.lower()
+        # 关键词均为中文或数字，大小写转换不影响其匹配；统一在一份小写副本上扫描，
+        # 患者查询中的 "ID" 也在同一副本上判断，不再另做 upper()
+        text = message.lower()
         
         # 首先检查是否超出范围（优先判断）
-        out_of_scope_keywords = [
-            "骨折", "骨科", "眼科", "皮肤", "癌症", "肿瘤", "手术", "外科",
-            "妇科", "产科", "儿科", "耳鼻喉", "口腔", "精神", "心理"
-        ]
-        # 如果包含超出范围关键词，且不包含支持的关键词，直接返回 general 让 RAG 处理
-        has_out_of_scope = any(kw in message_lower for kw in out_of_scope_keywords)
-        supported_keywords = ["高血压", "糖尿病", "血压", "血糖"]
-        has_supported = any(kw in message_lower for kw in supported_keywords)
-        
-        if has_out_of_scope and not has_supported:
-            # 超出范围的问题，返回 general 让 RAG 的 _is_out_of_scope 处理
-            return "general"
+        # 如果包含超出范围关键词，且不包含支持的关键词，交由 _screen_out_of_scope 确认
+        if _OUT_OF_SCOPE_RE.search(text) and not _SUPPORTED_RE.search(text):
+            return "out_of_scope"
         
         # 紧急情况
-        emergency_keywords = ["急症", "急诊", "紧急", "180", "190", "200", "昏迷", "休克"]
-        if any(kw in message for kw in emergency_keywords):
+        if _EMERGENCY_RE.search(text):
             return "emergency"
         
         # 患者查询
-        if "患者" in message and ("画像" in message or "信息" in message or "ID" in message.upper()):
+        if "患者" in text and ("画像" in text or "信息" in text or "id" in text):
             return "patient_query"
         
         # 诊断相关
-        diagnosis_keywords = ["诊断", "鉴别", "是什么病", "什么症状", "症状"]
-        if any(kw in message for kw in diagnosis_keywords):
+        if _DIAGNOSIS_RE.search(text):
             return "diagnosis"
         
         # 治疗相关
-        treatment_keywords = ["治疗", "方案", "用药", "药物", "处方", "怎么治"]
-        if any(kw in message for kw in treatment_keywords):
+        if _TREATMENT_RE.search(text):
             return "treatment"
         
         # 指南查询
-        guideline_keywords = ["指南", "推荐", "证据", "等级"]
-        if any(kw in message for kw in guideline_keywords):
+        if _GUIDELINE_RE.search(text):
             return "guideline"
         
         # SOAP 问诊
-        soap_keywords = ["头晕", "头痛", "不舒服", "难受"]
-        if any(kw in message for kw in soap_keywords) and len(message) < 50:
+        if len(message) < 50 and _SOAP_RE.search(text):
             return "soap_inquiry"
         
         return "general"
     
-    def _handle_patient_query(self, message: str, patient_id: str = None) -> Dict:
+    def _handle_patient_query(self, message: str, patient_id: str = None) -> AgentResponse:
         """处理患者信息查询"""
+        loaded = self._load_patient_report(message, patient_id)
+        if "response" in loaded:
+            return loaded["response"]
+        
+        # 生成患者画像报告
+        report = "".join(self._iter_patient_report(
+            loaded["profile"], loaded["assessment"], loaded["warnings"]
+        ))
+        return self._patient_report_result(report, loaded)
+    
+    def _stream_patient_query(self, message: str, patient_id: str = None) -> Generator[Dict, None, None]:
+        """流式输出患者画像报告，每生成一个小节立即输出"""
+        loaded = self._load_patient_report(message, patient_id)
+        if "response" in loaded:
+            yield from self._stream_static(loaded["response"])
+            return
+        
+        sections = []
+        for section in self._iter_patient_report(loaded["profile"], loaded["assessment"], loaded["warnings"]):
+            sections.append(section)
+            yield {"type": "delta", "content": section}
+        yield {"type": "done", "data": self._patient_report_result("".join(sections), loaded)}
+    
+    def _load_patient_report(self, message: str, patient_id: str = None) -> Dict:
+        """
+        获取生成患者画像报告所需的数据
+        
+        Returns:
+            可生成报告时: {"profile": dict, "assessment": dict, "warnings": list}
+            否则: {"response": dict}，response 可直接作为查询结果返回
+        """
         if not patient_id:
             # 尝试从消息中提取患者ID
-            import re
-            id_match = re.search(r'(?:患者|ID|id)[=:：]?\s*(\S+)', message)
+            id_match = _PATIENT_ID_RE.search(message)
             if id_match:
                 patient_id = id_match.group(1)
         
         if not patient_id:
-            return {
+            return {"response": {
                 "answer": "请提供患者ID以查询患者信息。例如：查询患者ID=1002_0_20210504的信息",
                 "sources": [],
                 "success": True
-            }
+            }}
         
         # 检查数据库连接状态
-        db_status = check_db_connection()
+        db_status = get_cached_db_status()
         if not db_status["connected"]:
-            return self._handle_db_unavailable(patient_id, db_status)
+            return {"response": self._handle_db_unavailable(patient_id, db_status)}
         
         # 获取完整患者画像
         try:
             profile = self.db.get_full_patient_profile(patient_id)
         except DatabaseConnectionError as e:
-            return self._handle_db_unavailable(patient_id, {
+            return {"response": self._handle_db_unavailable(patient_id, {
                 "connected": False,
                 "message": str(e),
                 "simulated_failure": True
-            })
+            })}
         
         # 检查是否数据库不可用
         if profile.get("db_unavailable"):
-            return self._handle_db_unavailable(patient_id, {
+            return {"response": self._handle_db_unavailable(patient_id, {
                 "connected": False,
                 "message": profile.get("error", "数据库连接失败"),
                 "simulated_failure": True
-            })
+            })}
         
         if not profile.get("basic_info"):
-            return {
+            return {"response": {
                 "answer": f"未找到患者ID为 {patient_id} 的信息，请确认患者ID是否正确。",
                 "sources": [],
                 "success": True
-            }
+            }}
         
-        # 进行风险评估
-        assessment = self.risk_engine.comprehensive_assessment(patient_id)
+        # 进行风险评估（复用已获取的患者画像）
+        assessment = self.risk_engine.comprehensive_assessment(patient_id, profile)
         
         # 安全检查
         warnings = self.safety_guard.check(profile)
         
-        # 生成患者画像报告
-        report = self._generate_patient_report(profile, assessment, warnings)
-        
+        return {"profile": profile, "assessment": assessment, "warnings": warnings}
+    
+    @staticmethod
+    def _patient_report_result(report: str, loaded: Dict) -> AgentResponse:
+        """组装患者查询结果"""
+        profile = loaded["profile"]
         return {
             "answer": report,
             "profile": profile,
-            "assessment": assessment,
-            "warnings": [self._warning_to_dict(w) for w in warnings],
+            "assessment": loaded["assessment"],
+            "warnings": [w.to_dict() for w in loaded["warnings"]],
             "sources": [{"type": "mysql", "tables": profile["source"]["tables"]}],
             "success": True
         }
     
-    def _handle_db_unavailable(self, patient_id: str, db_status: Dict) -> Dict:
+    def _handle_db_unavailable(self, patient_id: str, db_status: Dict) -> AgentResponse:
         """
         处理数据库不可用的情况 - 优雅降级
         
@@ -219,41 +680,10 @@ class MedicalAgent:
         logger.warning(f"[优雅降级] 数据库不可用，无法查询患者 {patient_id} 的信息")
         
         # 构建友好的降级提示
-        degraded_response = f"""## ⚠️ 数据库服务暂时不可用
-
-**错误信息**: {db_status.get('message', '未知错误')}
-
-### 📋 系统状态
-- **患者ID**: {patient_id}
-- **数据库状态**: 🔴 不可用
-- **降级模式**: 已启用
-
-### 💡 当前可用功能
-
-虽然无法访问患者数据库，但您仍可以使用以下功能：
-
-1. **📚 医学知识查询**
-   - 查询高血压/糖尿病诊疗指南
-   - 获取药物使用建议
-   - 了解疾病症状和诊断标准
-
-2. **📊 Excel数据分析**
-   - 查询糖尿病患者统计数据
-   - 分析胰岛素使用率
-
-3. **🤖 智能问答**
-   - 进行 SOAP 格式问诊
-   - 获取一般医学建议
-
-### 🔧 建议操作
-
-- 请稍后重试查询患者信息
-- 如问题持续，请联系系统管理员
-- 可以先使用知识库查询功能
-
----
-*提示：输入 "高血压治疗指南" 或 "糖尿病用药建议" 等问题，我可以为您提供相关医学知识。*
-"""
+        degraded_response = DB_UNAVAILABLE_TEMPLATE.format(
+            message=db_status.get('message', '未知错误'),
+            patient_id=patient_id
+        )
         
         return {
             "answer": degraded_response,
@@ -264,151 +694,140 @@ class MedicalAgent:
             "error": db_status.get('message')
         }
     
-    def _generate_patient_report(self, profile: Dict, assessment: Dict, 
-                                 warnings: List[SafetyWarning]) -> str:
-        """生成患者画像报告"""
+    def _iter_patient_report(self, profile: Dict, assessment: Dict,
+                             warnings: List[SafetyWarning]) -> Generator[str, None, None]:
+        """逐个小节生成患者画像报告（除首节外每节以换行符开头，拼接即为完整报告）"""
         basic = profile.get("basic_info", {})
         ha = profile.get("hypertension_assessment")
         da = profile.get("diabetes_assessment")
         meds = profile.get("medications", [])
-        
-        report_parts = []
+        assessments = assessment.get("assessments", {})
+        hp_assess = assessments.get("hypertension", {})
         
         # 基本信息
-        report_parts.append("## 📋 患者画像报告\n")
-        report_parts.append(f"**患者ID**: {profile['patient_id']}")
-        report_parts.append(f"**姓名**: {basic.get('name', '未知')}")
-        report_parts.append(f"**性别**: {basic.get('gender', '未知')}")
-        report_parts.append(f"**年龄**: {basic.get('age', '未知')}岁")
-        
+        section = (
+            "## 📋 患者画像报告\n"
+            f"\n**患者ID**: {profile['patient_id']}"
+            f"\n**姓名**: {basic.get('name', '未知')}"
+            f"\n**性别**: {basic.get('gender', '未知')}"
+            f"\n**年龄**: {basic.get('age', '未知')}岁"
+        )
         if basic.get('bmi'):
-            report_parts.append(f"**BMI**: {basic.get('bmi')}")
+            section += f"\n**BMI**: {basic.get('bmi')}"
+        yield section
         
         # 血压评估
         if ha:
-            report_parts.append("\n### 🩺 高血压评估")
-            report_parts.append(f"**血压**: {ha.get('sbp', '-')}/{ha.get('dbp', '-')} mmHg")
-            hp_assess = assessment.get("assessments", {}).get("hypertension", {})
+            lines = [
+                "\n\n### 🩺 高血压评估",
+                f"\n**血压**: {ha.get('sbp', '-')}/{ha.get('dbp', '-')} mmHg"
+            ]
             if hp_assess.get("bp_classification"):
-                report_parts.append(f"**血压分级**: {hp_assess['bp_classification'].get('name', '-')}")
-            report_parts.append(f"**风险等级**: {hp_assess.get('risk_level', '未评估')}")
+                lines.append(f"\n**血压分级**: {hp_assess['bp_classification'].get('name', '-')}")
+            lines.append(f"\n**风险等级**: {hp_assess.get('risk_level', '未评估')}")
             
             if hp_assess.get("risk_factors"):
-                report_parts.append(f"**危险因素**: {', '.join(hp_assess['risk_factors'])}")
+                lines.append(f"\n**危险因素**: {', '.join(hp_assess['risk_factors'])}")
+            yield "".join(lines)
         
         # 糖尿病评估
         if da:
-            report_parts.append("\n### 🍬 糖尿病评估")
-            report_parts.append(f"**HbA1c**: {da.get('hba1c', '-')}%")
-            report_parts.append(f"**空腹血糖**: {da.get('fasting_glucose', '-')} mmol/L")
-            dm_assess = assessment.get("assessments", {}).get("diabetes", {})
-            report_parts.append(f"**控制状态**: {dm_assess.get('control_status', '未评估')}")
+            dm_assess = assessments.get("diabetes", {})
+            yield (
+                "\n\n### 🍬 糖尿病评估"
+                f"\n**HbA1c**: {da.get('hba1c', '-')}%"
+                f"\n**空腹血糖**: {da.get('fasting_glucose', '-')} mmol/L"
+                f"\n**控制状态**: {dm_assess.get('control_status', '未评估')}"
+            )
         
         # 当前用药
         if meds:
-            report_parts.append("\n### 💊 当前用药")
+            lines = ["\n\n### 💊 当前用药"]
             for med in meds[:5]:
-                report_parts.append(f"- {med.get('drug_name', '')} {med.get('dosage', '')} {med.get('frequency', '')}")
+                get = med.get
+                lines.append(f"\n- {get('drug_name', '')} {get('dosage', '')} {get('frequency', '')}")
+            yield "".join(lines)
         
         # 安全预警
         if warnings:
-            report_parts.append("\n### ⚠️ 安全预警")
+            lines = ["\n\n### ⚠️ 安全预警"]
             for warning in warnings:
-                report_parts.append(f"- **{warning.type}**: {warning.message}")
+                lines.append(f"\n- **{warning.type}**: {warning.message}")
+            yield "".join(lines)
         
         # 随访计划
-        hp_assess = assessment.get("assessments", {}).get("hypertension", {})
         if hp_assess.get("follow_up_plan"):
             plan = hp_assess["follow_up_plan"]
-            report_parts.append("\n### 📅 随访计划")
-            report_parts.append(f"**随访频率**: {plan.get('frequency', '-')}")
-            report_parts.append(f"**下次随访**: {plan.get('next_visit', '-')}")
-            report_parts.append(f"**监测项目**: {', '.join(plan.get('monitoring', []))}")
+            yield (
+                "\n\n### 📅 随访计划"
+                f"\n**随访频率**: {plan.get('frequency', '-')}"
+                f"\n**下次随访**: {plan.get('next_visit', '-')}"
+                f"\n**监测项目**: {', '.join(plan.get('monitoring', []))}"
+            )
         
         # 治疗建议
         if hp_assess.get("recommendations"):
-            report_parts.append("\n### 💡 治疗建议")
+            lines = ["\n\n### 💡 治疗建议"]
             for rec in hp_assess["recommendations"]:
-                report_parts.append(f"\n**{rec.get('type', '')}** ({rec.get('evidence_level', '')})")
-                report_parts.append(f"{rec.get('content', '')}")
-                if rec.get("drugs"):
-                    report_parts.append(f"推荐药物: {', '.join(rec['drugs'])}")
-                report_parts.append(f"*来源: {rec.get('source', '')}*")
+                get = rec.get
+                lines.append(f"\n\n**{get('type', '')}** ({get('evidence_level', '')})")
+                lines.append(f"\n{get('content', '')}")
+                if get("drugs"):
+                    lines.append(f"\n推荐药物: {', '.join(rec['drugs'])}")
+                lines.append(f"\n*来源: {get('source', '')}*")
+            yield "".join(lines)
         
         # 数据来源
-        report_parts.append("\n---")
-        report_parts.append("*数据来源: MySQL数据库 (patient_info, hypertension_risk_assessment, diabetes_control_assessment, medication_records)*")
-        
-        return "\n".join(report_parts)
+        yield (
+            "\n\n---"
+            "\n*数据来源: MySQL数据库 (patient_info, hypertension_risk_assessment, diabetes_control_assessment, medication_records)*"
+        )
     
-    def _handle_diagnosis_query(self, message: str, patient_context: Dict = None) -> Dict:
+    def _handle_diagnosis_query(self, message: str, patient_context: Dict = None) -> AgentResponse:
         """处理诊断相关查询"""
-        # 使用 RAG 检索相关信息
-        rag_result = self.rag.rag_answer(message, patient_context)
+        # 使用 RAG 检索相关信息（只需检索结果判断知识覆盖并给出来源，不生成 RAG 回答）
+        prepared = self.rag.prepare_answer(message)
         
-        if not rag_result.get("has_knowledge"):
-            return rag_result
-        
-        # 构建诊断推理提示
-        prompt = f"""基于患者信息和医学知识，进行鉴别诊断分析。
-
-要求：
-1. 列出至少3个可能的诊断，按概率排序
-2. 说明诊断依据和推理过程
-3. 标注证据等级
-4. 提出需要进一步检查的项目
-
-患者信息/症状描述：{message}
-
-参考资料已在上下文中提供。
-
-请给出结构化的鉴别诊断分析："""
+        if not prepared["has_knowledge"]:
+            return prepared["response"]
         
         result = self.llm.generate(
-            prompt=prompt,
-            history=self.conversation_history[-4:],
+            prompt=DIAGNOSIS_PROMPT_TEMPLATE.format(message=message),
+            history=self._recent_history(),
             system_prompt=MEDICAL_SYSTEM_PROMPT
         )
         
         if result["success"]:
-            self.conversation_history.append({"role": "user", "content": message})
-            self.conversation_history.append({"role": "assistant", "content": result["content"]})
+            self._append_history(message, result["content"])
         
         return {
             "answer": result["content"] if result["success"] else result["error"],
-            "sources": rag_result.get("sources", []),
+            "sources": prepared["sources"],
             "success": result["success"]
         }
     
-    def _handle_treatment_query(self, message: str, patient_context: Dict = None) -> Dict:
+    def _handle_treatment_query(self, message: str,
+                                patient_context: Union[Dict, Future, None] = None) -> AgentResponse:
         """处理治疗方案查询"""
-        # 使用 RAG 获取指南推荐
-        rag_result = self.rag.rag_answer(message, patient_context)
+        # 治疗方案生成不依赖检索结果和安全检查，先在后台发起 LLM 调用
+        generation = _io_executor.submit(
+            self.llm.generate,
+            prompt=TREATMENT_PROMPT_TEMPLATE.format(message=message),
+            history=self._recent_history(),
+            system_prompt=MEDICAL_SYSTEM_PROMPT
+        )
+        
+        # 使用 RAG 获取指南推荐来源（与 LLM 生成、患者画像查询并行）
+        prepared = self.rag.prepare_answer(message)
+        sources = prepared.get("sources", [])
         
         # 如果有患者上下文，进行安全检查
         warnings = []
+        patient_context = self._resolve_patient_context(patient_context)
         if patient_context:
             warnings = self.safety_guard.check(patient_context)
         
-        # 构建治疗方案生成提示
-        prompt = f"""基于医学指南和患者情况，生成个性化治疗方案。
-
-要求：
-1. 给出具体的药物选择和剂量
-2. 说明选择依据
-3. 标注证据等级（如ⅠA、ⅠB、ⅡA等）
-4. 列出需要注意的禁忌和不良反应
-5. 给出随访监测建议
-
-查询：{message}
-
-请生成结构化的治疗方案："""
-        
-        result = self.llm.generate(
-            prompt=prompt,
-            history=self.conversation_history[-4:],
-            system_prompt=MEDICAL_SYSTEM_PROMPT
-        )
+        result = generation.result()
         
         response = result["content"] if result["success"] else result["error"]
         
@@ -419,72 +838,40 @@ class MedicalAgent:
         
         return {
             "answer": response,
-            "sources": rag_result.get("sources", []),
-            "warnings": [self._warning_to_dict(w) for w in warnings],
+            "sources": sources,
+            "warnings": [w.to_dict() for w in warnings],
             "success": result["success"]
         }
     
-    def _handle_emergency_query(self, message: str, patient_context: Dict = None) -> Dict:
+    def _handle_emergency_query(self, message: str,
+                                patient_context: Union[Dict, Future, None] = None) -> AgentResponse:
         """处理紧急情况查询"""
-        # 首先检查是否是高血压急症
-        emergency_response = """## 🚨 高血压急症处理指南
-
-### 识别标准
-- 收缩压 > 180 mmHg 和/或 舒张压 > 120 mmHg
-- 伴有靶器官急性损害表现
-
-### 紧急处理步骤
-
-1. **立即评估**
-   - 确认血压读数
-   - 评估靶器官损害（头痛、视力改变、胸痛、呼吸困难）
-   - 完善必要检查（心电图、肾功能、CT/MRI）
-
-2. **降压治疗** (证据等级 ⅠA)
-   - 启动静脉降压治疗
-   - 首选药物：乌拉地尔、硝普钠、尼卡地平
-   - 目标：1小时内降低不超过25%
-
-3. **转诊建议**
-   - 建议紧急转诊至急诊科/ICU
-   - 持续心电监护
-   - 专科会诊
-
-### 特殊情况处理
-
-- **高血压脑病**：降压同时预防脑水肿
-- **主动脉夹层**：快速降压，目标SBP 100-120 mmHg
-- **急性冠脉综合征**：联合抗缺血治疗
-
----
-*来源: 中国高血压防治指南2023 (证据等级ⅠA)*
-"""
+        # RAG 补充信息在后台检索生成，与处理指南的组装重叠
+        supplement = _io_executor.submit(self.rag.rag_answer, message, patient_context)
         
-        # 使用 RAG 补充信息
-        rag_result = self.rag.rag_answer(message, patient_context)
+        # 首先给出高血压急症处理指南
+        emergency_response = EMERGENCY_GUIDE
         
+        rag_result = supplement.result()
         if rag_result.get("has_knowledge") and rag_result.get("answer"):
-            emergency_response += f"\n\n### 📚 相关指南信息\n{rag_result['answer']}"
+            emergency_response += EMERGENCY_SUPPLEMENT_HEADER + rag_result["answer"]
         
         return {
             "answer": emergency_response,
-            "sources": rag_result.get("sources", []) + [{"type": "指南", "name": "中国高血压防治指南2023"}],
+            "sources": rag_result.get("sources", []) + [EMERGENCY_GUIDE_SOURCE],
             "is_emergency": True,
             "success": True
         }
     
-    def _handle_guideline_query(self, message: str) -> Dict:
+    def _handle_guideline_query(self, message: str) -> AgentResponse:
         """处理指南查询"""
         # 检查是否有日期过滤
-        import re
-        date_match = re.search(r'(\d{4}[-/年]\d{1,2}[-/月]\d{1,2})', message)
+        date_match = _DATE_RE.search(message)
         
         filters = {}
         if date_match:
-            date_str = date_match.group(1)
-            # 标准化日期格式
-            date_str = date_str.replace('年', '-').replace('月', '-').replace('/', '-')
-            filters["update_date_after"] = date_str
+            # 标准化日期格式（YYYY-MM-DD）
+            filters["update_date_after"] = date_match.group(1).translate(_DATE_TRANS)
         
         # 使用 RAG 检索
         search_results = self.rag.search(message, filters)
@@ -513,42 +900,15 @@ class MedicalAgent:
             "success": True
         }
     
-    def _handle_soap_inquiry(self, message: str, patient_context: Dict = None) -> Dict:
+    def _handle_soap_inquiry(self, message: str, patient_context: Dict = None) -> AgentResponse:
         """处理 SOAP 格式问诊"""
-        soap_prompt = f"""你是一位经验丰富的内科医生，正在对患者进行问诊。患者主诉："{message}"
-
-请按照 SOAP 格式进行结构化问诊：
-
-**S (Subjective 主观资料)**
-请询问患者以下信息（列出需要追问的问题）：
-- 症状的具体表现
-- 起病时间和持续时间
-- 诱发和缓解因素
-- 伴随症状
-- 既往病史
-
-**O (Objective 客观资料)**
-建议检查的项目：
-- 体格检查
-- 实验室检查
-- 影像学检查
-
-**A (Assessment 评估)**
-根据现有信息的初步判断和鉴别诊断思路
-
-**P (Plan 计划)**
-下一步诊疗计划
-
-请以问诊对话的形式，首先向患者追问关键信息："""
-        
         result = self.llm.generate(
-            prompt=soap_prompt,
-            system_prompt="你是一位专业的内科医生，擅长高血压和糖尿病的诊疗。请使用专业但易懂的语言与患者交流。"
+            prompt=SOAP_PROMPT_TEMPLATE.format(message=message),
+            system_prompt=SOAP_SYSTEM_PROMPT
         )
         
         if result["success"]:
-            self.conversation_history.append({"role": "user", "content": message})
-            self.conversation_history.append({"role": "assistant", "content": result["content"]})
+            self._append_history(message, result["content"])
         
         return {
             "answer": result["content"] if result["success"] else result["error"],
@@ -557,9 +917,10 @@ class MedicalAgent:
             "success": result["success"]
         }
     
-    def _handle_general_query(self, message: str, patient_context: Dict = None) -> Dict:
+    def _handle_general_query(self, message: str,
+                              patient_context: Union[Dict, Future, None] = None) -> AgentResponse:
         """处理一般查询"""
-        result = self.rag.rag_answer(message, patient_context, self.conversation_history[-4:])
+        result = self.rag.rag_answer(message, patient_context, self._recent_history())
         
         # 如果是超出范围或无知识库，直接返回，不调用 LLM
         if not result.get("has_knowledge") or result.get("is_out_of_scope"):
@@ -567,26 +928,24 @@ class MedicalAgent:
         
         # 如果有知识库，更新对话历史
         if result.get("success") and result.get("has_knowledge"):
-            self.conversation_history.append({"role": "user", "content": message})
-            self.conversation_history.append({"role": "assistant", "content": result.get("answer", "")})
+            self._append_history(message, result.get("answer", ""))
         
         return result
     
-    def _warning_to_dict(self, warning: SafetyWarning) -> Dict:
-        """将 SafetyWarning 转换为字典"""
-        return {
-            "type": warning.type,
-            "severity": warning.severity.value,
-            "message": warning.message,
-            "recommendation": warning.recommendation,
-            "evidence": warning.evidence,
-            "requires_action": warning.requires_action
-        }
+    def get_patient_report(self, patient_id: str) -> AgentResponse:
+        """
+        获取患者画像报告
+        
+        直接查询数据库生成报告，跳过对话入口的术语扩展、意图识别和患者上下文预取
+        
+        Returns:
+            与患者查询意图的对话结果结构一致
+        """
+        return self._handle_patient_query("", patient_id)
     
     def get_insulin_usage_analysis(self) -> Dict:
         """获取胰岛素使用率分析"""
-        processor = ExcelProcessor(EXCEL_FILE)
-        return processor.analyze_insulin_usage()
+        return get_insulin_usage_analysis()
     
     def get_pdf_structure(self) -> Dict:
         """获取 PDF 目录结构和表格"""
@@ -598,7 +957,8 @@ class MedicalAgent:
     
     def clear_history(self):
         """清空对话历史"""
-        self.conversation_history = []
+        with self._history_lock:
+            self.conversation_history.clear()
         logger.info("[智能体] 对话历史已清空")
     
     def check_database_status(self) -> Dict:
@@ -642,12 +1002,15 @@ class MedicalAgent:
 
 # 全局医疗智能体实例
 _medical_agent: Optional[MedicalAgent] = None
+_medical_agent_lock = threading.Lock()
 
 
 def get_medical_agent() -> MedicalAgent:
     """获取全局医疗智能体实例"""
     global _medical_agent
     if _medical_agent is None:
-        _medical_agent = MedicalAgent()
+        with _medical_agent_lock:
+            if _medical_agent is None:
+                _medical_agent = MedicalAgent()
     return _medical_agent
 
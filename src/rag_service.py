@@ -2,17 +2,63 @@
 """
 RAG 服务模块 - 跨源检索与答案生成
 """
+import heapq
 import logging
-from typing import List, Dict, Optional
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, Union
 from datetime import datetime
 
 from src.vector_store import get_vector_store
 from src.db_client import get_db_client
 from src.term_mapper import get_term_mapper
 from src.llm_client import get_llm_client, MEDICAL_SYSTEM_PROMPT
+from src.config import RAG_CONFIG
 
 logger = logging.getLogger(__name__)
 
+# 系统支持的关键词
+SUPPORTED_KEYWORDS = (
+    "高血压", "糖尿病", "血压", "血糖", "HbA1c", "糖化血红蛋白",
+    "降压", "降糖", "ACEI", "ARB", "CCB", "利尿剂",
+    "心肌梗死", "冠心病", "脑卒中", "肾病", "视网膜病变",
+    "胰岛素", "二甲双胍", "氨氯地平", "缬沙坦"
+)
+
+# 其他专科关键词（无知识回复中提示具体不支持的专科）
+SPECIALTY_KEYWORDS = (
+    "骨折", "骨科", "眼科", "皮肤", "癌症", "肿瘤", "手术", "外科",
+    "妇科", "产科", "儿科", "耳鼻喉", "口腔", "精神", "心理"
+)
+
+# 超出范围的关键词
+OUT_OF_SCOPE_KEYWORDS = SPECIALTY_KEYWORDS + (
+    "感冒", "肝病", "肺病", "胃病", "肠病", "甲状腺", "风湿", "免疫", "中医"
+)
+
+# 指南推荐的检索文本模板
+GUIDELINE_TEMPLATE = """指南名称: {}
+疾病类型: {}
+适用条件: {}
+推荐等级: {}
+推荐内容: {}
+证据来源: {}
+更新日期: {}"""
+
+# 关键词预编译为正则交替式，一次扫描判断是否命中任一关键词（英文缩写大小写不敏感）
+_SUPPORTED_RE = re.compile("|".join(map(re.escape, SUPPORTED_KEYWORDS)), re.IGNORECASE)
+_SPECIALTY_RE = re.compile("|".join(map(re.escape, SPECIALTY_KEYWORDS)))
+_OUT_OF_SCOPE_RE = re.compile("|".join(map(re.escape, OUT_OF_SCOPE_KEYWORDS)))
+
+# 跨源检索线程池（独立于智能体 I/O 线程池，智能体在后台线程中发起检索时不会互相占满）
+_search_executor = ThreadPoolExecutor(max_workers=RAG_CONFIG["search_workers"], thread_name_prefix="rag-search")
+
+
+def _hit_score(hit: Dict) -> float:
+    """检索结果的相关性得分"""
+    return hit.get("score", 0)
+
 
 class RAGService:
     """RAG 检索服务"""
@@ -23,13 +69,15 @@ class RAGService:
         self.term_mapper = get_term_mapper()
         self.llm_client = get_llm_client()
     
-    def search(self, query: str, filters: Dict = None) -> Dict:
+    def search(self, query: str, filters: Dict = None, min_score: float = None) -> Dict:
         """
         跨源统一检索
         
         Args:
             query: 查询语句
             filters: 过滤条件 {"source_types": [], "update_date_after": str}
+            min_score: 向量检索的最低相似度，低于该得分的结果在检索时直接剔除
+                （数据库检索按 DB_SEARCH_CONFIG 的相关度阈值过滤，指南过滤结果不按得分过滤）
             
         Returns:
             {"hits": list, "sources": list, "normalized_query": str}
@@ -40,177 +88,200 @@ class RAGService:
         normalized_query = self.term_mapper.expand_query(query)
         logger.info(f"[RAG检索] 原始查询: {query}, 标准化后: {normalized_query}")
         
+        # 三路检索均为 I/O 等待，并行执行，总耗时取决于最慢的一路；
+        # 按提交顺序合并结果，同分时的排序与串行执行一致
+        branches = [
+            _search_executor.submit(self._search_vector, normalized_query, min_score),
+            _search_executor.submit(self._search_database, normalized_query),
+        ]
+        if filters.get("update_date_after"):
+            branches.append(_search_executor.submit(self._search_guidelines, filters["update_date_after"]))
+        
         all_hits = []
         sources_used = []
+        for branch in branches:
+            hits, source = branch.result()
+            all_hits.extend(hits)
+            if source:
+                sources_used.append(source)
+        
+        # 按得分取前10条（部分排序，同分保持合并顺序，与完整排序后切片结果一致）
+        top_hits = heapq.nlargest(10, all_hits, key=_hit_score)
         
-        # 1. 向量检索 (PDF/Excel)
+        return {
+            "hits": top_hits,
+            "sources": sources_used,
+            "normalized_query": normalized_query,
+            "original_query": query,
+            "total_hits": len(all_hits)
+        }
+    
+    def _search_vector(self, normalized_query: str,
+                       min_score: float = None) -> Tuple[List[Dict], Optional[str]]:
+        """向量检索 (PDF/Excel)，返回 (命中列表, 数据源名称)，失败时返回空结果"""
         try:
-            vector_results = self.vector_store.search(normalized_query, top_k=5)
+            vector_results = self.vector_store.search(normalized_query, top_k=5, min_score=min_score)
             for result in vector_results:
                 result["retrieval_type"] = "vector"
-            all_hits.extend(vector_results)
-            sources_used.append("pdf_excel_index")
             logger.info(f"[RAG检索] 向量检索返回 {len(vector_results)} 条结果")
+            return vector_results, "pdf_excel_index"
         except Exception as e:
             logger.error(f"[RAG检索] 向量检索失败: {str(e)}")
-        
-        # 2. 数据库检索 (MySQL)
+            return [], None
+    
+    def _search_database(self, normalized_query: str) -> Tuple[List[Dict], Optional[str]]:
+        """数据库检索 (MySQL)，返回 (命中列表, 数据源名称)，失败时返回空结果"""
         try:
             db_results = self.db_client.search_by_keyword(normalized_query)
-            for result in db_results:
-                all_hits.append({
-                    "content": self._format_db_result(result),
-                    "score": 0.8,  # 数据库匹配默认得分
-                    "source": {
-                        "type": "mysql",
-                        "table": result.get("source_table", "unknown")
-                    },
-                    "retrieval_type": "database",
-                    "raw_data": result
-                })
-            sources_used.append("mysql")
+            hits = [{
+                "content": self._format_db_result(result),
+                "score": result["score"],  # 全文检索相关度归一化后的得分
+                "source": {
+                    "type": "mysql",
+                    "table": result.get("source_table", "unknown")
+                },
+                "retrieval_type": "database",
+                "raw_data": result
+            } for result in db_results]
             logger.info(f"[RAG检索] 数据库检索返回 {len(db_results)} 条结果")
+            return hits, "mysql"
         except Exception as e:
             logger.error(f"[RAG检索] 数据库检索失败: {str(e)}")
-        
-        # 3. 指南推荐过滤
-        if filters.get("update_date_after"):
-            try:
-                guidelines = self.db_client.get_guideline_recommendations(
-                    update_date_after=filters["update_date_after"]
-                )
-                for g in guidelines:
-                    all_hits.append({
-                        "content": self._format_guideline(g),
-                        "score": 0.9,
-                        "source": {
-                            "type": "mysql",
-                            "table": "guideline_recommendations",
-                            "update_date": str(g.get("update_date", ""))
-                        },
-                        "retrieval_type": "database",
-                        "raw_data": g
-                    })
-                logger.info(f"[RAG检索] 指南过滤返回 {len(guidelines)} 条结果")
-            except Exception as e:
-                logger.error(f"[RAG检索] 指南过滤失败: {str(e)}")
-        
-        # 按得分排序
-        all_hits.sort(key=lambda x: x.get("score", 0), reverse=True)
-        
-        return {
-            "hits": all_hits[:10],  # 返回前10条
-            "sources": sources_used,
-            "normalized_query": normalized_query,
-            "original_query": query,
-            "total_hits": len(all_hits)
-        }
+            return [], None
+    
+    def _search_guidelines(self, update_date_after: str) -> Tuple[List[Dict], Optional[str]]:
+        """指南推荐过滤，返回 (命中列表, None)，失败时返回空结果"""
+        try:
+            guidelines = self.db_client.get_guideline_recommendations(
+                update_date_after=update_date_after
+            )
+            hits = [{
+                "content": self._format_guideline(g),
+                "score": 0.9,
+                "source": {
+                    "type": "mysql",
+                    "table": "guideline_recommendations",
+                    "update_date": str(g.get("update_date", ""))
+                },
+                "retrieval_type": "database",
+                "raw_data": g
+            } for g in guidelines]
+            logger.info(f"[RAG检索] 指南过滤返回 {len(guidelines)} 条结果")
+        except Exception as e:
+            logger.error(f"[RAG检索] 指南过滤失败: {str(e)}")
+            hits = []
+        return hits, None
     
     def _format_db_result(self, result: Dict) -> str:
         """格式化数据库查询结果为文本"""
-        lines = []
-        for key, value in result.items():
-            if value is not None and key != "source_table":
-                lines.append(f"{key}: {value}")
-        return "\n".join(lines)
+        return "\n".join([
+            f"{key}: {value}" for key, value in result.items()
+            if value is not None and key not in ("source_table", "score")
+        ])
     
     def _format_guideline(self, guideline: Dict) -> str:
         """格式化指南推荐为文本"""
-        return f"""
-指南名称: {guideline.get('guideline_name', '')}
-疾病类型: {guideline.get('disease_type', '')}
-适用条件: {guideline.get('patient_condition', '')}
-推荐等级: {guideline.get('recommendation_level', '')}
-推荐内容: {guideline.get('recommendation_content', '')}
-证据来源: {guideline.get('evidence_source', '')}
-更新日期: {guideline.get('update_date', '')}
-        """.strip()
+        get = guideline.get
+        return GUIDELINE_TEMPLATE.format(
+            get('guideline_name', ''), get('disease_type', ''), get('patient_condition', ''),
+            get('recommendation_level', ''), get('recommendation_content', ''),
+            get('evidence_source', ''), get('update_date', '')
+        )
     
-    def rag_answer(self, query: str, patient_context: Dict = None, 
+    def rag_answer(self, query: str, patient_context: Union[Dict, Future, None] = None, 
                    history: List[Dict] = None) -> Dict:
         """
         RAG 问答
         
         Args:
             query: 用户问题
-            patient_context: 患者上下文信息
+            patient_context: 患者上下文信息（可传入 Future，检索完成后才等待其结果）
             history: 对话历史
             
         Returns:
             {"answer": str, "sources": list, "success": bool}
         """
-        # 1. 首先检查是否超出知识库范围
-        if self._is_out_of_scope(query):
-            logger.info(f"[RAG问答] 检测到超出范围的问题: {query}")
-            return {
-                "answer": self._get_no_knowledge_response(query),
-                "sources": [],
-                "success": True,
-                "has_knowledge": False,
-                "is_out_of_scope": True
-            }
+        prepared = self.prepare_answer(query, patient_context)
+        if not prepared["has_knowledge"]:
+            return prepared["response"]
         
-        # 2. 检索相关内容
-        search_results = self.search(query)
+        # 调用 LLM
+        result = self.llm_client.generate(
+            prompt=prepared["prompt"],
+            history=history,
+            system_prompt=MEDICAL_SYSTEM_PROMPT
+        )
         
-        # 3. 检查是否有相关知识（包括相关性得分判断）
-        if not search_results["hits"]:
-            logger.warning(f"[RAG问答] 未找到相关知识: {query}")
+        if result["success"]:
             return {
-                "answer": self._get_no_knowledge_response(query),
-                "sources": [],
+                "answer": result["content"],
+                "sources": prepared["sources"],
                 "success": True,
-                "has_knowledge": False
+                "has_knowledge": True,
+                "normalized_query": prepared["normalized_query"]
             }
-        
-        # 4. 检查检索结果的相关性得分
-        # 如果最高得分低于阈值，判定为无相关知识
-        from src.config import RAG_CONFIG
-        max_score = max([hit.get("score", 0) for hit in search_results["hits"]])
-        similarity_threshold = RAG_CONFIG.get("similarity_threshold", 0.3)
-        
-        if max_score < similarity_threshold:
-            logger.warning(f"[RAG问答] 检索结果相关性过低 (最高得分: {max_score:.3f} < {similarity_threshold}): {query}")
+        else:
             return {
-                "answer": self._get_no_knowledge_response(query),
+                "answer": f"生成回答时出错: {result['error']}",
                 "sources": [],
-                "success": True,
-                "has_knowledge": False,
-                "max_score": max_score
+                "success": False,
+                "has_knowledge": True
             }
+    
+    def prepare_answer(self, query: str, patient_context: Union[Dict, Future, None] = None) -> Dict:
+        """
+        检索相关知识并构建 RAG 提示词（不调用 LLM）
         
-        # 5. 过滤低相关性结果
-        filtered_hits = [
-            hit for hit in search_results["hits"] 
-            if hit.get("score", 0) >= similarity_threshold
-        ]
+        Args:
+            query: 用户问题
+            patient_context: 患者上下文信息（可传入 Future，检索完成后才等待其结果）
+            
+        Returns:
+            有相关知识时: {"has_knowledge": True, "prompt": str, "sources": list, "normalized_query": str}
+            无相关知识时: {"has_knowledge": False, "response": dict}，response 可直接作为问答结果返回
+        """
+        # 1. 首先检查是否超出知识库范围
+        out_of_scope = self.out_of_scope_response(query)
+        if out_of_scope is not None:
+            return {"has_knowledge": False, "response": out_of_scope}
         
-        if not filtered_hits:
-            logger.warning(f"[RAG问答] 过滤后无有效结果: {query}")
+        # 2. 检索相关内容（低于相似度阈值的结果在检索阶段即被剔除）
+        similarity_threshold = RAG_CONFIG.get("similarity_threshold", 0.3)
+        search_results = self.search(query, min_score=similarity_threshold)
+        
+        # 3. 检查是否有相关知识
+        if not search_results["hits"]:
+            logger.warning(f"[RAG问答] 未找到相关性不低于 {similarity_threshold} 的知识: {query}")
             return {
-                "answer": self._get_no_knowledge_response(query),
-                "sources": [],
-                "success": True,
-                "has_knowledge": False
+                "has_knowledge": False,
+                "response": {
+                    "answer": self._get_no_knowledge_response(query),
+                    "sources": [],
+                    "success": True,
+                    "has_knowledge": False
+                }
             }
         
-        # 6. 构建上下文（只使用过滤后的高相关性结果）
+        # 4. 构建上下文（只使用高相关性结果）
         context_parts = []
         sources = []
         
-        for hit in filtered_hits[:5]:
-            context_parts.append(f"【来源: {hit['source'].get('type', 'unknown')}】\n{hit['content']}")
+        for hit in search_results["hits"][:5]:
+            get_source = hit["source"].get
+            context_parts.append(f"【来源: {get_source('type', 'unknown')}】\n{hit['content']}")
             sources.append({
-                "type": hit["source"].get("type"),
-                "file": hit["source"].get("file"),
-                "page": hit["source"].get("page"),
-                "table": hit["source"].get("table"),
+                "type": get_source("type"),
+                "file": get_source("file"),
+                "page": get_source("page"),
+                "table": get_source("table"),
                 "score": hit.get("score", 0)
             })
         
         context = "\n\n---\n\n".join(context_parts)
         
-        # 添加患者上下文
+        # 添加患者上下文（后台查询的患者画像在此时才需要）
+        if isinstance(patient_context, Future):
+            patient_context = patient_context.result()
         patient_info = ""
         if patient_context:
             patient_info = f"\n\n【患者信息】\n{self._format_patient_context(patient_context)}"
@@ -231,28 +302,12 @@ class RAGService:
 
 【回答】"""
         
-        # 调用 LLM
-        result = self.llm_client.generate(
-            prompt=prompt,
-            history=history,
-            system_prompt=MEDICAL_SYSTEM_PROMPT
-        )
-        
-        if result["success"]:
-            return {
-                "answer": result["content"],
-                "sources": sources,
-                "success": True,
-                "has_knowledge": True,
-                "normalized_query": search_results["normalized_query"]
-            }
-        else:
-            return {
-                "answer": f"生成回答时出错: {result['error']}",
-                "sources": [],
-                "success": False,
-                "has_knowledge": True
-            }
+        return {
+            "has_knowledge": True,
+            "prompt": prompt,
+            "sources": sources,
+            "normalized_query": search_results["normalized_query"]
+        }
     
     def _format_patient_context(self, context: Dict) -> str:
         """格式化患者上下文"""
@@ -281,6 +336,27 @@ class RAGService:
         
         return "\n".join(parts)
     
+    def out_of_scope_response(self, query: str) -> Optional[Dict]:
+        """
+        超出知识库范围时返回提示结果（不检索、不调用 LLM），否则返回 None
+        
+        Args:
+            query: 用户问题
+            
+        Returns:
+            {"answer": str, "sources": [], "is_out_of_scope": True, ...} 或 None
+        """
+        if not self._is_out_of_scope(query):
+            return None
+        logger.info(f"[RAG问答] 检测到超出范围的问题: {query}")
+        return {
+            "answer": self._get_no_knowledge_response(query),
+            "sources": [],
+            "success": True,
+            "has_knowledge": False,
+            "is_out_of_scope": True
+        }
+    
     def _is_out_of_scope(self, query: str) -> bool:
         """
         判断查询是否超出知识库范围
@@ -291,43 +367,16 @@ class RAGService:
         Returns:
             是否超出范围
         """
-        # 系统支持的关键词
-        supported_keywords = [
-            "高血压", "糖尿病", "血压", "血糖", "HbA1c", "糖化血红蛋白",
-            "降压", "降糖", "ACEI", "ARB", "CCB", "利尿剂",
-            "心肌梗死", "冠心病", "脑卒中", "肾病", "视网膜病变",
-            "胰岛素", "二甲双胍", "氨氯地平", "缬沙坦"
-        ]
-        
-        # 超出范围的关键词
-        out_of_scope_keywords = [
-            "骨折", "骨科", "眼科", "皮肤", "癌症", "肿瘤", "手术", "外科",
-            "妇科", "产科", "儿科", "耳鼻喉", "口腔", "精神", "心理", "感冒",
-            "肝病", "肺病", "胃病", "肠病", "甲状腺", "风湿", "免疫", "中医"
-        ]
-        
-        query_lower = query.lower()
-        
         # 如果包含超出范围的关键词，且不包含支持的关键词，判定为超出范围
-        has_out_of_scope = any(keyword in query_lower for keyword in out_of_scope_keywords)
-        has_supported = any(keyword in query_lower for keyword in supported_keywords)
-        
-        if has_out_of_scope and not has_supported:
-            return True
-        
-        return False
+        return bool(_OUT_OF_SCOPE_RE.search(query)) and not _SUPPORTED_RE.search(query)
     
     def _get_no_knowledge_response(self, query: str) -> str:
         """生成无知识库匹配时的专业回复"""
-        # 检查是否是超出范围的问题
-        out_of_scope_keywords = [
-            "骨折", "骨科", "眼科", "皮肤", "癌症", "肿瘤", "手术", "外科",
-            "妇科", "产科", "儿科", "耳鼻喉", "口腔", "精神", "心理"
-        ]
-        
-        for keyword in out_of_scope_keywords:
-            if keyword in query:
-                return f"""抱歉，本系统是高血压和糖尿病诊疗决策支持助手，暂不支持"{keyword}"相关问题的查询。
+        # 检查是否是超出范围的问题（取查询中最先出现的专科关键词）
+        match = _SPECIALTY_RE.search(query)
+        if match:
+            keyword = match.group(0)
+            return f"""抱歉，本系统是高血压和糖尿病诊疗决策支持助手，暂不支持"{keyword}"相关问题的查询。
 
 本系统支持的功能包括：
 1. 高血压诊疗相关问题
@@ -349,12 +398,15 @@ class RAGService:
 
 # 全局 RAG 服务实例
 _rag_service: Optional[RAGService] = None
+_rag_service_lock = threading.Lock()
 
 
 def get_rag_service() -> RAGService:
     """获取全局 RAG 服务实例"""
     global _rag_service
     if _rag_service is None:
-        _rag_service = RAGService()
+        with _rag_service_lock:
+            if _rag_service is None:
+                _rag_service = RAGService()
     return _rag_service
 
@@ -0,0 +1,226 @@
+# -*- coding: utf-8 -*-
+"""
+响应缓存模块 - 基于查询向量相似度的语义缓存
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.config import RESPONSE_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _Namespace:
+    """
+    单个命名空间的缓存条目
+
+    查询向量按行存放在预分配的矩阵中（容量不足时倍增），写入/删除时增量维护，
+    查找时无需每次重新堆叠全部向量。删除条目时用最后一行填补空位。
+    """
+    
+    __slots__ = ("entries", "rows", "keys", "matrix", "expires", "size")
+    
+    def __init__(self):
+        # {query: (embedding, value, expires_at)}
+        self.entries: Dict[str, Tuple] = {}
+        # 有向量的条目: query -> 行号 / 行号 -> query
+        self.rows: Dict[str, int] = {}
+        self.keys: List[str] = []
+        self.matrix: Optional[np.ndarray] = None
+        self.expires: Optional[np.ndarray] = None
+        self.size = 0
+    
+    def put(self, query: str, embedding: Optional[np.ndarray], value: Any, expires_at: float):
+        self.entries[query] = (embedding, value, expires_at)
+        row = self.rows.get(query)
+        if embedding is None:
+            if row is not None:
+                self._remove_row(query)
+            return
+        
+        if row is None:
+            if self.matrix is None:
+                self.matrix = np.empty((8, embedding.shape[0]), dtype=np.float32)
+                self.expires = np.empty(8, dtype=np.float64)
+            elif self.size == self.matrix.shape[0]:
+                # 扩容时创建新数组，锁外仍在使用的旧快照不受影响
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+                self.expires = np.concatenate([self.expires, np.empty_like(self.expires)])
+            row = self.size
+            self.size += 1
+            self.rows[query] = row
+            self.keys.append(query)
+        self.matrix[row] = embedding
+        self.expires[row] = expires_at
+    
+    def pop(self, query: str):
+        if self.entries.pop(query, None) is not None and query in self.rows:
+            self._remove_row(query)
+    
+    def _remove_row(self, query: str):
+        row = self.rows.pop(query)
+        last = self.size - 1
+        last_query = self.keys.pop()
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.expires[row] = self.expires[last]
+            self.keys[row] = last_query
+            self.rows[last_query] = row
+        self.size = last
+
+
+class SemanticCache:
+    """
+    语义响应缓存
+
+    以 (命名空间, 查询文本) 为键缓存响应；完全相同的查询直接命中，
+    否则比较查询向量的余弦相似度，超过阈值即视为命中。
+    命名空间用于隔离不同接口、患者、对话历史和过滤条件，避免串用结果。
+    """
+    
+    def __init__(self, embed_fn: Callable[[str], List[float]] = None,
+                 max_entries: int = None, ttl_seconds: float = None,
+                 similarity_threshold: float = None):
+        self.embed_fn = embed_fn
+        self.max_entries = max_entries or RESPONSE_CACHE_CONFIG["max_entries"]
+        self.ttl_seconds = ttl_seconds or RESPONSE_CACHE_CONFIG["ttl_seconds"]
+        self.similarity_threshold = similarity_threshold or RESPONSE_CACHE_CONFIG["similarity_threshold"]
+        
+        self._entries: Dict[Tuple, _Namespace] = {}
+        # 全局 LRU 顺序 [(namespace, query)]
+        self._lru: "OrderedDict[Tuple, None]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _embed(self, query: str) -> Optional[np.ndarray]:
+        """计算归一化查询向量，失败时返回 None（退化为精确匹配）"""
+        if self.embed_fn is None:
+            return None
+        try:
+            vector = np.asarray(self.embed_fn(query), dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            return vector / norm if norm > 0 else None
+        except Exception as e:
+            logger.warning(f"[响应缓存] 查询向量计算失败: {str(e)}")
+            return None
+    
+    def lookup(self, namespace: Tuple, query: str) -> Tuple[Optional[Any], Optional[np.ndarray]]:
+        """
+        查找缓存
+        
+        Args:
+            namespace: 命名空间（接口、患者ID、对话历史摘要、过滤条件等）
+            query: 查询文本
+            
+        Returns:
+            (缓存的响应或 None, 查询向量)，查询向量可传给 store 以避免重复计算
+        """
+        now = time.monotonic()
+        
+        with self._lock:
+            bucket = self._entries.get(namespace)
+            entry = bucket.entries.get(query) if bucket else None
+            if entry is not None:
+                if entry[2] > now:
+                    self._lru.move_to_end((namespace, query))
+                    logger.info(f"[响应缓存] 精确命中: {query[:50]}")
+                    return entry[1], entry[0]
+                self._remove(namespace, query)
+        
+        embedding = self._embed(query)
+        if embedding is None:
+            return None, None
+        
+        # 锁内只取矩阵快照，相似度计算在锁外进行
+        with self._lock:
+            bucket = self._entries.get(namespace)
+            if bucket is None or bucket.size == 0:
+                return None, embedding
+            matrix = bucket.matrix[:bucket.size]
+            expires = bucket.expires[:bucket.size]
+            keys = list(bucket.keys)
+        
+        similarities = np.where(expires > now, matrix @ embedding, -np.inf)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None, embedding
+        
+        key = keys[best]
+        with self._lock:
+            # 快照期间该行可能已被替换或删除，按当前条目重新校验
+            bucket = self._entries.get(namespace)
+            entry = bucket.entries.get(key) if bucket else None
+            if entry is None or entry[0] is None or entry[2] <= now:
+                return None, embedding
+            similarity = float(entry[0] @ embedding)
+            if similarity < self.similarity_threshold:
+                return None, embedding
+            self._lru.move_to_end((namespace, key))
+        
+        logger.info(f"[响应缓存] 语义命中: {query[:50]} ≈ {key[:50]} (相似度 {similarity:.3f})")
+        return entry[1], embedding
+    
+    def store(self, namespace: Tuple, query: str, value: Any,
+              embedding: Optional[np.ndarray] = None):
+        """
+        写入缓存
+        
+        Args:
+            namespace: 命名空间
+            query: 查询文本
+            value: 响应数据（写入后视为只读）
+            embedding: lookup 返回的查询向量
+        """
+        with self._lock:
+            bucket = self._entries.get(namespace)
+            if bucket is None:
+                bucket = self._entries[namespace] = _Namespace()
+            bucket.put(query, embedding, value, time.monotonic() + self.ttl_seconds)
+            self._lru[(namespace, query)] = None
+            self._lru.move_to_end((namespace, query))
+            
+            while len(self._lru) > self.max_entries:
+                old_namespace, old_query = next(iter(self._lru))
+                self._remove(old_namespace, old_query)
+    
+    def _remove(self, namespace: Tuple, query: str):
+        """移除缓存条目（调用方需持有锁）"""
+        self._lru.pop((namespace, query), None)
+        bucket = self._entries.get(namespace)
+        if bucket is not None:
+            bucket.pop(query)
+            if not bucket.entries:
+                del self._entries[namespace]
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._lru.clear()
+        logger.info("[响应缓存] 已清空")
+    
+    def __len__(self) -> int:
+        return len(self._lru)
+
+
+# 全局响应缓存实例
+_response_cache: Optional[SemanticCache] = None
+
+
+def get_response_cache() -> SemanticCache:
+    """获取全局响应缓存实例（查询向量经微批处理器计算）"""
+    global _response_cache
+    if _response_cache is None:
+        from src.embed_batcher import get_embed_batcher
+        _response_cache = SemanticCache(embed_fn=get_embed_batcher().embed)
+    return _response_cache
+
+
+def clear_response_cache():
+    """清空全局响应缓存（索引重建等数据源变化后调用，未创建时无操作）"""
+    if _response_cache is not None:
+        _response_cache.clear()
@@ -3,6 +3,8 @@
 风险评估引擎 - 高血压/糖尿病风险分层与随访计划
 """
 import logging
+import threading
+from bisect import bisect_right
 from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 
@@ -11,6 +13,148 @@ from src.db_client import get_db_client
 
 logger = logging.getLogger(__name__)
 
+# 高血压随访计划模板（随访间隔天数 interval_days 用于计算下次随访日期）
+_HP_FOLLOW_UP_TEMPLATES = {
+    "低危": {
+        "frequency": "3个月",
+        "interval_days": 90,
+        "monitoring": ("血压监测（每周1-2次）", "生活方式评估"),
+        "targets": ("血压<140/90 mmHg",)
+    },
+    "中危": {
+        "frequency": "1个月",
+        "interval_days": 30,
+        "monitoring": ("血压监测（每周2-3次）", "心血管危险因素评估", "靶器官检查"),
+        "targets": ("血压<140/90 mmHg", "评估是否需要药物治疗")
+    },
+    "高危": {
+        "frequency": "2周",
+        "interval_days": 14,
+        "monitoring": ("血压监测（每日）", "心血管风险评估", "肾功能检查", "心电图"),
+        "targets": ("血压<130/80 mmHg", "立即开始药物治疗")
+    },
+    "很高危": {
+        "frequency": "1周",
+        "interval_days": 7,
+        "monitoring": ("血压监测（每日2次）", "心血管全面评估", "肾功能", "眼底检查"),
+        "targets": ("尽快将血压控制在安全范围", "强化治疗", "考虑转诊")
+    }
+}
+
+# 糖尿病随访计划模板（随访间隔天数 interval_days 用于计算下次随访日期）
+_DM_FOLLOW_UP_TEMPLATES = {
+    "良好": {
+        "frequency": "3个月",
+        "interval_days": 90,
+        "monitoring": ("HbA1c（每3个月）", "空腹血糖", "餐后血糖"),
+        "annual_check": ("眼底检查", "肾功能", "足部检查")
+    },
+    "一般": {
+        "frequency": "1-2个月",
+        "interval_days": 45,
+        "monitoring": ("HbA1c（每3个月）", "血糖谱监测", "用药依从性评估"),
+        "annual_check": ("眼底检查", "肾功能", "神经病变筛查", "足部检查")
+    },
+    "不佳": {
+        "frequency": "2-4周",
+        "interval_days": 14,
+        "monitoring": ("强化血糖监测", "HbA1c（每3个月）", "并发症筛查"),
+        "annual_check": ("眼底检查", "肾功能", "心血管风险评估", "神经病变", "足部检查")
+    }
+}
+
+
+# 降压治疗建议模板（返回时逐条复制，药物列表为元组不可修改）
+_HP_GUIDELINE = "中国高血压防治指南2023"
+_BP_LIFESTYLE_REC = {
+    "type": "生活方式干预",
+    "content": "限盐（<6g/d）、减重、规律运动、戒烟限酒、DASH饮食",
+    "evidence_level": "ⅠA",
+    "source": _HP_GUIDELINE
+}
+_BP_INTENSIVE_DRUG_REC = {
+    "type": "药物治疗",
+    "content": "立即开始降压药物治疗，推荐起始联合治疗",
+    "drugs": ("CCB（如氨氯地平）", "ACEI/ARB（如缬沙坦）"),
+    "evidence_level": "ⅠA",
+    "source": _HP_GUIDELINE
+}
+_BP_RECS_BY_RISK = {
+    "高危": _BP_INTENSIVE_DRUG_REC,
+    "很高危": _BP_INTENSIVE_DRUG_REC,
+    "中危": {
+        "type": "药物治疗",
+        "content": "生活方式干预4周后若血压未达标，开始药物治疗",
+        "drugs": ("CCB", "ACEI/ARB", "利尿剂（任选一种）"),
+        "evidence_level": "ⅠA",
+        "source": _HP_GUIDELINE
+    }
+}
+_BP_OBSERVATION_REC = {
+    "type": "观察随访",
+    "content": "首先强化生活方式干预，密切监测血压",
+    "evidence_level": "ⅠB",
+    "source": _HP_GUIDELINE
+}
+_BP_DIABETES_REC = {
+    "type": "合并糖尿病",
+    "content": "优先选择ACEI/ARB类药物，有肾脏保护作用",
+    "drugs": ("ACEI（如依那普利）", "ARB（如缬沙坦）"),
+    "evidence_level": "ⅠA",
+    "source": _HP_GUIDELINE
+}
+
+# 糖尿病治疗建议模板，按 HbA1c 分段：<7.0、7.0-7.5、7.5-9.0、≥9.0
+_DM_GUIDELINE = "中国2型糖尿病防治指南2020"
+_DM_LIFESTYLE_REC = {
+    "type": "生活方式干预",
+    "content": "医学营养治疗、运动疗法、戒烟、糖尿病自我管理教育",
+    "evidence_level": "ⅠA",
+    "source": _DM_GUIDELINE
+}
+_DM_HBA1C_THRESHOLDS = (7.0, 7.5, 9.0)
+_DM_RECS_BY_HBA1C = (
+    {
+        "type": "维持治疗",
+        "content": "HbA1c<7.0%，控制良好，维持当前治疗方案",
+        "evidence_level": "ⅠA",
+        "source": _DM_GUIDELINE
+    },
+    {
+        "type": "调整治疗",
+        "content": "HbA1c 7.0-7.5%，强化生活方式干预，必要时增加药物",
+        "drugs": ("二甲双胍（一线）",),
+        "evidence_level": "ⅠA",
+        "source": _DM_GUIDELINE
+    },
+    {
+        "type": "联合治疗",
+        "content": "HbA1c≥7.5%，建议二甲双胍联合其他降糖药",
+        "drugs": ("二甲双胍+DPP-4抑制剂", "二甲双胍+SGLT-2抑制剂", "二甲双胍+GLP-1受体激动剂"),
+        "evidence_level": "ⅠA",
+        "source": _DM_GUIDELINE
+    },
+    {
+        "type": "强化治疗",
+        "content": "HbA1c≥9.0%，建议起始胰岛素治疗或联合治疗",
+        "drugs": ("基础胰岛素", "二甲双胍联合胰岛素"),
+        "evidence_level": "ⅠA",
+        "source": _DM_GUIDELINE
+    }
+)
+
+
+def _build_follow_up_plan(template: Dict) -> Dict:
+    """按模板生成随访计划，只为选中的模板计算下次随访日期"""
+    plan = {
+        "frequency": template["frequency"],
+        "next_visit": (datetime.now() + timedelta(days=template["interval_days"])).strftime("%Y-%m-%d")
+    }
+    for key, value in template.items():
+        if key not in plan and key != "interval_days":
+            plan[key] = value
+    return plan
+
 
 class RiskEngine:
     """风险评估引擎"""
@@ -160,83 +304,19 @@ class RiskEngine:
     
     def _generate_follow_up_plan(self, risk_level: str, bp_level: float) -> Dict:
         """生成随访计划"""
-        plans = {
-            "低危": {
-                "frequency": "3个月",
-                "next_visit": (datetime.now() + timedelta(days=90)).strftime("%Y-%m-%d"),
-                "monitoring": ["血压监测（每周1-2次）", "生活方式评估"],
-                "targets": ["血压<140/90 mmHg"]
-            },
-            "中危": {
-                "frequency": "1个月",
-                "next_visit": (datetime.now() + timedelta(days=30)).strftime("%Y-%m-%d"),
-                "monitoring": ["血压监测（每周2-3次）", "心血管危险因素评估", "靶器官检查"],
-                "targets": ["血压<140/90 mmHg", "评估是否需要药物治疗"]
-            },
-            "高危": {
-                "frequency": "2周",
-                "next_visit": (datetime.now() + timedelta(days=14)).strftime("%Y-%m-%d"),
-                "monitoring": ["血压监测（每日）", "心血管风险评估", "肾功能检查", "心电图"],
-                "targets": ["血压<130/80 mmHg", "立即开始药物治疗"]
-            },
-            "很高危": {
-                "frequency": "1周",
-                "next_visit": (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d"),
-                "monitoring": ["血压监测（每日2次）", "心血管全面评估", "肾功能", "眼底检查"],
-                "targets": ["尽快将血压控制在安全范围", "强化治疗", "考虑转诊"]
-            }
-        }
-        return plans.get(risk_level, plans["中危"])
+        return _build_follow_up_plan(_HP_FOLLOW_UP_TEMPLATES.get(risk_level, _HP_FOLLOW_UP_TEMPLATES["中危"]))
     
     def _generate_bp_recommendations(self, bp_level: float, risk_level: str, 
                                      risk_factors: List[str]) -> List[Dict]:
         """生成降压治疗建议"""
-        recommendations = []
-        
-        # 生活方式建议（所有患者）
-        recommendations.append({
-            "type": "生活方式干预",
-            "content": "限盐（<6g/d）、减重、规律运动、戒烟限酒、DASH饮食",
-            "evidence_level": "ⅠA",
-            "source": "中国高血压防治指南2023"
-        })
-        
-        # 药物治疗
-        if risk_level in ["高危", "很高危"]:
-            recommendations.append({
-                "type": "药物治疗",
-                "content": "立即开始降压药物治疗，推荐起始联合治疗",
-                "drugs": ["CCB（如氨氯地平）", "ACEI/ARB（如缬沙坦）"],
-                "evidence_level": "ⅠA",
-                "source": "中国高血压防治指南2023"
-            })
-        elif risk_level == "中危":
-            recommendations.append({
-                "type": "药物治疗",
-                "content": "生活方式干预4周后若血压未达标，开始药物治疗",
-                "drugs": ["CCB", "ACEI/ARB", "利尿剂（任选一种）"],
-                "evidence_level": "ⅠA",
-                "source": "中国高血压防治指南2023"
-            })
-        else:
-            recommendations.append({
-                "type": "观察随访",
-                "content": "首先强化生活方式干预，密切监测血压",
-                "evidence_level": "ⅠB",
-                "source": "中国高血压防治指南2023"
-            })
+        # 生活方式建议（所有患者）+ 按风险等级的药物治疗 / 观察随访建议
+        templates = [_BP_LIFESTYLE_REC, _BP_RECS_BY_RISK.get(risk_level, _BP_OBSERVATION_REC)]
         
         # 合并糖尿病的特殊建议
         if "糖尿病" in risk_factors:
-            recommendations.append({
-                "type": "合并糖尿病",
-                "content": "优先选择ACEI/ARB类药物，有肾脏保护作用",
-                "drugs": ["ACEI（如依那普利）", "ARB（如缬沙坦）"],
-                "evidence_level": "ⅠA",
-                "source": "中国高血压防治指南2023"
-            })
-        
-        return recommendations
+            templates.append(_BP_DIABETES_REC)
+        
+        return [dict(rec) for rec in templates]
     
     def assess_diabetes_control(self, profile: Dict) -> Dict:
         """
@@ -302,87 +382,33 @@ class RiskEngine:
     def _generate_dm_recommendations(self, hba1c: float, fg: float, 
                                      pg: float, insulin_usage: bool) -> List[Dict]:
         """生成糖尿病治疗建议"""
-        recommendations = []
-        
         # 生活方式干预
-        recommendations.append({
-            "type": "生活方式干预",
-            "content": "医学营养治疗、运动疗法、戒烟、糖尿病自我管理教育",
-            "evidence_level": "ⅠA",
-            "source": "中国2型糖尿病防治指南2020"
-        })
+        templates = [_DM_LIFESTYLE_REC]
         
+        # 按 HbA1c 分段选择治疗建议
         if hba1c:
-            if hba1c >= 9.0:
-                recommendations.append({
-                    "type": "强化治疗",
-                    "content": "HbA1c≥9.0%，建议起始胰岛素治疗或联合治疗",
-                    "drugs": ["基础胰岛素", "二甲双胍联合胰岛素"],
-                    "evidence_level": "ⅠA",
-                    "source": "中国2型糖尿病防治指南2020"
-                })
-            elif hba1c >= 7.5:
-                recommendations.append({
-                    "type": "联合治疗",
-                    "content": "HbA1c≥7.5%，建议二甲双胍联合其他降糖药",
-                    "drugs": ["二甲双胍+DPP-4抑制剂", "二甲双胍+SGLT-2抑制剂", "二甲双胍+GLP-1受体激动剂"],
-                    "evidence_level": "ⅠA",
-                    "source": "中国2型糖尿病防治指南2020"
-                })
-            elif hba1c >= 7.0:
-                recommendations.append({
-                    "type": "调整治疗",
-                    "content": "HbA1c 7.0-7.5%，强化生活方式干预，必要时增加药物",
-                    "drugs": ["二甲双胍（一线）"],
-                    "evidence_level": "ⅠA",
-                    "source": "中国2型糖尿病防治指南2020"
-                })
-            else:
-                recommendations.append({
-                    "type": "维持治疗",
-                    "content": "HbA1c<7.0%，控制良好，维持当前治疗方案",
-                    "evidence_level": "ⅠA",
-                    "source": "中国2型糖尿病防治指南2020"
-                })
-        
-        return recommendations
+            templates.append(_DM_RECS_BY_HBA1C[bisect_right(_DM_HBA1C_THRESHOLDS, hba1c)])
+        
+        return [dict(rec) for rec in templates]
     
     def _generate_dm_follow_up(self, control_status: str) -> Dict:
         """生成糖尿病随访计划"""
-        plans = {
-            "良好": {
-                "frequency": "3个月",
-                "next_visit": (datetime.now() + timedelta(days=90)).strftime("%Y-%m-%d"),
-                "monitoring": ["HbA1c（每3个月）", "空腹血糖", "餐后血糖"],
-                "annual_check": ["眼底检查", "肾功能", "足部检查"]
-            },
-            "一般": {
-                "frequency": "1-2个月",
-                "next_visit": (datetime.now() + timedelta(days=45)).strftime("%Y-%m-%d"),
-                "monitoring": ["HbA1c（每3个月）", "血糖谱监测", "用药依从性评估"],
-                "annual_check": ["眼底检查", "肾功能", "神经病变筛查", "足部检查"]
-            },
-            "不佳": {
-                "frequency": "2-4周",
-                "next_visit": (datetime.now() + timedelta(days=14)).strftime("%Y-%m-%d"),
-                "monitoring": ["强化血糖监测", "HbA1c（每3个月）", "并发症筛查"],
-                "annual_check": ["眼底检查", "肾功能", "心血管风险评估", "神经病变", "足部检查"]
-            }
-        }
-        return plans.get(control_status, plans["一般"])
+        return _build_follow_up_plan(_DM_FOLLOW_UP_TEMPLATES.get(control_status, _DM_FOLLOW_UP_TEMPLATES["一般"]))
     
-    def comprehensive_assessment(self, patient_id: str) -> Dict:
+    def comprehensive_assessment(self, patient_id: str, profile: Dict = None) -> Dict:
         """
         综合风险评估
         
         Args:
             patient_id: 患者ID
+            profile: 已获取的患者画像（可选，传入时不再重复查询数据库）
             
         Returns:
             综合评估结果
         """
         # 获取完整患者画像
-        profile = self.db_client.get_full_patient_profile(patient_id)
+        if profile is None:
+            profile = self.db_client.get_full_patient_profile(patient_id)
         
         if not profile.get("basic_info"):
             return {
@@ -413,6 +439,25 @@ class RiskEngine:
         logger.info(f"[综合评估] 患者 {patient_id} 综合风险: {result['overall_risk']}")
         return result
     
+    def comprehensive_assessment_batch(self, patient_ids: List[str]) -> Dict[str, Dict]:
+        """
+        批量综合风险评估（患者画像批量查询，避免逐个患者往返数据库）
+        
+        Args:
+            patient_ids: 患者ID列表
+            
+        Returns:
+            {patient_id: 综合评估结果}
+        """
+        if len(patient_ids) == 1:
+            return {patient_ids[0]: self.comprehensive_assessment(patient_ids[0])}
+        
+        profiles = self.db_client.get_full_patient_profiles(patient_ids)
+        return {
+            patient_id: self.comprehensive_assessment(patient_id, profile)
+            for patient_id, profile in profiles.items()
+        }
+    
     def _calculate_overall_risk(self, hp_assessment: Dict, dm_assessment: Dict) -> str:
         """计算综合风险等级"""
         hp_risk = hp_assessment.get("risk_level", "")
@@ -435,12 +480,15 @@ class RiskEngine:
 
 # 全局风险评估引擎实例
 _risk_engine: Optional[RiskEngine] = None
+_risk_engine_lock = threading.Lock()
 
 
 def get_risk_engine() -> RiskEngine:
     """获取全局风险评估引擎实例"""
     global _risk_engine
     if _risk_engine is None:
-        _risk_engine = RiskEngine()
+        with _risk_engine_lock:
+            if _risk_engine is None:
+                _risk_engine = RiskEngine()
     return _risk_engine
 
@@ -3,6 +3,7 @@
 安全预警模块 - 伦理安全控制与高风险预警
 """
 import logging
+import threading
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 from enum import Enum
@@ -20,7 +21,7 @@ class WarningSeverity(Enum):
     EMERGENCY = "emergency" # 紧急
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class SafetyWarning:
     """安全预警"""
     type: str               # 预警类型
@@ -29,6 +30,17 @@ class SafetyWarning:
     recommendation: str     # 建议措施
     evidence: str           # 证据来源
     requires_action: bool   # 是否需要立即处理
+    
+    def to_dict(self) -> Dict:
+        """转换为 API 返回的字典"""
+        return {
+            "type": self.type,
+            "severity": self.severity.value,
+            "message": self.message,
+            "recommendation": self.recommendation,
+            "evidence": self.evidence,
+            "requires_action": self.requires_action
+        }
 
 
 class SafetyGuard:
@@ -346,12 +358,15 @@ class SafetyGuard:
 
 # 全局安全预警实例
 _safety_guard: Optional[SafetyGuard] = None
+_safety_guard_lock = threading.Lock()
 
 
 def get_safety_guard() -> SafetyGuard:
     """获取全局安全预警实例"""
     global _safety_guard
     if _safety_guard is None:
-        _safety_guard = SafetyGuard()
+        with _safety_guard_lock:
+            if _safety_guard is None:
+                _safety_guard = SafetyGuard()
     return _safety_guard
 
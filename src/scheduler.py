@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 """
-定时任务调度器 - 自动更新索引
+定时任务调度器 - 数据源变化时自动更新索引
 """
 import logging
 from datetime import datetime
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
-from src.config import INDEX_UPDATE_INTERVAL_MINUTES
+from src.config import INDEX_CHECK_INTERVAL_SECONDS
 
 logger = logging.getLogger(__name__)
 
@@ -16,15 +16,21 @@ _scheduler = None
 
 
 def index_update_job():
-    """索引更新任务"""
-    from src.vector_store import rebuild_index
-    
-    logger.info(f"[定时任务] 开始自动更新索引 - {datetime.now().isoformat()}")
+    """索引更新任务（仅在索引被标记或数据源变化时重建）"""
+    from src.vector_store import rebuild_index, needs_rebuild
+    from src.response_cache import clear_response_cache
     
     try:
+        if not needs_rebuild():
+            logger.debug("[定时任务] 数据源未变化，跳过索引更新")
+            return
+        
+        logger.info(f"[定时任务] 检测到数据源变化，开始更新索引 - {datetime.now().isoformat()}")
         result = rebuild_index()
         if result["success"]:
             logger.info(f"[定时任务] 索引更新成功 - {result['timestamp']}")
+            # 基于旧索引生成的回答不再复用
+            clear_response_cache()
         else:
             logger.error(f"[定时任务] 索引更新失败 - {result['message']}")
     except Exception as e:
@@ -41,17 +47,19 @@ def start_scheduler():
     
     _scheduler = BackgroundScheduler()
     
-    # 添加索引更新任务
+    # 添加索引变化检查任务
     _scheduler.add_job(
         index_update_job,
-        trigger=IntervalTrigger(minutes=INDEX_UPDATE_INTERVAL_MINUTES),
+        trigger=IntervalTrigger(seconds=INDEX_CHECK_INTERVAL_SECONDS),
         id='index_update',
         name='自动更新RAG索引',
+        max_instances=1,
+        coalesce=True,
         replace_existing=True
     )
     
     _scheduler.start()
-    logger.info(f"[调度器] 已启动，索引更新间隔: {INDEX_UPDATE_INTERVAL_MINUTES} 分钟")
+    logger.info(f"[调度器] 已启动，数据源变化检查间隔: {INDEX_CHECK_INTERVAL_SECONDS} 秒")
 
 
 def stop_scheduler():
@@ -83,4 +91,3 @@ def get_scheduler_status():
         "running": _scheduler.running,
         "jobs": jobs
     }
-
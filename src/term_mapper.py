@@ -3,6 +3,8 @@
 术语映射模块 - 医学术语标准化与同义词映射
 """
 import logging
+import threading
+from functools import lru_cache
 from typing import Dict, List, Optional, Tuple
 from difflib import SequenceMatcher
 
@@ -138,6 +140,15 @@ class TermMapper:
                 self.reverse_mappings[standard] = []
             if alias != standard:
                 self.reverse_mappings[standard].append(alias)
+        
+        # 小写别名索引，大小写不敏感匹配时 O(1) 查找（同名时保留先出现的映射）
+        self._lower_index: Dict[str, str] = {}
+        for alias, standard in self.mappings.items():
+            self._lower_index.setdefault(alias.lower(), standard)
+        
+        # 相似术语建议 / 查询扩展结果缓存（映射表变化时清空）
+        self._suggest_cached = lru_cache(maxsize=4096)(self._compute_suggestions)
+        self._expand_cached = lru_cache(maxsize=1024)(self._compute_expansion)
     
     def normalize(self, term: str) -> Tuple[str, bool]:
         """
@@ -160,11 +171,10 @@ class TermMapper:
             return term, False
         
         # 大小写不敏感匹配
-        term_lower = term.lower()
-        for alias, standard in self.mappings.items():
-            if alias.lower() == term_lower:
-                logger.info(f"[术语映射] '{term}' -> '{standard}'")
-                return standard, True
+        standard = self._lower_index.get(term.lower())
+        if standard is not None:
+            logger.info(f"[术语映射] '{term}' -> '{standard}'")
+            return standard, True
         
         return term, False
     
@@ -179,8 +189,11 @@ class TermMapper:
         Returns:
             [{"term": str, "standard": str, "similarity": float}]
         """
+        return [dict(item) for item in self._suggest_cached(term.lower(), threshold)]
+    
+    def _compute_suggestions(self, term_lower: str, threshold: float) -> Tuple[Dict, ...]:
+        """计算相似术语建议（结果被缓存，返回不可变元组）"""
         suggestions = []
-        term_lower = term.lower()
         
         for alias, standard in self.mappings.items():
             # 计算相似度
@@ -196,7 +209,7 @@ class TermMapper:
         # 按相似度降序排序
         suggestions.sort(key=lambda x: x["similarity"], reverse=True)
         
-        return suggestions[:5]  # 返回前5个建议
+        return tuple(suggestions[:5])  # 返回前5个建议
     
     def get_aliases(self, standard_term: str) -> List[str]:
         """
@@ -242,6 +255,9 @@ class TermMapper:
                 self.reverse_mappings[standard] = []
             if alias not in self.reverse_mappings[standard]:
                 self.reverse_mappings[standard].append(alias)
+            self._lower_index[alias.lower()] = standard
+            self._suggest_cached.cache_clear()
+            self._expand_cached.cache_clear()
             
             logger.info(f"[术语映射] 添加映射: '{alias}' -> '{standard}'")
             return True
@@ -259,6 +275,10 @@ class TermMapper:
         Returns:
             扩展后的查询
         """
+        return self._expand_cached(query)
+    
+    def _compute_expansion(self, query: str) -> str:
+        """执行查询扩展（结果由 _expand_cached 缓存）"""
         expanded = query
         
         # 按术语长度降序排序，避免短术语替换长术语中的内容
@@ -308,12 +328,15 @@ DRUG_CONTRAINDICATIONS = {
 
 # 全局术语映射器实例
 _term_mapper: Optional[TermMapper] = None
+_term_mapper_lock = threading.Lock()
 
 
 def get_term_mapper() -> TermMapper:
     """获取全局术语映射器实例"""
     global _term_mapper
     if _term_mapper is None:
-        _term_mapper = TermMapper()
+        with _term_mapper_lock:
+            if _term_mapper is None:
+                _term_mapper = TermMapper()
     return _term_mapper
 
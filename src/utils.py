@@ -4,9 +4,12 @@
 """
 import logging
 import json
+import threading
+import time
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Hashable, List, Tuple
 
 from src.config import LOG_CONFIG, LOG_DIR
 
@@ -60,6 +63,122 @@ def log_operation(operation_type: str, details: str, patient_id: str = None,
     return log_entry
 
 
+class LogSampler:
+    """
+    日志采样器 - 限制相同错误在时间窗口内的日志条数
+    
+    故障期间（如百炼服务中断）同一错误会被大量重复记录，采样后每个窗口
+    每个键最多记录 limit 条，其余只计数，在下一窗口首条日志中汇总。
+    """
+    
+    def __init__(self, limit: int = 10, window_seconds: float = 60):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self._counters: Dict[Any, List] = {}  # {key: [窗口起始时间, 已记录数, 已抑制数]}
+        self._lock = threading.Lock()
+    
+    def allow(self, key: Any) -> Tuple[bool, int]:
+        """
+        判断本次是否记录日志
+        
+        Args:
+            key: 采样键（如 接口名 + 异常类型）
+            
+        Returns:
+            (是否记录, 上一窗口被抑制的条数)
+        """
+        now = time.monotonic()
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or now - counter[0] >= self.window_seconds:
+                suppressed = counter[2] if counter else 0
+                self._counters[key] = [now, 1, 0]
+                return True, suppressed
+            
+            if counter[1] < self.limit:
+                counter[1] += 1
+                return True, 0
+            
+            counter[2] += 1
+            return False, 0
+
+
+class TTLCache:
+    """
+    线程安全的 LRU + TTL 缓存
+    
+    条目超过 ttl_seconds 后失效；超过 max_entries 时淘汰最久未使用的条目。
+    """
+    
+    _MISSING = object()
+    
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()  # {key: (过期时间, 值)}
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """读取缓存，未命中或已过期返回 default"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key, self._MISSING)
+            if entry is self._MISSING:
+                return default
+            if entry[0] <= now:
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return entry[1]
+    
+    def set(self, key: Hashable, value: Any):
+        """写入缓存"""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class TokenBucket:
+    """
+    线程安全的令牌桶限流器
+    
+    以 rate 个/秒的速度补充令牌，桶容量为 capacity；acquire() 在令牌不足时阻塞等待。
+    rate <= 0 表示不限流，acquire() 立即返回。
+    """
+    
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens: float = 1):
+        """获取令牌，不足时睡眠至补足"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+
 def format_source_reference(source_type: str, reference: str, 
                             page: int = None, row: int = None, table: str = None) -> Dict:
     """
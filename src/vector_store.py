@@ -2,8 +2,10 @@
 """
 向量存储模块 - 使用 LlamaIndex + DashScope Embedding
 """
+import hashlib
 import logging
 import os
+import threading
 from typing import List, Dict, Optional
 from pathlib import Path
 from datetime import datetime
@@ -14,15 +16,22 @@ from llama_index.core import (
     StorageContext,
     load_index_from_storage,
     Document,
+    QueryBundle,
     Settings
 )
+import faiss
+import numpy as np
 from llama_index.embeddings.dashscope import DashScopeEmbedding, DashScopeTextEmbeddingModels
+from llama_index.vector_stores.faiss import FaissVectorStore
 from llama_index.llms.openai_like import OpenAILike
 
 from src.config import (
     KNOWLEDGE_BASE_DIR, DATA_DIR, DASHSCOPE_API_KEY, 
-    DASHSCOPE_BASE_URL, LLM_MODEL, RAG_CONFIG
+    DASHSCOPE_BASE_URL, LLM_MODEL, RAG_CONFIG, DASHSCOPE_HTTP_CONFIG
 )
+from src.llm_client import get_http_client
+from src.embed_batcher import get_embed_batcher
+from src.utils import TTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -30,15 +39,41 @@ logger = logging.getLogger(__name__)
 logging.getLogger("llama_index").setLevel(logging.WARNING)
 
 
+class NormalizedFaissVectorStore(FaissVectorStore):
+    """写入与查询前统一做 L2 归一化的 FAISS 向量库，内积得分即余弦相似度"""
+    
+    def add(self, nodes, **add_kwargs):
+        if nodes:
+            vectors = np.array([node.get_embedding() for node in nodes], dtype="float32")
+            faiss.normalize_L2(vectors)
+            for node, vector in zip(nodes, vectors):
+                node.embedding = vector.tolist()
+        return super().add(nodes, **add_kwargs)
+    
+    def query(self, query, **kwargs):
+        if query.query_embedding is not None:
+            vector = np.array([query.query_embedding], dtype="float32")
+            faiss.normalize_L2(vector)
+            query.query_embedding = vector[0].tolist()
+        return super().query(query, **kwargs)
+
+
 class VectorStore:
     """向量存储管理器"""
     
     def __init__(self, persist_path: Path = None):
         self.persist_path = persist_path or KNOWLEDGE_BASE_DIR / "medical_index"
         self.index: Optional[VectorStoreIndex] = None
+        self.index_type: Optional[str] = None
         self.query_engine = None
         self.last_update_time: Optional[datetime] = None
         
+        # 向量检索结果缓存 {(查询, top_k, min_score): 结果}，重复查询跳过 embedding 与 ANN 检索
+        self._search_cache = TTLCache(
+            max_entries=RAG_CONFIG["search_cache_entries"],
+            ttl_seconds=RAG_CONFIG["search_cache_ttl_seconds"]
+        )
+        
         # 初始化 embedding 模型
         self.embed_model = DashScopeEmbedding(
             model_name=DashScopeTextEmbeddingModels.TEXT_EMBEDDING_V2,
@@ -50,7 +85,9 @@ class VectorStore:
             model=LLM_MODEL,
             api_base=DASHSCOPE_BASE_URL,
             api_key=DASHSCOPE_API_KEY,
-            is_chat_model=True
+            is_chat_model=True,
+            http_client=get_http_client(),
+            max_retries=DASHSCOPE_HTTP_CONFIG["max_retries"]
         )
         
         # 配置全局设置
@@ -59,6 +96,28 @@ class VectorStore:
         Settings.chunk_size = RAG_CONFIG["chunk_size"]
         Settings.chunk_overlap = RAG_CONFIG["chunk_overlap"]
     
+    def _create_storage_context(self) -> StorageContext:
+        """创建基于 FAISS HNSW 索引的存储上下文"""
+        faiss_index = faiss.IndexHNSWFlat(
+            RAG_CONFIG["embedding_dim"], RAG_CONFIG["hnsw_m"], faiss.METRIC_INNER_PRODUCT
+        )
+        faiss_index.hnsw.efConstruction = RAG_CONFIG["hnsw_ef_construction"]
+        faiss_index.hnsw.efSearch = RAG_CONFIG["hnsw_ef_search"]
+        self.index_type = "faiss_hnsw"
+        return StorageContext.from_defaults(vector_store=NormalizedFaissVectorStore(faiss_index=faiss_index))
+    
+    def _load_faiss_vector_store(self) -> Optional[NormalizedFaissVectorStore]:
+        """读取持久化的 FAISS 索引，旧版 JSON 格式索引返回 None"""
+        faiss_path = self.persist_path / "default__vector_store.json"
+        try:
+            faiss_index = faiss.read_index(str(faiss_path))
+        except Exception:
+            return None
+        
+        if hasattr(faiss_index, "hnsw"):
+            faiss_index.hnsw.efSearch = RAG_CONFIG["hnsw_ef_search"]
+        return NormalizedFaissVectorStore(faiss_index=faiss_index)
+    
     def build_index_from_directory(self, directory: Path = None) -> bool:
         """
         从目录构建索引
@@ -86,9 +145,11 @@ class VectorStore:
             # 构建索引
             self.index = VectorStoreIndex.from_documents(
                 documents,
+                storage_context=self._create_storage_context(),
                 embed_model=self.embed_model,
                 show_progress=True
             )
+            self._search_cache.clear()
             
             # 持久化
             self.persist_path.mkdir(parents=True, exist_ok=True)
@@ -136,9 +197,11 @@ class VectorStore:
             # 构建索引
             self.index = VectorStoreIndex.from_documents(
                 documents,
+                storage_context=self._create_storage_context(),
                 embed_model=self.embed_model,
                 show_progress=True
             )
+            self._search_cache.clear()
             
             # 持久化
             self.persist_path.mkdir(parents=True, exist_ok=True)
@@ -167,15 +230,28 @@ class VectorStore:
             
             logger.info(f"[索引加载] 从 {self.persist_path} 加载索引")
             
-            storage_context = StorageContext.from_defaults(
-                persist_dir=str(self.persist_path)
-            )
+            # 优先加载 FAISS 索引，兼容旧版 JSON 格式索引（重建后自动升级）
+            faiss_vector_store = self._load_faiss_vector_store()
+            if faiss_vector_store is not None:
+                storage_context = StorageContext.from_defaults(
+                    vector_store=faiss_vector_store,
+                    persist_dir=str(self.persist_path)
+                )
+                self.index_type = "faiss_hnsw"
+            else:
+                storage_context = StorageContext.from_defaults(
+                    persist_dir=str(self.persist_path)
+                )
+                self.index_type = "simple"
+                logger.warning("[索引加载] 使用旧版 JSON 索引（暴力检索），建议重建索引以启用 FAISS HNSW")
+            
             self.index = load_index_from_storage(
                 storage_context,
                 embed_model=self.embed_model
             )
+            self._search_cache.clear()
             
-            logger.info("[索引加载] 成功")
+            logger.info(f"[索引加载] 成功，索引类型: {self.index_type}")
             return True
             
         except Exception as e:
@@ -203,13 +279,14 @@ class VectorStore:
         
         return self.query_engine
     
-    def search(self, query: str, top_k: int = None) -> List[Dict]:
+    def search(self, query: str, top_k: int = None, min_score: float = None) -> List[Dict]:
         """
         向量检索
         
         Args:
             query: 查询文本
             top_k: 返回数量
+            min_score: 最低相关性得分，低于该得分的结果不返回
             
         Returns:
             [{"content": str, "score": float, "source": dict}]
@@ -220,17 +297,26 @@ class VectorStore:
         
         top_k = top_k or RAG_CONFIG["top_k"]
         
+        cache_key = (query, top_k, min_score)
+        cached = self._search_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"[向量检索] 命中缓存: {query[:50]}...")
+            return [dict(result) for result in cached]
+        
         try:
             logger.info(f"[向量检索] 查询: {query[:50]}...")
             
             retriever = self.index.as_retriever(similarity_top_k=top_k)
-            nodes = retriever.retrieve(query)
+            nodes = retriever.retrieve(self._build_query_bundle(query))
             
             results = []
             for node in nodes:
+                score = float(node.score) if node.score else 0.0
+                if min_score is not None and score < min_score:
+                    continue
                 results.append({
                     "content": node.node.text,
-                    "score": float(node.score) if node.score else 0.0,
+                    "score": score,
                     "source": {
                         "type": node.node.metadata.get("source_type", "unknown"),
                         "file": node.node.metadata.get("source", "unknown"),
@@ -241,12 +327,23 @@ class VectorStore:
                 })
             
             logger.info(f"[向量检索] 返回 {len(results)} 个结果")
+            # 缓存副本，调用方会在返回的结果上添加字段
+            self._search_cache.set(cache_key, [dict(result) for result in results])
             return results
             
         except Exception as e:
             logger.error(f"[向量检索] 失败: {str(e)}")
             return []
     
+    def _build_query_bundle(self, query: str) -> QueryBundle:
+        """构建检索请求，查询向量经微批处理器计算，失败时交由检索器自行计算"""
+        try:
+            embedding = get_embed_batcher().embed(query)
+            return QueryBundle(query_str=query, embedding=embedding)
+        except Exception as e:
+            logger.warning(f"[向量检索] 批量 embedding 失败，回退为单条计算: {str(e)}")
+            return QueryBundle(query_str=query)
+    
     def query_with_sources(self, question: str) -> Dict:
         """
         带来源的问答查询
@@ -295,6 +392,12 @@ class VectorStore:
 # 全局向量存储实例
 _vector_store: Optional[VectorStore] = None
 
+# 索引脏标记（数据源变化时置位，重建开始时清除）
+_index_dirty = threading.Event()
+
+# 数据源指纹文件，记录上次构建索引时 PDF/Excel 的修改时间与大小
+SOURCE_FINGERPRINT_FILE = KNOWLEDGE_BASE_DIR / "medical_index" / "source_fingerprint"
+
 
 def get_vector_store() -> VectorStore:
     """获取全局向量存储实例"""
@@ -304,6 +407,51 @@ def get_vector_store() -> VectorStore:
     return _vector_store
 
 
+def touch():
+    """标记索引需要重建（数据源变化时调用）"""
+    _index_dirty.set()
+    logger.info("[索引] 已标记为待重建")
+
+
+def get_source_fingerprint() -> str:
+    """计算数据源文件指纹（基于文件修改时间和大小）"""
+    from src.config import PDF_FILES, EXCEL_FILE
+    
+    digest = hashlib.md5()
+    for path in [*PDF_FILES, EXCEL_FILE]:
+        try:
+            stat = path.stat()
+            digest.update(f"{path.name}:{stat.st_mtime_ns}:{stat.st_size};".encode("utf-8"))
+        except FileNotFoundError:
+            digest.update(f"{path.name}:missing;".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _save_source_fingerprint(fingerprint: str):
+    """保存数据源指纹"""
+    SOURCE_FINGERPRINT_FILE.parent.mkdir(parents=True, exist_ok=True)
+    SOURCE_FINGERPRINT_FILE.write_text(fingerprint, encoding="utf-8")
+
+
+def needs_rebuild() -> bool:
+    """
+    判断索引是否需要重建
+    
+    Returns:
+        已被标记或数据源文件自上次构建后发生变化时返回 True
+    """
+    if _index_dirty.is_set():
+        return True
+    
+    current = get_source_fingerprint()
+    if not SOURCE_FINGERPRINT_FILE.exists():
+        # 首次运行，视已有索引为最新，只记录当前指纹
+        _save_source_fingerprint(current)
+        return False
+    
+    return SOURCE_FINGERPRINT_FILE.read_text(encoding="utf-8").strip() != current
+
+
 def rebuild_index() -> Dict:
     """
     重建索引
@@ -317,6 +465,10 @@ def rebuild_index() -> Dict:
     try:
         logger.info("[索引重建] 开始...")
         
+        # 先清除脏标记并记录指纹，重建期间的新变化会在下次检查时再次触发
+        _index_dirty.clear()
+        fingerprint = get_source_fingerprint()
+        
         # 加载 PDF 文档
         pdf_chunks = load_all_pdf_documents()
         
@@ -334,6 +486,7 @@ def rebuild_index() -> Dict:
         timestamp = datetime.now().isoformat()
         
         if success:
+            _save_source_fingerprint(fingerprint)
             logger.info(f"[索引重建] 完成，时间戳: {timestamp}")
             return {
                 "success": True,
@@ -341,6 +494,7 @@ def rebuild_index() -> Dict:
                 "message": f"索引重建成功，共处理 {len(all_chunks)} 个文档块"
             }
         else:
+            _index_dirty.set()
             return {
                 "success": False,
                 "timestamp": timestamp,
@@ -348,6 +502,7 @@ def rebuild_index() -> Dict:
             }
             
     except Exception as e:
+        _index_dirty.set()
         logger.error(f"[索引重建] 错误: {str(e)}")
         return {
             "success": False,